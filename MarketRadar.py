@@ -1,26 +1,13 @@
 import os
-import requests
 import json
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import logging
 import warnings
 import socket
+import zlib
 import market_core
-
-# ================= 稳定性增强设置 =================
-_original_request = requests.Session.request
-
-def _patched_request(self, method, url, *args, **kwargs):
-    if 'timeout' not in kwargs or kwargs['timeout'] is None:
-        kwargs['timeout'] = 10
-    return _original_request(self, method, url, *args, **kwargs)
-
-requests.Session.request = _patched_request
-socket.setdefaulttimeout(10)
-
-warnings.filterwarnings("ignore")
-logging.getLogger('yfinance').setLevel(logging.CRITICAL)
+import kline_table
 
 # ================= 配置区域 =================
 ENABLE_EMAIL = True               
@@ -30,14 +17,51 @@ SENDER_EMAIL = os.environ.get("SENDER_EMAIL")
 SENDER_PASSWORD = os.environ.get("SENDER_PASSWORD") 
 RECEIVER_EMAIL = os.environ.get("RECEIVER_EMAIL")   
 
-if not SENDER_EMAIL:
-    print("⚠️ 警告: 未设置 SENDER_EMAIL 环境变量，邮件发送功能可能受限。")
-
 TZ_CN = ZoneInfo("Asia/Shanghai")
-NOW_CN = datetime.now(TZ_CN)
-REPORT_START_DATE = (NOW_CN - timedelta(days=20)).strftime("%Y-%m-%d")
-FETCH_START_DATE = (NOW_CN - timedelta(days=500)).strftime("%Y-%m-%d")
-END_DATE = NOW_CN.strftime("%Y-%m-%d")
+# 报告/计算周期，由 init_runtime() (首次运行时) 或 refresh_dates() 计算
+NOW_CN = None
+REPORT_START_DATE = None
+FETCH_START_DATE = None
+END_DATE = None
+
+# ================= 运行时初始化 =================
+_RUNTIME_READY = False
+
+def _patched_request(self, method, url, *args, **kwargs):
+    if 'timeout' not in kwargs or kwargs['timeout'] is None:
+        kwargs['timeout'] = 10
+    return _ORIGINAL_REQUEST(self, method, url, *args, **kwargs)
+
+def init_runtime():
+    """
+    稳定性增强设置与日期计算 (原为导入时执行，现于首次运行时执行一次):
+    requests 默认超时、socket 默认超时、屏蔽警告与 yfinance 日志
+    """
+    global _RUNTIME_READY, _ORIGINAL_REQUEST
+    if _RUNTIME_READY:
+        return
+    _RUNTIME_READY = True
+
+    import requests
+    _ORIGINAL_REQUEST = requests.Session.request
+    requests.Session.request = _patched_request
+    socket.setdefaulttimeout(10)
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger('yfinance').setLevel(logging.CRITICAL)
+
+    if not SENDER_EMAIL:
+        print("⚠️ 警告: 未设置 SENDER_EMAIL 环境变量，邮件发送功能可能受限。")
+
+    refresh_dates()
+
+def refresh_dates():
+    """按当前时间重新计算报告/计算周期 (常驻进程跨日运行时使用)"""
+    global NOW_CN, REPORT_START_DATE, FETCH_START_DATE, END_DATE
+    NOW_CN = datetime.now(TZ_CN)
+    REPORT_START_DATE = (NOW_CN - timedelta(days=20)).strftime("%Y-%m-%d")
+    FETCH_START_DATE = (NOW_CN - timedelta(days=500)).strftime("%Y-%m-%d")
+    END_DATE = NOW_CN.strftime("%Y-%m-%d")
 
 # ------------------------------------------------
 # 任务组 1.1: 指数 (Indices)
@@ -158,11 +182,66 @@ TARGETS_STAR50_HOLDINGS = {
     "百利天恒": {"ak": "688506", "yf": "688506.SS", "type": "stock_zh_a"},
 }
 
-def get_all_kline_data():
+# 任务组: (组名 = market_klines 中的键, 目标配置, 均线分类)
+KLINE_GROUPS = [
+    ("指数", TARGETS_INDICES, "general"),
+    ("大宗商品", TARGETS_COMMODITIES, "commodities"),
+    ("恒生科技", TARGETS_HSTECH_TOP20, "general"),
+    ("新兴市场", TARGETS_VIETNAM_TOP10, "general"),
+    ("美股七巨头+台积电&博通&美光", TARGETS_US_MAG7, "general"),
+    ("港股创新药", TARGETS_HK_PHARMA, "general"),
+    # [Deleted] 恒生医疗保健指数 (已移除)
+    ("科创50ETF", TARGETS_STAR50_ETF, "general"),
+    ("科创50持仓", TARGETS_STAR50_HOLDINGS, "general"),
+]
+
+# 均线分区键 -> 报告 技术分析 中的分区名
+MA_SECTION_NAMES = {"general": "指数+个股日均线", "commodities": "大宗商品"}
+
+def ma_row_slots(market_klines=None):
+    """
+    均线行定位: {(组名, 名称): (技术分析分区名, 序号)}
+    均线行只有名称，同名标的 (如 中芯国际) 出现在多个任务组时，全量运行按任务组顺序输出，
+    因此同一分区中同名的第 k 行对应第 k 个包含该标的的任务组
+    market_klines: 报告中的 K线 ({组名: 行记录})，给出时只计入报告中存在的标的 (抓取失败的标的没有均线行)
+    """
+    present = None
+    if market_klines is not None:
+        present = {group_name: {r.get("name") for r in records} for group_name, records in market_klines.items() if isinstance(records, list)}
+    slots, seen = {}, {}
+    for group_name, targets, ma_key in KLINE_GROUPS:
+        for name in targets:
+            if present is not None and name not in present.get(group_name, ()):
+                continue
+            ordinal = seen.get((ma_key, name), 0)
+            slots[(group_name, name)] = (MA_SECTION_NAMES[ma_key], ordinal)
+            seen[(ma_key, name)] = ordinal + 1
+    return slots
+
+def shard_of(name, config, total):
+    """标的所属分片 (按 名称|ak|yf 的 crc32 取模，跨进程/机器稳定)"""
+    key = f"{name}|{config.get('ak') or ''}|{config.get('yf') or ''}"
+    return zlib.crc32(key.encode("utf-8")) % total
+
+def kline_meta():
+    """K线报告的 meta 信息"""
+    init_runtime()
+    return {
+        "generated_at": datetime.now(TZ_CN).strftime("%Y-%m-%d %H:%M:%S"),
+        "date_range": f"{REPORT_START_DATE} to {END_DATE}",
+        "description": "Global Market Data Consolidated Report"
+    }
+
+def get_all_kline_data(shard=None, select=None):
     """
     对外接口函数：执行所有K线抓取任务并返回 (data_collection, status_logs)
+    shard: (index, total) 时只抓取属于该分片的标的 (见 kline_shards.py)
+    select: 任务组名/标的名集合时只抓取选中的任务组或标的，未选中的任务组不出现在结果中 (见 selective_run.py)
     """
+    init_runtime()
     print(f"📅 多市场数据采集器 (MarketRadar - Module)")
+    if shard:
+        print(f"🧩 分片模式: {shard[0]}/{shard[1]}")
     print(f"🕒 报告周期: {REPORT_START_DATE} 至 {END_DATE}")
     print(f"🕒 计算周期: {FETCH_START_DATE} 至 {END_DATE}")
     
@@ -170,11 +249,7 @@ def get_all_kline_data():
     
     # 修改 ma_data 结构，分离 大宗商品 和 其他
     all_data_collection = {
-        "meta": {
-            "generated_at": datetime.now(TZ_CN).strftime("%Y-%m-%d %H:%M:%S"),
-            "date_range": f"{REPORT_START_DATE} to {END_DATE}",
-            "description": "Global Market Data Consolidated Report"
-        },
+        "meta": kline_meta(),
         "data": {},
         # 分离存储 MA 数据
         "ma_data": {
@@ -185,66 +260,47 @@ def get_all_kline_data():
 
     all_status_logs = []
 
-    # 1.1 抓取指数数据 (Indices)
-    data_idx, ma_idx, logs_idx = market_core.fetch_group_data(fetcher, TARGETS_INDICES, "指数", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["指数"] = data_idx
-    all_data_collection["ma_data"]["general"].extend(ma_idx)
-    all_status_logs.extend(logs_idx)
-
-    # 1.2 抓取大宗商品 (Commodities)
-    data_comm, ma_comm, logs_comm = market_core.fetch_group_data(fetcher, TARGETS_COMMODITIES, "大宗商品", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["大宗商品"] = data_comm
-    all_data_collection["ma_data"]["commodities"].extend(ma_comm)
-    all_status_logs.extend(logs_comm)
-
-    # 2. 抓取恒生科技
-    data_hstech, ma_hstech, logs_hstech = market_core.fetch_group_data(fetcher, TARGETS_HSTECH_TOP20, "恒生科技", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["恒生科技"] = data_hstech
-    all_data_collection["ma_data"]["general"].extend(ma_hstech)
-    all_status_logs.extend(logs_hstech)
-    
-    # 3. 抓取新兴市场
-    data_vn, ma_vn, logs_vn = market_core.fetch_group_data(fetcher, TARGETS_VIETNAM_TOP10, "新兴市场", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["新兴市场"] = data_vn
-    all_data_collection["ma_data"]["general"].extend(ma_vn)
-    all_status_logs.extend(logs_vn)
-    
-    # 4. 抓取美股七巨头 + 扩充
-    new_group_name = "美股七巨头+台积电&博通&美光"
-    data_us, ma_us, logs_us = market_core.fetch_group_data(fetcher, TARGETS_US_MAG7, new_group_name, REPORT_START_DATE, END_DATE)
-    all_data_collection["data"][new_group_name] = data_us
-    all_data_collection["ma_data"]["general"].extend(ma_us)
-    all_status_logs.extend(logs_us)
-    
-    # 5. 抓取港股创新药
-    data_hk, ma_hk, logs_hk = market_core.fetch_group_data(fetcher, TARGETS_HK_PHARMA, "港股创新药", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["港股创新药"] = data_hk
-    all_data_collection["ma_data"]["general"].extend(ma_hk)
-    all_status_logs.extend(logs_hk)
-    
-    # [Deleted] 6. 抓取恒生医疗保健指数 (已移除)
-
-    # 7. 抓取科创50 ETF
-    data_star_etf, ma_star_etf, logs_star_etf = market_core.fetch_group_data(fetcher, TARGETS_STAR50_ETF, "科创50ETF", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["科创50ETF"] = data_star_etf
-    all_data_collection["ma_data"]["general"].extend(ma_star_etf)
-    all_status_logs.extend(logs_star_etf)
-
-    # 8. 抓取科创50持仓
-    data_star_holdings, ma_star_holdings, logs_star_holdings = market_core.fetch_group_data(fetcher, TARGETS_STAR50_HOLDINGS, "科创50持仓", REPORT_START_DATE, END_DATE)
-    all_data_collection["data"]["科创50持仓"] = data_star_holdings
-    all_data_collection["ma_data"]["general"].extend(ma_star_holdings)
-    all_status_logs.extend(logs_star_holdings)
+    for group_name, targets, ma_key in KLINE_GROUPS:
+        if shard:
+            targets = {name: config for name, config in targets.items() if shard_of(name, config, shard[1]) == shard[0]}
+            if not targets:
+                all_data_collection["data"][group_name] = kline_table.KlineTable()
+                continue
+        if select is not None and group_name not in select:
+            targets = {name: config for name, config in targets.items() if name in select}
+            if not targets:
+                continue
+        data_group, ma_group, logs_group = market_core.fetch_group_data(fetcher, targets, group_name, REPORT_START_DATE, END_DATE)
+        all_data_collection["data"][group_name] = data_group
+        all_data_collection["ma_data"][ma_key].extend(ma_group)
+        all_status_logs.extend(logs_group)
     
     print("\n🎉 K线数据抓取 & 均线计算 任务处理完成！")
     return all_data_collection, all_status_logs
 
+def refresh_latest_klines():
+    """
+    盘中快速刷新: 各任务组基于已保存的日线只抓取最新K线
+    返回 ({组名: {名称: K线表}}, {组名: {名称: 均线+指标}}, status_logs)
+    均线按任务组返回，同名标的 (如 中芯国际) 在各自任务组的均线行中修补
+    """
+    init_runtime()
+    print(f"⚡ 快速刷新最新K线 (报告周期: {REPORT_START_DATE} 至 {END_DATE})")
+    klines_by_group, mas_by_group, all_status_logs = {}, {}, []
+    for group_name, targets, _ in KLINE_GROUPS:
+        klines, group_mas, logs = market_core.refresh_latest_group(targets, REPORT_START_DATE, END_DATE)
+        klines_by_group[group_name] = klines
+        mas_by_group[group_name] = group_mas
+        all_status_logs.extend(logs)
+        print(f"   {group_name}: {len(klines)}/{len(targets)} 个标的已刷新")
+    return klines_by_group, mas_by_group, all_status_logs
+
 def send_email(subject, body, attachment_files):
-    market_core.send_email(subject, body, attachment_files, SENDER_EMAIL, SENDER_PASSWORD, RECEIVER_EMAIL, SMTP_SERVER, SMTP_PORT, ENABLE_EMAIL)
+    return market_core.send_email(subject, body, attachment_files, SENDER_EMAIL, SENDER_PASSWORD, RECEIVER_EMAIL, SMTP_SERVER, SMTP_PORT, ENABLE_EMAIL)
 
 if __name__ == "__main__":
     data, _ = get_all_kline_data()
     output_filename = "金融数据.json"
     with open(output_filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+        json.dump(kline_table.materialize(data), f, ensure_ascii=False, indent=4)
     print(f"✅ 数据已保存至 {output_filename}")
\ No newline at end of file
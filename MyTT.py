@@ -10,10 +10,16 @@
 # V2.92 2021-11-30 新增 BARSSINCEN函数,现在可以 pip install MyTT 完成安装   
 # V3.0  2021-12-04 改进 DMA函数支持序列,新增XS2 薛斯通道II指标
 # V3.1  2021-12-19 新增 TOPRANGE,LOWRANGE一级函数
+# V3.2  MarketRadar  核心函数支持2D面板输入 (行=K线, 列=标的), 沿时间轴计算, 一次调用处理整组标的
+# V3.3  MarketRadar  新增尾部求值 (*_TAIL) 函数: 只读取计算最新T个值所需的尾部K线, 耗时与历史长度无关
   
 
 #以下所有函数如无特别说明，输入参数S均为numpy序列或者列表list，N为整型int
 #应用层1级函数完美兼容通达信或同花顺，具体使用方法请参考通达信
+#面板模式: MA,EMA,SMA,HHV,LLV,REF,DIFF,STD,SUM 及 MACD,KDJ,RSI,BOLL,ATR,DMI 也接受2D数组 (K线数 × 标的数)，按列(时间轴)独立计算
+#尾部求值: *_TAIL(...,T) 只返回最新T个值。窗口类(MA,HHV,LLV)只读最后N+T-1根K线, 结果与全序列一致;
+#         递归类(EMA,SMA 及 MACD,KDJ,RSI)从 WARMUP 根预热K线开始递推, 被截掉的历史权重 (1-alpha)^k <= TAIL_EPS,
+#         截断误差 <= 嵌套层数 × TAIL_EPS × 序列振幅(max-min); 历史不足预热长度时等同全序列计算
 
 import numpy as np; import pandas as pd
 
@@ -27,28 +33,29 @@ def SQRT(S):     return np.sqrt(S)           #求S的平方根
 def MAX(S1,S2):  return np.maximum(S1,S2)    #序列max
 def MIN(S1,S2):  return np.minimum(S1,S2)    #序列min
 def IF(S,A,B):   return np.where(S,A,B)      #序列布尔判断 return=A  if S==True  else  B
+def PD(S):       return pd.DataFrame(S) if np.ndim(S)==2 else pd.Series(S)    #1D转Series, 2D面板(K线×标的)转DataFrame, 沿时间轴计算
 
 
 def REF(S, N=1):          #对序列整体下移动N,返回序列(shift后会产生NAN)    
-    return pd.Series(S).shift(N).values  
+    return PD(S).shift(N).values  
 
 def DIFF(S, N=1):         #前一个值减后一个值,前面会产生nan 
-    return pd.Series(S).diff(N).values     #np.diff(S)直接删除nan，会少一行
+    return PD(S).diff(N).values     #np.diff(S)直接删除nan，会少一行
 
 def STD(S,N):             #求序列的N日标准差，返回序列    
-    return  pd.Series(S).rolling(N).std(ddof=0).values     
+    return  PD(S).rolling(N).std(ddof=0).values     
 
 def SUM(S, N):            #对序列求N天累计和，返回序列    N=0对序列所有依次求和         
-    return pd.Series(S).rolling(N).sum().values if N>0 else pd.Series(S).cumsum().values  
+    return PD(S).rolling(N).sum().values if N>0 else PD(S).cumsum().values  
 
 def CONST(S):             #返回序列S最后的值组成常量序列
-    return np.full(len(S),S[-1])
+    return np.full(np.shape(S),S[-1])
   
 def HHV(S,N):             #HHV(C, 5) 最近5天收盘最高价        
-    return pd.Series(S).rolling(N).max().values     
+    return PD(S).rolling(N).max().values     
 
 def LLV(S,N):             #LLV(C, 5) 最近5天收盘最低价     
-    return pd.Series(S).rolling(N).min().values    
+    return PD(S).rolling(N).min().values    
     
 def HHVBARS(S,N):         #求N周期内S最高值到当前周期数, 返回序列
     return pd.Series(S).rolling(N).apply(lambda x: np.argmax(x[::-1]),raw=True).values 
@@ -57,13 +64,13 @@ def LLVBARS(S,N):         #求N周期内S最低值到当前周期数, 返回序
     return pd.Series(S).rolling(N).apply(lambda x: np.argmin(x[::-1]),raw=True).values    
   
 def MA(S,N):              #求序列的N日简单移动平均值，返回序列                    
-    return pd.Series(S).rolling(N).mean().values  
+    return PD(S).rolling(N).mean().values  
   
 def EMA(S,N):             #指数移动平均,为了精度 S>4*N  EMA至少需要120周期     alpha=2/(span+1)    
-    return pd.Series(S).ewm(span=N, adjust=False).mean().values     
+    return PD(S).ewm(span=N, adjust=False).mean().values     
 
 def SMA(S, N, M=1):       #中国式的SMA,至少需要120周期才精确 (雪球180周期)    alpha=1/(1+com)    
-    return pd.Series(S).ewm(alpha=M/N,adjust=False).mean().values           #com=N-M/M
+    return PD(S).ewm(alpha=M/N,adjust=False).mean().values           #com=N-M/M
 
 def WMA(S, N):            #通达信S序列的N日加权移动平均 Yn = (1*X1+2*X2+3*X3+...+n*Xn)/(1+2+3+...+Xn)
     return pd.Series(S).rolling(N).apply(lambda x:x[::-1].cumsum().sum()*2/N/(N+1),raw=True).values 
@@ -114,7 +121,7 @@ def BARSSINCEN(S, N):                  # N周期内第一次S条件成立到现
     return pd.Series(S).rolling(N).apply(lambda x:N-1-np.argmax(x) if np.argmax(x) or x[0] else 0,raw=True).fillna(0).values.astype(int)
   
 def CROSS(S1, S2):                     # 判断向上金叉穿越 CROSS(MA(C,5),MA(C,10))  判断向下死叉穿越 CROSS(MA(C,10),MA(C,5))   
-    return np.concatenate(([False], np.logical_not((S1>S2)[:-1]) & (S1>S2)[1:]))    # 不使用0级函数,移植方便  by jqz1226
+    X=np.asarray(S1>S2);   return np.concatenate((np.zeros((1,)+X.shape[1:],dtype=bool), np.logical_not(X[:-1]) & X[1:]))    # 不使用0级函数,移植方便  by jqz1226 (支持2D面板)
     
 def LONGCROSS(S1,S2,N):                # 两条线维持一定周期后交叉,S1在N周期内都小于S2,本周期从S1下方向上穿过S2时返回1,否则返回0         
     return  np.array(np.logical_and(LAST(S1<S2,N,1),(S1>S2)),dtype=bool)            # N=1时等同于CROSS(S1, S2)
@@ -273,6 +280,43 @@ def XSII(CLOSE, HIGH, LOW, N=102, M=7):              #薛斯通道II
     return TD1, TD2, TD3, TD4  
   
   
+#------------------   尾部求值函数 (latest-N, 只返回最新T个值) ------------------------------
+TAIL_EPS=1e-8                          #递归类指标被截掉的历史权重上限, 1e-8 × 振幅远小于 RD 保留的3位小数
+
+def TAIL(S, N):                        #序列最后N个值 (2D面板取最后N行)
+    return np.asarray(S)[-N:] if N>0 else np.asarray(S)[:0]
+
+def WARMUP(ALPHA, EPS=TAIL_EPS):       #递推 Y=ALPHA*X+(1-ALPHA)*REF(Y) 需要的预热K线数: (1-ALPHA)^k <= EPS
+    return int(np.ceil(np.log(EPS)/np.log(1-ALPHA))) if 0<ALPHA<1 else 1
+
+def MA_TAIL(S, N, T=1):                #MA 最新T个值, 只读最后N+T-1根
+    return MA(TAIL(S,N+T-1),N)[-T:]
+
+def HHV_TAIL(S, N, T=1):               #HHV 最新T个值
+    return HHV(TAIL(S,N+T-1),N)[-T:]
+
+def LLV_TAIL(S, N, T=1):               #LLV 最新T个值
+    return LLV(TAIL(S,N+T-1),N)[-T:]
+
+def EMA_TAIL(S, N, T=1):               #EMA 最新T个值, 从 WARMUP(2/(N+1)) 根预热K线开始递推
+    return EMA(TAIL(S,WARMUP(2/(N+1))+T),N)[-T:]
+
+def SMA_TAIL(S, N, M=1, T=1):          #中国式SMA 最新T个值, 从 WARMUP(M/N) 根预热K线开始递推
+    return SMA(TAIL(S,WARMUP(M/N)+T),N,M)[-T:]
+
+def MACD_TAIL(CLOSE,SHORT=12,LONG=26,M=9,T=1):          #DEA 递推在 DIF 之上, 两段预热相加 (默认约 320 根)
+    DIF,DEA,BAR=MACD(TAIL(CLOSE,WARMUP(2/(LONG+1))+WARMUP(2/(M+1))+T),SHORT,LONG,M)
+    return DIF[-T:],DEA[-T:],BAR[-T:]
+
+def KDJ_TAIL(CLOSE,HIGH,LOW,N=9,M1=3,M2=3,T=1):         #RSV 窗口 N-1 根 + K、D 两段预热 (默认约 100 根)
+    L=N-1+WARMUP(2/(M1*2))+WARMUP(2/(M2*2))+T
+    K,D,J=KDJ(TAIL(CLOSE,L),TAIL(HIGH,L),TAIL(LOW,L),N,M1,M2)
+    return K[-T:],D[-T:],J[-T:]
+
+def RSI_TAIL(CLOSE, N=24, T=1):                         #差分 1 根 + SMA 预热 (N=6 约 100 根)
+    return RSI(TAIL(CLOSE,1+WARMUP(1/N)+T),N)[-T:]
+
+
   #望大家能提交更多指标和函数  https://github.com/mpquant/MyTT
 
   
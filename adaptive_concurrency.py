@@ -0,0 +1,254 @@
+# adaptive_concurrency.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Adaptive Concurrency (AIMD)
+# -----------------------------------------------------------------------------
+# 按上游表现与机器资源动态调整并发数:
+#   - 加性增: 一个评估窗口内延迟平稳、错误率低、无内存压力时 +1
+#   - 乘性减: 出现限流/超时立即减半；错误率过高或 Chrome 子进程 RSS / 系统可用内存触及阈值时减半
+#   - 延迟明显升高时保持不变
+# 并发数始终限制在 [floor, ceiling] 内；ceiling 默认按 CPU 核数与可用内存估算，
+# 大机器能用满，小 CI 机器保持安全。
+#
+# 环境变量:
+#   ADAPTIVE_CONCURRENCY=0       关闭自适应 (固定使用初始并发数)
+#   MACRO_WORKERS_MIN / MAX      宏观爬虫并发下限/上限
+#   FETCH_WORKERS_MIN / MAX      K线抓取并发下限/上限
+#   MACRO_CHROME_RSS_MB          Chrome 子进程总 RSS 上限 (MB)
+#   MIN_AVAILABLE_MB             系统可用内存低于该值视为内存压力 (默认 512)
+# -----------------------------------------------------------------------------
+
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from statistics import median
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ENABLE_ADAPTIVE = os.environ.get("ADAPTIVE_CONCURRENCY", "1") != "0"
+MIN_AVAILABLE_MB = int(os.environ.get("MIN_AVAILABLE_MB", "512"))
+CHROME_RSS_BUDGET_MB = int(os.environ.get("MACRO_CHROME_RSS_MB", "0")) or None
+
+# 状态码前后不能紧邻数字，避免匹配到股票代码 (如 603429) 中的 429/403
+_THROTTLE_PATTERN = re.compile(r"(?<!\d)(?:429|403)(?!\d)|too many|rate.?limit|timed? ?out|timeout|限流|超时|频繁", re.IGNORECASE)
+
+def is_throttle_error(error_msg):
+    """错误信息是否表明被限流或超时"""
+    return bool(error_msg) and bool(_THROTTLE_PATTERN.search(str(error_msg)))
+
+# ==============================================================================
+# 内存探测 (psutil 可选，缺失时读取 /proc)
+# ==============================================================================
+
+def _proc_children(root_pid):
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # comm 可能包含空格，ppid 位于右括号之后第二个字段
+            parents[int(entry)] = (int(stat[stat.rindex(")") + 2:].split()[1]), stat[stat.index("(") + 1:stat.rindex(")")])
+        except (OSError, ValueError):
+            continue
+
+    found, frontier = {}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, (ppid, comm) in parents.items():
+            if ppid == pid and child not in found:
+                found[child] = comm
+                frontier.append(child)
+    return found
+
+def _proc_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def chrome_rss_mb():
+    """当前进程下所有 Chrome / chromedriver 子进程的 RSS 合计 (MB)"""
+    if psutil is not None:
+        total = 0
+        try:
+            for child in psutil.Process().children(recursive=True):
+                try:
+                    if "chrom" in child.name().lower():
+                        total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+        except psutil.Error:
+            return 0.0
+        return total / 1024 / 1024
+    if not os.path.isdir("/proc"):
+        return 0.0
+    return sum(_proc_rss_mb(pid) for pid, comm in _proc_children(os.getpid()).items() if "chrom" in comm.lower())
+
+def available_memory_mb():
+    """系统可用内存 (MB)，无法获取时返回 None"""
+    if psutil is not None:
+        return psutil.virtual_memory().available / 1024 / 1024
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def default_ceiling(per_worker_mb, hard_cap):
+    """按 CPU 核数与可用内存估算并发上限"""
+    by_cpu = (os.cpu_count() or 2) * 2
+    available = available_memory_mb()
+    by_memory = int((available - MIN_AVAILABLE_MB) // per_worker_mb) if available else hard_cap
+    return max(1, min(hard_cap, by_cpu, by_memory))
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+# ==============================================================================
+# AIMD 并发控制器
+# ==============================================================================
+
+class AdaptiveLimiter:
+    """
+    动态并发闸门: 任务在 slot() 中执行，结束后 record() 上报耗时与结果
+    配合 max_workers=max_workers 的线程池使用，线程池负责上限，本类控制实际同时运行数
+    """
+    def __init__(self, name, initial, floor=1, ceiling=8, window=4, error_threshold=0.25,
+                 latency_tolerance=1.5, decrease_factor=0.5, watch_chrome=False,
+                 rss_budget_mb=CHROME_RSS_BUDGET_MB, enabled=None):
+        self.name = name
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.enabled = ENABLE_ADAPTIVE if enabled is None else enabled
+        self.limit = min(max(initial, self.floor), self.ceiling)
+        self.window = window
+        self.error_threshold = error_threshold
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.watch_chrome = watch_chrome
+        self.rss_budget_mb = rss_budget_mb
+        self.in_flight = 0
+        self.baseline = None
+        self.history = []  # [(时间, 并发数, 原因)]
+        self._samples = []
+        self._next_ticket = 0
+        self._serving = 0
+        self._cond = threading.Condition()
+
+    @property
+    def max_workers(self):
+        """线程池大小: 关闭自适应时即为固定并发数"""
+        return self.ceiling if self.enabled else self.limit
+
+    # ---------------- 闸门 ----------------
+    def acquire(self):
+        """按到达顺序放行 (FIFO)，保证调度器给出的任务顺序不被唤醒顺序打乱"""
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving or self.in_flight >= self.limit:
+                self._cond.wait()
+            self._serving += 1
+            self.in_flight += 1
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ---------------- 反馈 ----------------
+    def memory_pressure(self):
+        """返回内存压力原因，无压力时返回 None"""
+        available = available_memory_mb()
+        if available is not None and available < MIN_AVAILABLE_MB:
+            return f"可用内存 {available:.0f}MB"
+        if self.watch_chrome and self.rss_budget_mb:
+            rss = chrome_rss_mb()
+            if rss > self.rss_budget_mb:
+                return f"Chrome RSS {rss:.0f}MB"
+        return None
+
+    def record(self, latency, ok=True, throttled=False):
+        if not self.enabled:
+            return
+        with self._cond:
+            if throttled:
+                self._samples = []
+                self._decrease("限流/超时")
+                return
+            self._samples.append((latency, ok))
+            if len(self._samples) < max(self.window, self.limit):
+                return
+            samples, self._samples = self._samples, []
+
+        latencies = [lat for lat, success in samples if success]
+        error_rate = 1 - len(latencies) / len(samples)
+        pressure = self.memory_pressure()
+
+        with self._cond:
+            if pressure:
+                self._decrease(pressure)
+            elif error_rate > self.error_threshold:
+                self._decrease(f"错误率 {error_rate:.0%}")
+            elif latencies:
+                current = median(latencies)
+                if self.baseline is None:
+                    self.baseline = current
+                if current <= self.baseline * self.latency_tolerance:
+                    self._increase()
+                # 基线缓慢跟随，避免一次偶然的快速窗口永久压低基线
+                self.baseline = min(current, self.baseline * 1.05)
+
+    def _increase(self):
+        if self.limit < self.ceiling:
+            self.limit += 1
+            self._log("延迟平稳")
+            self._cond.notify_all()
+
+    def _decrease(self, reason):
+        new_limit = max(self.floor, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self._log(reason)
+
+    def _log(self, reason):
+        self.history.append((time.time(), self.limit, reason))
+        print(f"🎚️ [{self.name}] 并发调整 -> {self.limit} ({reason})")
+
+def macro_limiter(initial=2, hard_cap=None):
+    """宏观爬虫 (每个 worker 一个 Chrome，约 300MB)；未配置 RSS 上限时取启动时可用内存的 70%"""
+    ceiling = _env_int("MACRO_WORKERS_MAX", hard_cap or default_ceiling(per_worker_mb=300, hard_cap=8))
+    rss_budget = CHROME_RSS_BUDGET_MB
+    if rss_budget is None:
+        available = available_memory_mb()
+        rss_budget = int(available * 0.7) if available else None
+    return AdaptiveLimiter("MacroScraper", initial=initial, floor=_env_int("MACRO_WORKERS_MIN", 1),
+                           ceiling=ceiling, watch_chrome=True, rss_budget_mb=rss_budget)
+
+def fetch_limiter():
+    """K线抓取 (HTTP 请求 + 指标计算)"""
+    ceiling = _env_int("FETCH_WORKERS_MAX", default_ceiling(per_worker_mb=100, hard_cap=12))
+    return AdaptiveLimiter("KlineFetcher", initial=4, floor=_env_int("FETCH_WORKERS_MIN", 1), ceiling=ceiling)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+MarketRadar/benchmark_indicators.py
+指标计算微基准 (Micro-benchmark)：
+1. 生成不同长度 (1e3 ~ 1e6 根K线) 与不同面板宽度 (标的数) 的合成 OHLCV 数据
+2. 对 MyTT 全部公开函数、utils.calculate_ma、market_core.calculate_tech_indicators 计时
+3. 记录耗时 (wall time) 与峰值内存 (tracemalloc)，结果写入 JSON
+4. --compare 与保存的基线对比，标记变慢的条目 (退出码 1)
+
+用法:
+    python benchmark_indicators.py                                  # 全量跑, 写入 benchmark_results.json
+    python benchmark_indicators.py --sizes 1000 10000 --widths 1 10
+    python benchmark_indicators.py --output baseline.json           # 保存为基线
+    python benchmark_indicators.py --compare baseline.json --threshold 1.25
+"""
+
+import argparse
+import inspect
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import MyTT
+import utils
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_WIDTHS = [1, 10, 100]
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+# 单次用例最多处理的数据格数 (K线数 × 标的数)，防止 1e6 × 100 这类组合撑爆内存
+MAX_CELLS = 20_000_000
+
+# 含 Python 循环 / rolling.apply 的函数，超过该K线数直接跳过 (TOPRANGE/LOWRANGE 为 O(n²))
+SLOW_FUNC_MAX_BARS = {
+    "HHVBARS": 100_000, "LLVBARS": 100_000, "WMA": 100_000, "AVEDEV": 10_000,
+    "SLOPE": 10_000, "FORCAST": 10_000, "LAST": 100_000, "BARSSINCEN": 100_000,
+    "FILTER": 100_000, "BARSLAST": 100_000, "BARSLASTCOUNT": 100_000,
+    "TOPRANGE": 10_000, "LOWRANGE": 10_000, "LONGCROSS": 100_000,
+    "DMA": 1_000_000, "CCI": 10_000, "XSII": 1_000_000,
+}
+
+# 支持 2D 面板输入的 MyTT 函数 (见 MyTT.py 头部说明)
+PANEL_FUNCS = {"MA", "EMA", "SMA", "HHV", "LLV", "REF", "DIFF", "STD", "SUM",
+               "MACD", "KDJ", "RSI", "BOLL", "ATR", "DMI", "CROSS",
+               "TAIL", "MA_TAIL", "HHV_TAIL", "LLV_TAIL", "EMA_TAIL", "SMA_TAIL", "MACD_TAIL", "KDJ_TAIL", "RSI_TAIL"}
+
+# MyTT 函数调用方式: d 为合成数据字典 (close/open/high/low/vol/cond)
+MYTT_CALLS = {
+    "RD":            lambda d: MyTT.RD(d["close"]),
+    "RET":           lambda d: MyTT.RET(d["close"]),
+    "ABS":           lambda d: MyTT.ABS(d["close"]),
+    "LN":            lambda d: MyTT.LN(d["close"]),
+    "POW":           lambda d: MyTT.POW(d["close"], 2),
+    "SQRT":          lambda d: MyTT.SQRT(d["close"]),
+    "MAX":           lambda d: MyTT.MAX(d["close"], d["open"]),
+    "MIN":           lambda d: MyTT.MIN(d["close"], d["open"]),
+    "IF":            lambda d: MyTT.IF(d["cond"], d["close"], d["open"]),
+    "PD":            lambda d: MyTT.PD(d["close"]),
+    "REF":           lambda d: MyTT.REF(d["close"], 1),
+    "DIFF":          lambda d: MyTT.DIFF(d["close"], 1),
+    "STD":           lambda d: MyTT.STD(d["close"], 20),
+    "SUM":           lambda d: MyTT.SUM(d["close"], 20),
+    "CONST":         lambda d: MyTT.CONST(d["close"]),
+    "HHV":           lambda d: MyTT.HHV(d["high"], 20),
+    "LLV":           lambda d: MyTT.LLV(d["low"], 20),
+    "HHVBARS":       lambda d: MyTT.HHVBARS(d["high"], 20),
+    "LLVBARS":       lambda d: MyTT.LLVBARS(d["low"], 20),
+    "MA":            lambda d: MyTT.MA(d["close"], 20),
+    "EMA":           lambda d: MyTT.EMA(d["close"], 20),
+    "SMA":           lambda d: MyTT.SMA(d["close"], 20),
+    "WMA":           lambda d: MyTT.WMA(d["close"], 20),
+    "DMA":           lambda d: MyTT.DMA(d["close"], 0.1),
+    "AVEDEV":        lambda d: MyTT.AVEDEV(d["close"], 20),
+    "SLOPE":         lambda d: MyTT.SLOPE(d["close"], 20),
+    "FORCAST":       lambda d: MyTT.FORCAST(d["close"], 20),
+    "LAST":          lambda d: MyTT.LAST(d["cond"], 5, 1),
+    "COUNT":         lambda d: MyTT.COUNT(d["cond"], 10),
+    "EVERY":         lambda d: MyTT.EVERY(d["cond"], 5),
+    "EXIST":         lambda d: MyTT.EXIST(d["cond"], 5),
+    "FILTER":        lambda d: MyTT.FILTER(d["cond"].copy(), 5),
+    "BARSLAST":      lambda d: MyTT.BARSLAST(d["cond"]),
+    "BARSLASTCOUNT": lambda d: MyTT.BARSLASTCOUNT(d["cond"]),
+    "BARSSINCEN":    lambda d: MyTT.BARSSINCEN(d["cond"], 10),
+    "CROSS":         lambda d: MyTT.CROSS(d["close"], d["open"]),
+    "LONGCROSS":     lambda d: MyTT.LONGCROSS(d["close"], d["open"], 5),
+    "VALUEWHEN":     lambda d: MyTT.VALUEWHEN(d["cond"], d["close"]),
+    "BETWEEN":       lambda d: MyTT.BETWEEN(d["close"], d["low"], d["high"]),
+    "TOPRANGE":      lambda d: MyTT.TOPRANGE(d["high"]),
+    "LOWRANGE":      lambda d: MyTT.LOWRANGE(d["low"]),
+    "MACD":          lambda d: MyTT.MACD(d["close"]),
+    "KDJ":           lambda d: MyTT.KDJ(d["close"], d["high"], d["low"]),
+    "RSI":           lambda d: MyTT.RSI(d["close"], 6),
+    "WR":            lambda d: MyTT.WR(d["close"], d["high"], d["low"]),
+    "BIAS":          lambda d: MyTT.BIAS(d["close"]),
+    "BOLL":          lambda d: MyTT.BOLL(d["close"]),
+    "PSY":           lambda d: MyTT.PSY(d["close"]),
+    "CCI":           lambda d: MyTT.CCI(d["close"], d["high"], d["low"]),
+    "ATR":           lambda d: MyTT.ATR(d["close"], d["high"], d["low"]),
+    "BBI":           lambda d: MyTT.BBI(d["close"]),
+    "DMI":           lambda d: MyTT.DMI(d["close"], d["high"], d["low"]),
+    "TAQ":           lambda d: MyTT.TAQ(d["high"], d["low"], 20),
+    "KTN":           lambda d: MyTT.KTN(d["close"], d["high"], d["low"]),
+    "TRIX":          lambda d: MyTT.TRIX(d["close"]),
+    "VR":            lambda d: MyTT.VR(d["close"], d["vol"]),
+    "EMV":           lambda d: MyTT.EMV(d["high"], d["low"], d["vol"]),
+    "DPO":           lambda d: MyTT.DPO(d["close"]),
+    "BRAR":          lambda d: MyTT.BRAR(d["open"], d["close"], d["high"], d["low"]),
+    "DFMA":          lambda d: MyTT.DFMA(d["close"]),
+    "MTM":           lambda d: MyTT.MTM(d["close"]),
+    "MASS":          lambda d: MyTT.MASS(d["high"], d["low"]),
+    "ROC":           lambda d: MyTT.ROC(d["close"]),
+    "EXPMA":         lambda d: MyTT.EXPMA(d["close"]),
+    "OBV":           lambda d: MyTT.OBV(d["close"], d["vol"]),
+    "MFI":           lambda d: MyTT.MFI(d["close"], d["high"], d["low"], d["vol"]),
+    "ASI":           lambda d: MyTT.ASI(d["open"], d["close"], d["high"], d["low"]),
+    "XSII":          lambda d: MyTT.XSII(d["close"], d["high"], d["low"]),
+    "TAIL":          lambda d: MyTT.TAIL(d["close"], 20),
+    "WARMUP":        lambda d: MyTT.WARMUP(2 / 27),
+    "MA_TAIL":       lambda d: MyTT.MA_TAIL(d["close"], 20, 2),
+    "HHV_TAIL":      lambda d: MyTT.HHV_TAIL(d["high"], 20, 2),
+    "LLV_TAIL":      lambda d: MyTT.LLV_TAIL(d["low"], 20, 2),
+    "EMA_TAIL":      lambda d: MyTT.EMA_TAIL(d["close"], 20, 2),
+    "SMA_TAIL":      lambda d: MyTT.SMA_TAIL(d["close"], 20, T=2),
+    "MACD_TAIL":     lambda d: MyTT.MACD_TAIL(d["close"], T=2),
+    "KDJ_TAIL":      lambda d: MyTT.KDJ_TAIL(d["close"], d["high"], d["low"], T=2),
+    "RSI_TAIL":      lambda d: MyTT.RSI_TAIL(d["close"], 6, T=2),
+}
+
+def generate_ohlcv(bars, width=1, seed=42):
+    """
+    生成合成 OHLCV 数据 (几何随机游走)
+    width == 1 返回 1D 数组, width > 1 返回 (bars, width) 面板
+    """
+    rng = np.random.default_rng(seed)
+    shape = (bars,) if width == 1 else (bars, width)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, shape), axis=0))
+    open_ = close * (1 + rng.normal(0, 0.003, shape))
+    high = np.maximum(close, open_) * (1 + rng.random(shape) * 0.01)
+    low = np.minimum(close, open_) * (1 - rng.random(shape) * 0.01)
+    vol = rng.integers(1_000, 1_000_000, shape).astype(float)
+    return {"close": close, "open": open_, "high": high, "low": low, "vol": vol, "cond": close > open_}
+
+def to_frame(data, width=1):
+    """把合成数据转换为 utils / market_core 使用的长表 DataFrame (date, name, OHLCV)"""
+    bars = data["close"].shape[0]
+    dates = pd.date_range("2000-01-03", periods=bars, freq="D")
+    if width == 1:
+        return pd.DataFrame({"date": dates, "name": "SYN0", "open": data["open"], "close": data["close"],
+                             "high": data["high"], "low": data["low"], "volume": data["vol"]})
+    return pd.DataFrame({
+        "date": np.tile(dates, width),
+        "name": np.repeat([f"SYN{i}" for i in range(width)], bars),
+        "open": data["open"].T.ravel(), "close": data["close"].T.ravel(),
+        "high": data["high"].T.ravel(), "low": data["low"].T.ravel(), "volume": data["vol"].T.ravel(),
+    })
+
+def measure(func, repeat=3):
+    """返回 (最佳耗时秒, 峰值内存MB)；峰值内存单独跑一次 tracemalloc，避免干扰计时"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+def build_cases(sizes, widths):
+    """
+    生成基准用例列表: (用例名, K线数, 宽度, 数据准备函数, 被测函数构造器)
+    """
+    cases = []
+
+    public_funcs = [n for n, f in inspect.getmembers(MyTT, inspect.isfunction)
+                    if n.isupper() and f.__module__ == MyTT.__name__]
+    missing = sorted(set(public_funcs) - set(MYTT_CALLS))
+    if missing:
+        print(f"⚠️ 以下 MyTT 函数未配置基准调用方式, 已跳过: {missing}")
+
+    for fname in public_funcs:
+        if fname not in MYTT_CALLS:
+            continue
+        fn_widths = widths if fname in PANEL_FUNCS else [1]
+        for bars in sizes:
+            for width in fn_widths:
+                cases.append((f"MyTT.{fname}", bars, width, "mytt", MYTT_CALLS[fname]))
+
+    for bars in sizes:
+        for width in widths:
+            cases.append(("utils.calculate_ma", bars, width, "frame",
+                          lambda df: utils.calculate_ma(df)))
+        cases.append(("market_core.calculate_tech_indicators", bars, 1, "frame", None))
+    return cases
+
+def run_benchmarks(sizes, widths, repeat=3, max_cells=MAX_CELLS):
+    results = []
+    data_cache = {}
+
+    try:
+        import market_core
+        tech_func = market_core.calculate_tech_indicators
+        tech_err = None
+    except ImportError as e:
+        # market_core 依赖 akshare/yfinance，缺失时只跳过该项
+        tech_func = None
+        tech_err = f"import market_core failed: {e}"
+
+    for case_name, bars, width, kind, call in build_cases(sizes, widths):
+        record = {"name": case_name, "bars": bars, "width": width}
+        short_name = case_name.split(".")[-1]
+
+        if bars * width > max_cells:
+            record.update({"status": "skipped", "reason": f"cells > {max_cells}"})
+            results.append(record)
+            continue
+        if kind == "mytt" and bars > SLOW_FUNC_MAX_BARS.get(short_name, float("inf")):
+            record.update({"status": "skipped", "reason": f"slow function, bars > {SLOW_FUNC_MAX_BARS[short_name]}"})
+            results.append(record)
+            continue
+        if case_name == "market_core.calculate_tech_indicators":
+            if tech_func is None:
+                record.update({"status": "skipped", "reason": tech_err})
+                results.append(record)
+                continue
+            call = tech_func
+
+        key = (bars, width)
+        if key not in data_cache:
+            data_cache.clear()
+            data_cache[key] = generate_ohlcv(bars, width)
+        data = data_cache[key]
+
+        try:
+            if kind == "mytt":
+                wall, peak = measure(lambda: call(data), repeat)
+            else:
+                df = to_frame(data, width)
+                wall, peak = measure(lambda: call(df), repeat)
+            record.update({"status": "ok", "wall_s": round(wall, 6), "peak_mb": round(peak, 3)})
+            print(f"   {case_name:<42} bars={bars:<8} width={width:<4} {wall*1000:>10.2f} ms  {peak:>9.2f} MB")
+        except Exception as e:
+            record.update({"status": "error", "reason": str(e)})
+            print(f"   ❌ {case_name} bars={bars} width={width}: {e}")
+        results.append(record)
+
+    return {
+        "meta": {
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare_results(current, baseline, threshold=1.2, min_wall=0.001):
+    """
+    与基线对比，返回变慢条目列表
+    threshold: 当前耗时 / 基线耗时 超过该比例视为退化
+    min_wall:  基线耗时低于该值 (秒) 的条目噪声太大，不参与判定
+    """
+    base_map = {(r["name"], r["bars"], r["width"]): r for r in baseline.get("results", []) if r.get("status") == "ok"}
+    regressions = []
+    for r in current.get("results", []):
+        if r.get("status") != "ok":
+            continue
+        base = base_map.get((r["name"], r["bars"], r["width"]))
+        if not base or base["wall_s"] < min_wall:
+            continue
+        ratio = r["wall_s"] / base["wall_s"]
+        if ratio > threshold:
+            regressions.append({
+                "name": r["name"], "bars": r["bars"], "width": r["width"],
+                "baseline_s": base["wall_s"], "current_s": r["wall_s"], "ratio": round(ratio, 2),
+            })
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MyTT / utils 指标计算微基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="K线数量列表")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS, help="面板宽度 (标的数) 列表")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数 (取最小耗时)")
+    parser.add_argument("--max-cells", type=int, default=MAX_CELLS, help="单个用例最大数据格数")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果输出文件 (JSON)")
+    parser.add_argument("--compare", help="基线结果文件，对比并标记变慢条目")
+    parser.add_argument("--threshold", type=float, default=1.2, help="判定退化的耗时比例")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️ 指标基准: sizes={args.sizes} widths={args.widths} repeat={args.repeat}")
+    current = run_benchmarks(args.sizes, args.widths, args.repeat, args.max_cells)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"💾 基准结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n🔴 发现 {len(regressions)} 项性能退化 (阈值 x{args.threshold}):")
+            for r in regressions:
+                print(f"   {r['name']} bars={r['bars']} width={r['width']}: "
+                      f"{r['baseline_s']*1000:.2f} ms -> {r['current_s']*1000:.2f} ms (x{r['ratio']})")
+            return 1
+        print(f"\n✅ 与基线 {args.compare} 对比无性能退化")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+MarketRadar/benchmark_startup.py
+启动 (导入) 耗时基准 (Import-time budget)：
+1. 在全新解释器中以 `python -X importtime` 执行各入口 (import main / main.py --help / 查询接口 等)
+2. 解析 importtime 输出，统计总导入耗时与最耗时的模块
+3. 与各入口的耗时预算 (STARTUP_CASES) 比较，并检查不应被导入的重依赖
+   (如不运行 Selenium 的路径不得导入 selenium，导入 main 不得导入 akshare/yfinance/smtplib)
+4. 超出预算或导入了禁止的模块时以退出码 1 结束
+
+用法:
+    python benchmark_startup.py                       # 全部入口, 每个重复 3 次取最小值
+    python benchmark_startup.py --cases main query_api --top 15
+    python benchmark_startup.py --budget-scale 2.0    # 较慢的机器上放宽预算
+    python benchmark_startup.py --output startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_FETCH_MODULES = ["selenium", "akshare", "yfinance", "smtplib"]
+
+# 入口 -> 执行方式 (code: python -c 代码 / argv: 脚本参数)、预算 (毫秒)、禁止导入的模块
+STARTUP_CASES = {
+    "main": {
+        "code": "import main",
+        "budget_ms": 900, "forbidden": HEAVY_FETCH_MODULES,
+    },
+    "main_cli_help": {
+        "argv": ["main.py", "--help"],
+        "budget_ms": 900, "forbidden": HEAVY_FETCH_MODULES,
+    },
+    # 不运行 Selenium 的抓取路径 (汇率/K线/越南指数/分时/银行)
+    "non_selenium_sources": {
+        "code": "import main, fetch_data, fetch_data_core, intraday_core, market_core, history_store, spot_snapshot",
+        "budget_ms": 1200, "forbidden": ["selenium"],
+    },
+    "query_api": {
+        "code": "import query_api",
+        "budget_ms": 250, "forbidden": ["pandas", "numpy"] + HEAVY_FETCH_MODULES,
+    },
+}
+
+# import time:  self [us] | cumulative | imported package
+_LINE_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)")
+
+def parse_importtime(stderr):
+    """返回 [(模块, 自身耗时us, 累计耗时us, 嵌套深度)]"""
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE_PATTERN.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+def measure_case(case):
+    """在全新解释器中执行一次入口，返回 importtime 解析结果"""
+    cmd = [sys.executable, "-X", "importtime"]
+    cmd += ["-c", case["code"]] if "code" in case else case["argv"]
+    proc = subprocess.run(cmd, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True, encoding="utf-8", errors="replace")
+    if proc.returncode != 0:
+        tail = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))[-500:]
+        raise RuntimeError(f"入口执行失败 (退出码 {proc.returncode}): {tail}")
+    return parse_importtime(proc.stderr)
+
+def run_case(name, case, repeat, top):
+    best = None
+    for _ in range(repeat):
+        rows = measure_case(case)
+        # 顶层导入 (深度 0) 的累计耗时之和即为总导入耗时
+        total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+
+    total_us, rows = best
+    imported = {module for module, _, _, _ in rows}
+    forbidden = [m for m in case.get("forbidden", []) if m in imported]
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[:top]
+    return {
+        "name": name,
+        "total_ms": round(total_us / 1000, 1),
+        "module_count": len(rows),
+        "forbidden_imported": forbidden,
+        "slowest": [{"module": m, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)} for m, s, c, _ in slowest],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MarketRadar 启动导入耗时基准")
+    parser.add_argument("--cases", nargs="+", choices=list(STARTUP_CASES), default=list(STARTUP_CASES), help="要测量的入口")
+    parser.add_argument("--repeat", type=int, default=3, help="每个入口重复次数 (取最小耗时)")
+    parser.add_argument("--top", type=int, default=10, help="列出累计耗时最高的模块数")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="预算倍数 (较慢的机器上放宽)")
+    parser.add_argument("--output", help="结果输出文件 (JSON)")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️ 启动基准: cases={args.cases} repeat={args.repeat}")
+    results, failures = [], []
+    for name in args.cases:
+        case = STARTUP_CASES[name]
+        result = run_case(name, case, args.repeat, args.top)
+        result["budget_ms"] = round(case["budget_ms"] * args.budget_scale, 1)
+        results.append(result)
+
+        over = result["total_ms"] > result["budget_ms"]
+        icon = "🔴" if over or result["forbidden_imported"] else "✅"
+        print(f"\n{icon} {name}: {result['total_ms']} ms / 预算 {result['budget_ms']} ms ({result['module_count']} 个模块)")
+        for row in result["slowest"]:
+            print(f"      {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+        if over:
+            failures.append(f"{name} 导入耗时 {result['total_ms']} ms 超出预算 {result['budget_ms']} ms")
+        if result["forbidden_imported"]:
+            failures.append(f"{name} 导入了不应导入的模块: {', '.join(result['forbidden_imported'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基准结果已写入: {args.output}")
+
+    if failures:
+        print(f"\n🔴 启动基准未通过:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print(f"\n✅ 全部入口均在预算内")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# browser_pool.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Multi-Tab Browser Pool
+# -----------------------------------------------------------------------------
+# 少量 Chrome 进程 x 每进程多个标签页: 每个抓取目标独占一个标签页 (window handle)，
+# 页面加载在各标签页中并行进行，WebDriver 命令按浏览器加锁串行下发 (先切换到本标签页)。
+#
+# TabDriver 对爬虫表现为一个普通 driver:
+#   - get() 通过 window.location 非阻塞导航，再以短命令轮询 readyState，轮询间隙释放浏览器锁
+#   - 元素对象同样经过代理，读取 text/属性前会切回所属标签页
+#   - quit() 只关闭本标签页；标签页出错不影响同一浏览器中的其他目标，浏览器崩溃时自动重建
+#   - performance 日志按浏览器读取后分发给各标签页，供 selenium_network 使用；
+#     所有活动标签页都已读过的日志即被丢弃，常驻守护进程中缓冲不会无限增长
+#
+# 用法: MACRO_TAB_POOL=1 MACRO_BROWSERS=2 MACRO_TABS_PER_BROWSER=4 python scrape_economy_selenium.py
+# -----------------------------------------------------------------------------
+
+import copy
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+
+ENABLE_TAB_POOL = os.environ.get("MACRO_TAB_POOL", "0") == "1"
+BROWSERS = int(os.environ.get("MACRO_BROWSERS", "2"))
+TABS_PER_BROWSER = int(os.environ.get("MACRO_TABS_PER_BROWSER", "4"))
+POLL_INTERVAL = 0.25
+
+# 多标签页并行时避免后台标签页被节流
+TAB_POOL_ARGS = [
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+    "--window-size=1920,1080",
+]
+
+_NAV_MARK_JS = "window.__radarNav = 1; window.location.href = arguments[0];"
+_NAV_STATE_JS = "return [window.__radarNav === 1, document.readyState];"
+
+class _Browser:
+    """一个 Chrome 进程及其命令锁"""
+    def __init__(self, index, chrome_options):
+        self.index = index
+        self.driver = webdriver.Chrome(options=chrome_options)
+        self.lock = threading.RLock()
+        self.current = self.driver.current_window_handle
+        self.home = self.current  # 初始标签页保持打开，保证关闭其他标签页后会话仍然存活
+        self.active = 0
+        self.broken = False
+        self.log_entries = []   # 尚未被所有活动标签页读过的日志
+        self.log_base = 0       # log_entries[0] 的全局序号
+        self.log_cursors = {}   # 活动标签页 -> 下一条待读日志的全局序号
+
+    def switch(self, handle):
+        if self.current != handle:
+            self.driver.switch_to.window(handle)
+            self.current = handle
+
+    def log_end(self):
+        return self.log_base + len(self.log_entries)
+
+    def pull_log(self, log_type):
+        """读取浏览器级日志并追加到共享缓冲，返回缓冲末尾的全局序号"""
+        self.log_entries.extend(self.driver.get_log(log_type))
+        return self.log_end()
+
+    def read_log(self, handle, end):
+        """标签页按各自游标消费共享缓冲 [游标, end)"""
+        start = self.log_cursors.get(handle, end)
+        entries = self.log_entries[start - self.log_base:end - self.log_base]
+        self.log_cursors[handle] = end
+        self.trim_log()
+        return entries
+
+    def open_tab(self, handle):
+        self.log_cursors[handle] = self.log_end()
+
+    def close_tab(self, handle):
+        self.log_cursors.pop(handle, None)
+        self.trim_log()
+
+    def trim_log(self):
+        """丢弃所有活动标签页都已读过的日志 (没有活动标签页时清空)"""
+        floor = min(self.log_cursors.values(), default=self.log_end())
+        if floor > self.log_base:
+            del self.log_entries[:floor - self.log_base]
+            self.log_base = floor
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+class _TabElement:
+    """WebElement 代理: 每次访问前切回所属标签页"""
+    def __init__(self, tab, element):
+        self._tab = tab
+        self._element = element
+
+    def __getattr__(self, attr):
+        value = self._tab._locked(lambda d: getattr(self._element, attr))
+        if callable(value):
+            return lambda *args, **kwargs: self._tab._wrap(self._tab._locked(lambda d: value(*args, **kwargs)))
+        return value
+
+class TabDriver:
+    """绑定到单个标签页的 driver 代理"""
+    def __init__(self, pool, browser, handle, name, page_load_timeout=45):
+        self._pool = pool
+        self._browser = browser
+        self._handle = handle
+        self._name = name
+        self._page_load_timeout = page_load_timeout
+        self._closed = False
+        with browser.lock:
+            browser.open_tab(handle)
+
+    def _locked(self, fn):
+        with self._browser.lock:
+            try:
+                self._browser.switch(self._handle)
+            except WebDriverException:
+                self._browser.broken = not self._pool._alive(self._browser)
+                raise
+            return fn(self._browser.driver)
+
+    def _wrap(self, value):
+        if isinstance(value, WebElement):
+            return _TabElement(self, value)
+        if isinstance(value, list) and value and isinstance(value[0], WebElement):
+            return [_TabElement(self, v) for v in value]
+        return value
+
+    # ---------------- 导航 ----------------
+    def get(self, url):
+        """非阻塞导航: 发出跳转后在锁外轮询，直到新文档离开 loading 状态 (等价 eager 加载策略)"""
+        self._locked(lambda d: d.execute_script(_NAV_MARK_JS, url))
+        deadline = time.time() + self._page_load_timeout
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            try:
+                marked, state = self._locked(lambda d: d.execute_script(_NAV_STATE_JS))
+            except WebDriverException:
+                if self._browser.broken:
+                    raise
+                continue  # 导航过程中脚本可能执行失败，继续轮询
+            if not marked and state != "loading":
+                return
+        raise TimeoutException(f"[TabPool] 页面加载超时 ({self._page_load_timeout}s): {url}")
+
+    # ---------------- 窗口/超时 (标签页共享窗口与会话超时，这里按标签页处理或忽略) ----------------
+    def set_page_load_timeout(self, seconds):
+        self._page_load_timeout = seconds
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def set_window_size(self, width, height):
+        pass  # 窗口由同一浏览器的所有标签页共享，尺寸在启动参数中统一设置
+
+    # ---------------- 日志 ----------------
+    def get_log(self, log_type):
+        with self._browser.lock:
+            return self._browser.read_log(self._handle, self._browser.pull_log(log_type))
+
+    # ---------------- 生命周期 ----------------
+    def quit(self):
+        """只关闭本标签页并归还名额"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._browser, self._handle)
+
+    close = quit
+
+    def __getattr__(self, attr):
+        value = self._locked(lambda d: getattr(d, attr))
+        if callable(value):
+            return lambda *args, **kwargs: self._wrap(self._locked(lambda d: value(*args, **kwargs)))
+        return self._wrap(value)
+
+class TabPool:
+    """
+    标签页池
+    browsers:         Chrome 进程数
+    tabs_per_browser: 每个进程同时打开的标签页数上限
+    capture_network:  启动时开启 performance 日志 (selenium_network 捕获 XHR 需要)
+    """
+    def __init__(self, chrome_options, browsers=BROWSERS, tabs_per_browser=TABS_PER_BROWSER, capture_network=False):
+        self.chrome_options = copy.deepcopy(chrome_options)
+        for arg in TAB_POOL_ARGS:
+            self.chrome_options.add_argument(arg)
+        if capture_network:
+            self.chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        self.size = max(1, browsers)
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.browsers = [None] * self.size
+        self._slots = threading.Semaphore(self.size * self.tabs_per_browser)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return self.size * self.tabs_per_browser
+
+    def _alive(self, browser):
+        try:
+            browser.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _pick_browser(self):
+        """选择活动标签页最少的浏览器 (崩溃的浏览器重建，未启动的按需启动)"""
+        with self._lock:
+            for i, browser in enumerate(self.browsers):
+                if browser is not None and browser.broken:
+                    print(f"♻️ [TabPool] 浏览器 #{i} 已失效，重新启动")
+                    browser.quit()
+                    self.browsers[i] = None
+            candidates = [i for i, b in enumerate(self.browsers) if b is None or b.active < self.tabs_per_browser]
+            index = min(candidates, key=lambda i: self.browsers[i].active if self.browsers[i] else 0)
+            if self.browsers[index] is None:
+                self.browsers[index] = _Browser(index, self.chrome_options)
+            browser = self.browsers[index]
+            browser.active += 1
+            return browser
+
+    def acquire(self, name, page_load_timeout=45):
+        """为目标 name 打开一个新标签页，返回 TabDriver"""
+        self._slots.acquire()
+        browser = None
+        try:
+            browser = self._pick_browser()
+            with browser.lock:
+                browser.driver.switch_to.new_window("tab")
+                handle = browser.driver.current_window_handle
+                browser.current = handle
+            return TabDriver(self, browser, handle, name, page_load_timeout)
+        except Exception:
+            if browser is not None:
+                browser.active -= 1
+                browser.broken = not self._alive(browser)
+            self._slots.release()
+            raise
+
+    def _release(self, browser, handle):
+        try:
+            with browser.lock:
+                browser.close_tab(handle)
+                browser.switch(handle)
+                browser.driver.close()
+                browser.switch(browser.home)
+        except Exception:
+            browser.broken = not self._alive(browser)
+        finally:
+            with self._lock:
+                browser.active -= 1
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            for browser in self.browsers:
+                if browser is not None:
+                    browser.quit()
+            self.browsers = [None] * self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
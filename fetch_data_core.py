@@ -8,15 +8,17 @@ import datetime
 import time
 import os
 import pandas as pd
-import yfinance as yf
-import akshare as ak
 import requests
 import warnings
-from io import StringIO
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from zoneinfo import ZoneInfo
 
+import intraday_core
+import intraday_volume
+import spot_snapshot
+import table_locator
+
 warnings.filterwarnings("ignore")
 
 ALPHA_VANTAGE_KEY = os.environ.get("ALPHA_VANTAGE_KEY", "DEMO")
@@ -39,6 +41,7 @@ SESSION = get_retry_session()
 
 def fetch_yf_data(ticker, name, days=1):
     """yfinance 获取数据"""
+    import yfinance as yf
     try:
         t = yf.Ticker(ticker)
         # 如果需要多天数据，扩大获取范围以确保数量足够
@@ -110,6 +113,7 @@ def fetch_us_bond_yields():
     return [], "; ".join(errors) if errors else "All sources failed"
 
 def fetch_china_bond_yields():
+    import akshare as ak
     print("   -> 获取中国国债数据...")
     end_date = datetime.datetime.now()
     start_date = end_date - datetime.timedelta(days=30)
@@ -144,56 +148,50 @@ def fetch_japan_bond_yields():
         r = SESSION.get(url, timeout=TIMEOUT)
         r.raise_for_status()
         
-        try:
-            dfs = pd.read_html(StringIO(r.text))
-        except ValueError as ve:
-            return [], f"No tables found in response: {ve}"
-
         targets = {
             "日本2年期国债": "2年",
             "日本10年期国债": "10年",
             "日本30年期国债": "30年"
         }
+        possible_names = ["收益率", "债券收益率", "Yield", "最新", "最新价", "Last"]
         
+        # 只遍历文本中含目标名称的表格，按行文本定位，不再把整页表格解析为 DataFrame
         found_data = {}
-        for df in dfs:
-            df_str = df.astype(str)
+        for table in table_locator.iter_tables(r.text, [[n] for n in targets], scope="text"):
+            rows = table_locator.table_rows(table)
+            if len(rows) < 2:
+                continue
+            
+            header = rows[0]
+            target_col_idx = None
+            for pname in possible_names:
+                target_col_idx = next((i for i, c in enumerate(header) if pname in c), None)
+                if target_col_idx is not None: break
+            
             for target_name, output_key in targets.items():
                 if output_key in found_data: continue
                 
-                mask = df_str.apply(lambda x: x.str.contains(target_name, na=False))
-                if mask.any().any():
-                    row_idx = mask.any(axis=1).idxmax()
-                    target_row = df.loc[row_idx]
-                    yield_val = None
+                for cells in rows[1:]:
+                    name_col_idx = next((i for i, c in enumerate(cells) if target_name in c), None)
+                    if name_col_idx is None: continue
                     
-                    cols = [str(c).strip() for c in df.columns]
-                    target_col_name = None
-                    possible_names = ["收益率", "债券收益率", "Yield", "最新", "最新价", "Last"]
-                    for pname in possible_names:
-                        for c in cols:
-                            if pname in c:
-                                target_col_name = c
-                                break
-                        if target_col_name: break
+                    yield_val = None
+                    if target_col_idx is not None:
+                        if target_col_idx < len(cells):
+                            yield_val = cells[target_col_idx]
+                    elif name_col_idx + 1 < len(cells):
+                        yield_val = cells[name_col_idx + 1]
                     
-                    if target_col_name:
-                        yield_val = target_row[target_col_name]
-                    else:
-                        name_col_idx = -1
-                        for i, is_found in enumerate(mask.iloc[row_idx]):
-                            if is_found:
-                                name_col_idx = i
-                                break
-                        if name_col_idx != -1 and name_col_idx + 1 < len(df.columns):
-                            yield_val = df.iloc[row_idx, name_col_idx + 1]
-
                     if yield_val is not None:
                         try:
                             val_str = str(yield_val).replace('%', '').strip()
                             found_data[output_key] = float(val_str)
                         except ValueError:
                             pass
+                    break
+            
+            if len(found_data) == len(targets):
+                break
 
         if not found_data:
             return [], "Targets (2Y/10Y/30Y) not found in any table"
@@ -216,23 +214,11 @@ def fetch_vietnam_index_klines():
         r = SESSION.get(url, timeout=TIMEOUT)
         r.raise_for_status()
         
-        try:
-            dfs = pd.read_html(StringIO(r.text))
-        except ValueError as ve:
-             print(f"   [Debug] Read HTML failed. Response preview: {r.text[:200]}...")
-             return [], f"Read HTML failed: {ve}"
-
-        if not dfs:
-            return [], "No tables found in response"
-        
-        df = None
-        for i, temp_df in enumerate(dfs):
-            cols = [str(c).strip() for c in temp_df.columns]
-            if "日期" in cols and "收盘" in cols:
-                df = temp_df
-                break
+        # 只定位并解析表头含 日期/收盘 的历史数据表格
+        df = table_locator.read_table(r.text, [["日期", "收盘"]])
         
         if df is None:
+            print(f"   [Debug] Target table not found. Response preview: {r.text[:200]}...")
             return [], "Table with columns '日期' and '收盘' not found"
         
         def parse_date(x):
@@ -299,6 +285,7 @@ def fetch_vietnam_index_klines():
 
 def fetch_southbound_flow():
     """获取南向资金净流入 (近20天) - 使用 stock_hsgt_hist_em"""
+    import akshare as ak
     print("   -> 获取南向资金数据 (AKShare)...")
     
     # [修改] 添加业务层重试机制
@@ -350,6 +337,7 @@ def fetch_southbound_flow():
 
 def fetch_star50_valuation():
     """获取科创50指数估值 (PE/PB) (近6个月)"""
+    import akshare as ak
     print("   -> 获取科创50估值数据 (AKShare)...")
     try:
         # 科创50指数代码 000688
@@ -396,6 +384,7 @@ def fetch_star50_margin():
     说明: 该接口不支持直接传 symbol 获取历史，只能传 date 获取全市场。
     策略: 循环查询最近的交易日，过滤出 588000。
     """
+    import akshare as ak
     print("   -> 获取科创50融资融券数据 (Loop Date)...")
     target_symbol = "588000" # 科创50ETF
     data_list = []
@@ -451,12 +440,11 @@ def fetch_star50_realtime_vol_ratio():
     """获取科创50ETF实时量比 (Spot Data)"""
     print("   -> 获取科创50ETF实时量比 (AKShare)...")
     try:
-        df = ak.fund_etf_spot_em()
-        target = df[df['代码'] == '588000']
-        if target.empty:
+        # 全市场 ETF 行情表由 spot_snapshot 共享缓存，按代码直接索引
+        row = spot_snapshot.get_snapshot().quote("etf", "588000")
+        if row is None:
             return None, "Symbol 588000 not found in spot data"
         
-        row = target.iloc[0]
         result = {
             "代码": row['代码'],
             "名称": row['名称'],
@@ -475,6 +463,7 @@ def fetch_ashare_indices():
     包括: 上证指数, 深证成指, 创业板指, 沪深300
     [修改] 移除北证50，新增沪深300
     """
+    import akshare as ak
     print("   -> 获取A股主要指数数据 (AKShare)...")
     
     # 映射关系: 名称 -> AKShare symbol (东财接口)
@@ -534,38 +523,15 @@ def fetch_ashare_indices():
 
 def _calculate_hourly_volume_ratio(df):
     """
-    通用辅助函数: 计算小时级别的量比
-    逻辑: 量比 = 当前小时Volume / 过去5日同一时段(Hour)均量
+    通用辅助函数: 计算分时量比
+    逻辑: 量比 = 当前K线Volume / 过去5日同一时段均量 (向量化实现见 intraday_volume)
     输入df需包含: date(datetime), volume(float)
     """
     if df is None or df.empty or 'volume' not in df.columns:
         return df
 
     try:
-        # 1. 提取小时特征
-        df['hour_str'] = df['date'].dt.strftime('%H:%M')
-        
-        # 2. 计算过去5日同一时段均量
-        # 使用 transform 计算滚动均值 (rolling shift 1 避免包含当前K线)
-        # 注意: 这里简单使用 groupby + rolling mean，假设数据是连续的
-        # 为了更严谨，我们计算每个 hour_str 的历史均值
-        
-        # 先按时间分组，然后对每组计算 lag 1 的 5周期均值
-        df['avg_vol_5d'] = df.groupby('hour_str')['volume'].transform(
-            lambda x: x.shift(1).rolling(window=5, min_periods=1).mean()
-        )
-        
-        # 3. 计算量比
-        # 如果分母为0或NaN，量比置为 0 (或者 1.0)
-        df['volume_ratio'] = df['volume'] / df['avg_vol_5d']
-        df['volume_ratio'] = df['volume_ratio'].fillna(0.0).replace([float('inf'), -float('inf')], 0.0)
-        
-        # 格式化保留2位小数
-        df['volume_ratio'] = df['volume_ratio'].apply(lambda x: round(x, 2))
-        
-        # 清理中间列
-        df.drop(columns=['hour_str', 'avg_vol_5d'], inplace=True)
-        
+        intraday_volume.add_volume_ratio(df, window=5)
     except Exception as e:
         print(f"   ⚠️ 量比计算失败: {e}")
         df['volume_ratio'] = 0.0
@@ -576,121 +542,26 @@ def fetch_kcb50_60m():
     """
     获取科创50 ETF (588000) 近5个交易日的 60分钟K线
     包含: Volume, Amount, Volume Ratio
-    [修复] 增加对 None 返回值的检查，并尝试 ETF 专用接口
+    [重构] 配置见 intraday_core.INTRADAY_TARGETS
     """
     print("   -> 获取科创50 (588000) 60分钟K线 (AKShare)...")
-    try:
-        df = None
-        # 1. 尝试股票分时接口 (通常兼容 ETF)
-        try:
-            df = ak.stock_zh_a_hist_min_em(symbol="588000", period="60", adjust="qfq")
-        except:
-            pass
-            
-        # 2. 如果失败或为空，尝试 ETF 分时接口 (如有)
-        if df is None or df.empty:
-            if hasattr(ak, 'fund_etf_hist_min_em'):
-                try:
-                    df = ak.fund_etf_hist_min_em(symbol="588000", period="60", adjust="qfq")
-                except:
-                    pass
-        
-        if df is None or df.empty:
-            return [], "Empty or None dataframe from AKShare"
-            
-        # 字段映射: "时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", ...
-        # 注意: 这里的 "成交量" 单位可能是 手，"成交额" 是 元
-        df.rename(columns={
-            "时间": "date", "成交量": "volume", "成交额": "amount", 
-            "开盘": "open", "收盘": "close", "最高": "high", "最低": "low"
-        }, inplace=True)
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        
-        # 计算量比
-        df = _calculate_hourly_volume_ratio(df)
-        
-        # 截取最近 5 个交易日的数据 (假设每天4根60mK线，5天约20根，稍微多取一点做展示)
-        df_slice = df.iloc[-30:].copy()
-        
-        # 格式化
-        df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        result = []
-        for _, row in df_slice.iterrows():
-            result.append({
-                "date": row['date'],
-                "volume": row['volume'],
-                "amount": row['amount'],
-                "volume_ratio": row.get('volume_ratio', 0.0),
-                "close": row['close'] # 附带收盘价方便查看
-            })
-            
-        return result, None
-
-    except Exception as e:
-        print(f"科创50 60mK线获取失败: {e}")
-        return [], str(e)
+    return intraday_core.fetch_intraday("科创50_60分钟K线")
 
 def fetch_hstech_60m():
     """
-    获取恒生科技指数 (^HSTECH) 近5个交易日的 60分钟K线
-    [修复] 指数分时数据 YFinance 经常为空，改用 ETF 3033.HK (南方恒生科技) 作为代理
+    获取恒生科技指数 (^HSTECH) 近5个交易日的 60分钟K线 (ETF 3033.HK 代理)
+    [重构] 配置见 intraday_core.INTRADAY_TARGETS
     """
     print("   -> 获取恒生科技指数 60分钟K线 (Using ETF 3033.HK as proxy)...")
-    try:
-        # 使用恒生科技 ETF (3033.HK) 代替指数获取 60m 数据
-        t = yf.Ticker("3033.HK")
-        hist = t.history(interval="60m", period="1mo")
-        
-        if hist is None or hist.empty:
-            return [], "Empty dataframe from yfinance (3033.HK)"
-            
-        hist = hist.reset_index()
-        # yfinance columns: Datetime, Open, High, Low, Close, Volume, (Dividends, Stock Splits)
-        if isinstance(hist['Datetime'].dtype, pd.DatetimeTZDtype):
-             hist['date'] = hist['Datetime'].dt.tz_convert(TZ_CN).dt.tz_localize(None)
-        else:
-             hist['date'] = pd.to_datetime(hist['Datetime'])
-
-        hist.rename(columns={"Volume": "volume", "Close": "close"}, inplace=True)
-        
-        # yfinance 无 Amount
-        hist['amount'] = 0.0 
-        
-        hist = hist.sort_values('date')
-        
-        # 计算量比
-        hist = _calculate_hourly_volume_ratio(hist)
-        
-        # 截取最近 5 个交易日 (港股每天 5.5小时, 取最近 35 条)
-        df_slice = hist.iloc[-35:].copy()
-        
-        df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        result = []
-        for _, row in df_slice.iterrows():
-            result.append({
-                "date": row['date'],
-                "volume": row['volume'],
-                "amount": row['amount'], # YFinance 无 Amount
-                "volume_ratio": row.get('volume_ratio', 0.0),
-                "close": row['close'],
-                "note": "Source: ETF 3033.HK"
-            })
-            
-        return result, None
-
-    except Exception as e:
-        print(f"恒生科技 60mK线获取失败: {e}")
-        return [], str(e)
+    return intraday_core.fetch_intraday("恒生科技指数_60m")
 
 def fetch_us_banks_daily():
     """
     获取六大银行的日线数据 (优先 Akshare stock_us_daily, 备选 yfinance)
     JPM, BAC, C, WFC, GS, MS
     """
+    import akshare as ak
+    import yfinance as yf
     print("   -> 获取六大银行日线数据...")
     banks = [
         {"name": "摩根大通", "symbol": "JPM"},
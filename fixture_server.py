@@ -0,0 +1,250 @@
+# fixture_server.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Local Fixture Web Server (Scraper Benchmarking)
+# -----------------------------------------------------------------------------
+# 在本机提供 Eastmoney / Investing.com / CNN / CBOE / SSE(CCFI) / GuruFocus 页面的离线副本，
+# 支持按目标配置响应延迟与表格懒加载 (JS 延时或滚动后插入)，配合 MacroDataScraper 的
+# URL 覆盖，可在无网络的 Linux 机器上对浏览器池、等待策略、解析逻辑做基准测试。
+#
+# 页面来源:
+#   1. --pages-dir 目录下的 <目标名>.html (目标名与 MacroDataScraper.targets 的 key 一致)
+#   2. --from-bundle 从 replay_harness 录制的夹具包中提取 Selenium 页面源码
+#
+# 用法:
+#   python fixture_server.py --pages-dir fixtures/pages --port 8800 --write-overrides url_overrides.json
+#   MACRO_URL_OVERRIDES=url_overrides.json python scrape_economy_selenium.py
+#
+# 配置文件 (--config, JSON):
+#   {"default": {"delay": 0.5, "lazy_ms": 0},
+#    "targets": {"CNN_FearGreed": {"delay": 2.0, "lazy_ms": 1500, "trigger": "scroll"}}}
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import quote, unquote, urlparse
+
+from lxml import html as lxml_html
+
+DEFAULT_PORT = 8800
+PAGE_ROUTE = "/pages/"
+
+LAZY_SCRIPT = """<script>
+(function(){
+  var done = false;
+  function load(){
+    if (done) return; done = true;
+    document.querySelectorAll('template[data-lazy-table]').forEach(function(t){
+      var holder = document.getElementById(t.getAttribute('data-lazy-table'));
+      if (holder) holder.replaceWith(t.content.cloneNode(true));
+    });
+  }
+  %s
+  window.addEventListener('scroll', load);
+})();
+</script>"""
+
+def make_lazy(page_html, lazy_ms, trigger="timeout"):
+    """
+    把页面中的顶层 <table> 移入 <template>，由脚本在 lazy_ms 毫秒后 (或滚动时) 插回
+    trigger: "timeout" 定时+滚动均可触发, "scroll" 仅滚动触发
+    """
+    try:
+        doc = lxml_html.document_fromstring(page_html)
+    except Exception:
+        return page_html
+
+    tables = [t for t in doc.iter("table") if not any(a.tag == "table" for a in t.iterancestors())]
+    if not tables:
+        return page_html
+
+    templates = []
+    for i, table in enumerate(tables):
+        holder_id = f"lazy-table-{i}"
+        holder = lxml_html.Element("div", id=holder_id)
+        holder.text = "Loading..."
+        tail = table.tail
+        table.tail = None
+        templates.append(f'<template data-lazy-table="{holder_id}">{lxml_html.tostring(table, encoding="unicode")}</template>')
+        table.getparent().replace(table, holder)
+        holder.tail = tail
+
+    timer = "" if trigger == "scroll" else f"setTimeout(load, {int(lazy_ms)});"
+    body = doc.find("body")
+    extra = "".join(templates) + (LAZY_SCRIPT % timer)
+    for fragment in lxml_html.fragments_fromstring(extra):
+        (body if body is not None else doc).append(fragment)
+    return "<!DOCTYPE html>\n" + lxml_html.tostring(doc, encoding="unicode")
+
+def load_pages_dir(pages_dir):
+    pages = {}
+    if not pages_dir or not os.path.isdir(pages_dir):
+        return pages
+    for filename in os.listdir(pages_dir):
+        if filename.endswith(".html"):
+            with open(os.path.join(pages_dir, filename), "r", encoding="utf-8") as f:
+                pages[filename[:-5]] = f.read()
+    return pages
+
+def load_pages_from_bundle(bundle_path, targets):
+    """从 replay_harness 夹具包中提取 Selenium 录制的页面源码, 按 URL 映射回目标名"""
+    import replay_harness
+
+    bundle = replay_harness.FixtureBundle(bundle_path, "replay")
+    url_to_name = {url: name for name, url in targets.items()}
+    pages = {}
+    for key in bundle.index.get("calls", {}):
+        match = re.match(r"^selenium\|page_source\|'(.*)'$", key)
+        if not match:
+            continue
+        url = match.group(1)
+        name = url_to_name.get(url)
+        if not name:
+            continue
+        value, _, _ = bundle.replay(key)
+        if value:
+            pages[name] = value
+    return pages
+
+def save_pages(pages, pages_dir):
+    os.makedirs(pages_dir, exist_ok=True)
+    for name, content in pages.items():
+        with open(os.path.join(pages_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(content)
+
+class FixtureServer:
+    """
+    本地夹具服务器
+    pages:  {目标名: 页面 HTML}
+    config: {"default": {...}, "targets": {目标名: {"delay": 秒, "lazy_ms": 毫秒, "trigger": "timeout|scroll"}}}
+    """
+    def __init__(self, pages, config=None, host="127.0.0.1", port=DEFAULT_PORT):
+        self.pages = pages
+        self.config = config or {}
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+        self.hits = {}
+
+    def target_config(self, name):
+        cfg = dict(self.config.get("default", {}))
+        cfg.update(self.config.get("targets", {}).get(name, {}))
+        return cfg
+
+    def render(self, name):
+        page = self.pages[name]
+        cfg = self.target_config(name)
+        if cfg.get("lazy_ms") or cfg.get("trigger") == "scroll":
+            page = make_lazy(page, cfg.get("lazy_ms", 0), cfg.get("trigger", "timeout"))
+        return page
+
+    def url_for(self, name):
+        return f"http://{self.host}:{self.port}{PAGE_ROUTE}{quote(name)}"
+
+    def url_overrides(self):
+        return {name: self.url_for(name) for name in self.pages}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/__overrides.json":
+                    self._send(200, json.dumps(server.url_overrides(), ensure_ascii=False), "application/json")
+                    return
+                if not path.startswith(PAGE_ROUTE):
+                    self._send(404, "not found", "text/plain")
+                    return
+
+                name = unquote(path[len(PAGE_ROUTE):])
+                if name not in server.pages:
+                    self._send(404, f"no fixture for {name}", "text/plain")
+                    return
+
+                server.hits[name] = server.hits.get(name, 0) + 1
+                delay = server.target_config(name).get("delay", 0)
+                if delay:
+                    time.sleep(delay)
+                self._send(200, server.render(name), "text/html")
+
+            def _send(self, code, body, content_type):
+                data = body.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """后台线程启动 (供基准脚本内嵌使用)"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"🧪 [FixtureServer] 已启动: http://{self.host}:{self.port} ({len(self.pages)} 个页面)")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketRadar 本地夹具服务器 (Selenium 爬虫基准)")
+    parser.add_argument("--pages-dir", default="fixtures/pages", help="页面目录 (<目标名>.html)")
+    parser.add_argument("--from-bundle", help="从 replay_harness 夹具包提取页面 (并保存到 --pages-dir)")
+    parser.add_argument("--config", help="延迟/懒加载配置文件 (JSON)")
+    parser.add_argument("--delay", type=float, default=0.0, help="默认响应延迟 (秒)")
+    parser.add_argument("--lazy-ms", type=int, default=0, help="默认表格懒加载延迟 (毫秒, 0 为不懒加载)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--write-overrides", help="写出 URL 覆盖文件 (供 MACRO_URL_OVERRIDES 使用)")
+    args = parser.parse_args()
+
+    if args.from_bundle:
+        import selenium_core
+        bundle_pages = load_pages_from_bundle(args.from_bundle, selenium_core.MacroDataScraper(url_overrides={}).targets)
+        save_pages(bundle_pages, args.pages_dir)
+        print(f"📦 已从夹具包提取 {len(bundle_pages)} 个页面 -> {args.pages_dir}")
+
+    config = {"default": {"delay": args.delay, "lazy_ms": args.lazy_ms}}
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            file_config = json.load(f)
+        config["default"].update(file_config.get("default", {}))
+        config["targets"] = file_config.get("targets", {})
+
+    fixture_server = FixtureServer(load_pages_dir(args.pages_dir), config, args.host, args.port)
+    if not fixture_server.pages:
+        print(f"⚠️ 未找到任何页面 ({args.pages_dir})")
+
+    fixture_server.start()
+
+    if args.write_overrides:
+        with open(args.write_overrides, "w", encoding="utf-8") as f:
+            json.dump(fixture_server.url_overrides(), f, ensure_ascii=False, indent=4)
+        print(f"🔀 URL 覆盖文件已写入: {args.write_overrides}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fixture_server.stop()
@@ -0,0 +1,97 @@
+# history_store.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Per-Symbol Daily Kline History
+# -----------------------------------------------------------------------------
+# 全量运行时把每个标的清洗后的完整日线 (normalize_df 输出) 保存为 CSV，
+# 盘中快速刷新 (main.py --refresh-latest) 读取历史，只抓取最近几根K线并合并，
+# 再基于 历史 + 新K线 重算均线与技术指标。
+#
+# 环境变量: KLINE_HISTORY_DIR 历史目录 (默认 kline_history), KLINE_HISTORY=0 关闭保存
+# -----------------------------------------------------------------------------
+
+import os
+import re
+
+import pandas as pd
+
+KLINE_HISTORY_DIR = os.environ.get("KLINE_HISTORY_DIR", "kline_history")
+ENABLE_KLINE_HISTORY = os.environ.get("KLINE_HISTORY", "1") != "0"
+
+# normalize_df 会把这些列中的 0 输出为 "-"，读写时需要在数值与占位符之间转换
+PLACEHOLDER_COLS = ['volume', 'amount', 'volume_ratio']
+
+def _float_or_zero(x):
+    # 逐个 float() 转换，保证与写出时的 repr 精确往返 (pd.to_numeric 解析字符串可能差最后一位)
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _to_numeric(df):
+    df = df.copy()
+    for col in PLACEHOLDER_COLS:
+        if col in df.columns:
+            df[col] = df[col].map(_float_or_zero).fillna(0.0)
+    return df
+
+def _format_placeholders(df):
+    for col in PLACEHOLDER_COLS:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: "-" if x == 0 else x).astype(object)
+    return df
+
+class KlineHistoryStore:
+    """
+    每个标的一个 CSV 文件: <dir>/<标的名>_<ak>_<yf>.csv
+    与 MarketRadar.shard_of 一致按 名称|ak|yf 区分，同名标的 (如港股/A股 中芯国际) 各自保存
+    """
+    def __init__(self, directory=KLINE_HISTORY_DIR):
+        self.directory = directory
+
+    def path_for(self, name, config):
+        key = f"{name}|{config.get('ak') or ''}|{config.get('yf') or ''}"
+        return os.path.join(self.directory, re.sub(r'[\\/:*?"<>|\s]', '_', key) + ".csv")
+
+    def save(self, name, config, df):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(name, config)
+        tmp_path = path + ".tmp"
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def load(self, name, config):
+        """返回已保存的日线 (date 为 Timestamp，占位符列保持 normalize_df 格式)，无历史时返回 None"""
+        path = self.path_for(name, config)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_csv(path, encoding='utf-8', float_precision='round_trip')
+        except Exception as e:
+            print(f"⚠️ [History] 读取失败 ({path}): {e}")
+            return None
+        if df.empty or 'date' not in df.columns:
+            return None
+        df['date'] = pd.to_datetime(df['date'])
+        df['name'] = name
+        return _format_placeholders(_to_numeric(df))
+
+def merge_latest(history_df, new_df):
+    """
+    合并历史与新抓取的K线 (同日期以新数据为准)，新K线的成交额/量比按全量清洗规则重新计算:
+    量比 = 当日成交量 / 前 5 日平均成交量
+    """
+    history = _to_numeric(history_df)
+    fresh = _to_numeric(new_df)
+    fresh_dates = set(fresh['date'])
+
+    merged = pd.concat([history[~history['date'].isin(fresh_dates)], fresh], ignore_index=True)
+    merged = merged.sort_values(by='date', ascending=True).reset_index(drop=True)
+
+    is_new = merged['date'].isin(fresh_dates)
+    ma5_vol = merged['volume'].rolling(window=5, min_periods=1).mean().shift(1)
+    ratio = (merged['volume'] / ma5_vol).replace([float('inf'), -float('inf')], 0.0).fillna(0.0)
+    merged.loc[is_new, 'volume_ratio'] = ratio[is_new]
+    missing_amount = is_new & (merged['amount'] == 0)
+    merged.loc[missing_amount, 'amount'] = merged.loc[missing_amount, 'close'] * merged.loc[missing_amount, 'volume']
+
+    return _format_placeholders(merged.fillna(0))
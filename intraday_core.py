@@ -0,0 +1,195 @@
+# intraday_core.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Config-Driven Intraday Klines
+# -----------------------------------------------------------------------------
+# 分时K线子系统: 目标写在 INTRADAY_TARGETS 注册表中 (与 MarketRadar.TARGETS_* 同样的配置方式，
+# 另加周期与回看天数)，全部目标并发抓取，按 sources 顺序回退数据源，结果按周期缓存，
+# 量比由 intraday_volume 对所有序列一次性向量化计算。新增分时序列只需在注册表中加一项。
+#
+# 注册表字段:
+#   section      报告中的位置: "科创50" 为顶层科创50板块，其余为宏观分区 (china / usa / hk ...)
+#   log_name     状态日志名称
+#   sources      数据源回退顺序: ak_stock_min (stock_zh_a_hist_min_em) / ak_etf_min (fund_etf_hist_min_em) / yf
+#   ak / yf      各数据源代码
+#   interval     K线周期 (分钟): 1/5/15/30/60
+#   lookback_days 抓取回看天数 (需覆盖输出条数 + 量比所需的 5 个交易日)
+#   bars         输出最近多少根
+#   note         可选，附加到每条记录
+# -----------------------------------------------------------------------------
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+import intraday_volume
+
+TZ_CN = ZoneInfo("Asia/Shanghai")
+INTRADAY_WORKERS = 8
+VOLUME_RATIO_DAYS = 5
+
+INTRADAY_TARGETS = {
+    "科创50_60分钟K线": {
+        "section": "科创50", "log_name": "科创50_60m",
+        "sources": ["ak_stock_min", "ak_etf_min"], "ak": "588000",
+        "interval": 60, "lookback_days": 30, "bars": 30,
+    },
+    "恒生科技指数_60m": {
+        "section": "hk", "log_name": "恒生科技_60m",
+        # 指数分时数据 YFinance 经常为空，使用恒生科技 ETF (3033.HK) 作为代理
+        "sources": ["yf"], "yf": "3033.HK",
+        "interval": 60, "lookback_days": 30, "bars": 35, "note": "Source: ETF 3033.HK",
+    },
+}
+
+# yfinance 支持的分钟周期与最长回看 (天)
+YF_INTERVALS = {1: ("1m", 7), 5: ("5m", 60), 15: ("15m", 60), 30: ("30m", 60), 60: ("60m", 730)}
+
+# ==============================================================================
+# 数据源 (统一输出列: date, open, close, high, low, volume, amount)
+# ==============================================================================
+
+AK_MIN_COLUMNS = {
+    "时间": "date", "成交量": "volume", "成交额": "amount",
+    "开盘": "open", "收盘": "close", "最高": "high", "最低": "low"
+}
+
+def _ak_min(func_name, symbol, interval, lookback_days):
+    import akshare as ak
+    func = getattr(ak, func_name, None)
+    if func is None:
+        return None
+    start = (datetime.now(TZ_CN) - timedelta(days=lookback_days)).strftime("%Y-%m-%d 09:00:00")
+    df = func(symbol=symbol, period=str(interval), adjust="qfq", start_date=start)
+    if df is None or df.empty:
+        return None
+    df = df.rename(columns=AK_MIN_COLUMNS)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def _yf_min(symbol, interval, lookback_days):
+    import yfinance as yf
+    yf_interval, max_days = YF_INTERVALS[interval]
+    hist = yf.Ticker(symbol).history(interval=yf_interval, period=f"{min(lookback_days, max_days)}d")
+    if hist is None or hist.empty:
+        return None
+    hist = hist.reset_index()
+    time_col = 'Datetime' if 'Datetime' in hist.columns else hist.columns[0]
+    if isinstance(hist[time_col].dtype, pd.DatetimeTZDtype):
+        hist['date'] = hist[time_col].dt.tz_convert(TZ_CN).dt.tz_localize(None)
+    else:
+        hist['date'] = pd.to_datetime(hist[time_col])
+    hist = hist.rename(columns={"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"})
+    # yfinance 无 Amount
+    hist['amount'] = 0.0
+    return hist
+
+SOURCE_FETCHERS = {
+    "ak_stock_min": lambda config: _ak_min("stock_zh_a_hist_min_em", config["ak"], config["interval"], config["lookback_days"]),
+    "ak_etf_min": lambda config: _ak_min("fund_etf_hist_min_em", config["ak"], config["interval"], config["lookback_days"]),
+    "yf": lambda config: _yf_min(config["yf"], config["interval"], config["lookback_days"]),
+}
+
+# ==============================================================================
+# 抓取 (按周期缓存)
+# ==============================================================================
+
+class IntradayCache:
+    """
+    按 (数据源, 代码, 周期) 缓存原始分钟K线，有效期为一个K线周期:
+    同一周期内重复请求 (常驻模式频繁刷新、多个序列共用同一标的) 不重复下载
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, interval):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and time.time() - entry[0] < interval * 60:
+            return entry[1]
+        return None
+
+    def put(self, key, df):
+        with self._lock:
+            self._entries[key] = (time.time(), df)
+
+CACHE = IntradayCache()
+
+def fetch_bars(name, config, cache=CACHE):
+    """按 sources 顺序回退抓取，返回 (DataFrame, 数据源, 错误信息)"""
+    errors = []
+    for source in config["sources"]:
+        code = config.get("yf") if source == "yf" else config.get("ak")
+        key = (source, code, config["interval"])
+        df = cache.get(key, config["interval"]) if cache else None
+        if df is None:
+            try:
+                df = SOURCE_FETCHERS[source](config)
+            except Exception as e:
+                errors.append(f"{source}: {str(e)[:60]}")
+                continue
+            if df is None or df.empty:
+                errors.append(f"{source}: empty")
+                continue
+            if cache:
+                cache.put(key, df)
+        return df.sort_values('date').copy(), source, None
+    return None, None, "; ".join(errors) or "no source"
+
+def _to_records(df, config):
+    df_slice = df.iloc[-config["bars"]:].copy()
+    df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d %H:%M')
+    columns = ['date', 'volume', 'amount', 'volume_ratio', 'close']
+    records = df_slice[columns].to_dict(orient='records')
+    if config.get("note"):
+        for record in records:
+            record["note"] = config["note"]
+    return records
+
+def fetch_intraday_all(targets=None, workers=INTRADAY_WORKERS):
+    """
+    并发抓取全部分时目标
+    返回 ({序列名: 记录列表 (失败为空列表)}, 状态日志)
+    """
+    targets = INTRADAY_TARGETS if targets is None else targets
+    print(f"   -> 并发获取 {len(targets)} 个分时K线序列...")
+
+    frames, status_logs = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as executor:
+        futures = {executor.submit(fetch_bars, name, config): name for name, config in targets.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            df, source, err = future.result()
+            log_name = targets[name].get("log_name", name)
+            if df is None:
+                print(f"   ⚠️ {name} 获取失败: {err}")
+                status_logs.append({'name': log_name, 'status': False, 'error': err})
+            else:
+                frames[name] = df
+                status_logs.append({'name': log_name, 'status': True, 'error': None})
+
+    results = {name: [] for name in targets}
+    if frames:
+        # 所有序列一次性计算同时段量比 (按序列分组)
+        panel = pd.concat([df.assign(_series=name) for name, df in frames.items()], ignore_index=True)
+        try:
+            intraday_volume.add_volume_ratio(panel, window=VOLUME_RATIO_DAYS, symbol_col='_series')
+        except Exception as e:
+            print(f"   ⚠️ 量比计算失败: {e}")
+            panel['volume_ratio'] = 0.0
+        for name, df in panel.groupby('_series', sort=False):
+            results[name] = _to_records(df, targets[name])
+
+    # 状态日志按注册表顺序输出
+    order = {targets[name].get("log_name", name): i for i, name in enumerate(targets)}
+    status_logs.sort(key=lambda log: order.get(log['name'], len(order)))
+    return results, status_logs
+
+def fetch_intraday(name):
+    """单个序列 (兼容旧接口): 返回 (记录列表, 错误信息)"""
+    results, logs = fetch_intraday_all({name: INTRADAY_TARGETS[name]})
+    return results[name], logs[0]['error']
@@ -0,0 +1,104 @@
+# job_history.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Job Duration History & Scheduling Order
+# -----------------------------------------------------------------------------
+# 记录每个抓取任务的耗时 (EWMA) 与失败率，用于调度排序:
+#   - 最长任务优先 (LPT): 预计耗时长的任务先启动，缩短整体完成时间
+#   - 无历史记录时使用调用方提供的静态估计
+#   - 不稳定任务 (失败率高) 均匀穿插在队列中，使其重试与其他任务重叠，而不是集中在末尾
+#
+# 环境变量: JOB_HISTORY_PATH 历史文件路径 (默认 job_history.json)
+# -----------------------------------------------------------------------------
+
+import json
+import os
+import threading
+
+JOB_HISTORY_PATH = os.environ.get("JOB_HISTORY_PATH", "job_history.json")
+
+EWMA_ALPHA = 0.3          # 新样本权重
+DEFAULT_DURATION = 10.0   # 无历史也无静态估计时的默认耗时 (秒)
+FLAKY_RATE = 0.3          # 失败率超过该值视为不稳定
+FLAKY_MIN_RUNS = 3        # 判定不稳定所需的最少运行次数
+
+_FILE_LOCK = threading.Lock()
+
+class JobHistory:
+    """
+    任务耗时历史 (按 scope 区分，如 "macro" / "kline")
+    jobs: {任务名: {"duration": EWMA 耗时, "failure_rate": EWMA 失败率, "runs": 次数}}
+    """
+    def __init__(self, scope, path=JOB_HISTORY_PATH):
+        self.scope = scope
+        self.path = path
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.jobs = json.load(f).get(self.scope, {})
+        except Exception as e:
+            print(f"⚠️ [JobHistory] 历史读取失败 ({self.path}): {e}")
+
+    def save(self):
+        """合并写回 (文件中可能同时保存了其他 scope)"""
+        with _FILE_LOCK:
+            data = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except Exception:
+                    data = {}
+            with self._lock:
+                data[self.scope] = self.jobs
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def record(self, name, duration, ok=True):
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None:
+                self.jobs[name] = {"duration": round(duration, 3), "failure_rate": 0.0 if ok else 1.0, "runs": 1}
+                return
+            job["duration"] = round((1 - EWMA_ALPHA) * job["duration"] + EWMA_ALPHA * duration, 3)
+            job["failure_rate"] = round((1 - EWMA_ALPHA) * job["failure_rate"] + EWMA_ALPHA * (0.0 if ok else 1.0), 3)
+            job["runs"] += 1
+
+    def expected(self, name, default=DEFAULT_DURATION):
+        job = self.jobs.get(name)
+        return job["duration"] if job else default
+
+    def is_flaky(self, name):
+        job = self.jobs.get(name)
+        return bool(job) and job["runs"] >= FLAKY_MIN_RUNS and job["failure_rate"] > FLAKY_RATE
+
+    def order(self, names, static=None, default=DEFAULT_DURATION):
+        """
+        返回调度顺序: 按预计耗时降序，不稳定任务均匀穿插 (第一个排在最前)
+        static: {任务名: 静态估计耗时}，无历史时使用
+        """
+        static = static or {}
+        estimate = {n: self.expected(n, static.get(n, default)) for n in names}
+        ranked = sorted(names, key=lambda n: -estimate[n])
+
+        flaky = [n for n in ranked if self.is_flaky(n)]
+        if not flaky or len(flaky) == len(ranked):
+            return ranked
+
+        steady = [n for n in ranked if n not in flaky]
+        step = len(steady) / len(flaky)
+        result, j = [], 0
+        for i, name in enumerate(flaky):
+            pos = int(i * step)
+            result.extend(steady[j:pos])
+            j = pos
+            result.append(name)
+        result.extend(steady[j:])
+        return result
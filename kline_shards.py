@@ -0,0 +1,177 @@
+# kline_shards.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Horizontal Sharding of the Kline Universe
+# -----------------------------------------------------------------------------
+# 把 K 线标的按 crc32(名称|ak|yf) % N 稳定地划分到 N 个分片，各分片可在不同进程/机器上运行，
+# 分别写出部分结果文件；合并命令把 N 个部分结果还原为单次运行相同的
+# MarketRadar_Report.json 与 market_data_status.txt。
+#   - 分片 0 额外抓取汇率/宏观/越南/分时/银行等非 K 线数据源 (这些数据源只需抓取一次)
+#   - 部分结果为 JSON (异常记为 {"__error__": ...}，DataFrame 记为 {"__frames__": [...]}，
+#     K线表记为 {"__table__": ...}，见 kline_table.py)
+#
+# 用法:
+#   python main.py --shard 0/3     # 写出 MarketRadar_Report.shard0of3.json
+#   python main.py --shard 1/3
+#   python main.py --shard 2/3
+#   python main.py --merge-shards MarketRadar_Report.shard*of3.json
+# -----------------------------------------------------------------------------
+
+import json
+import time
+from collections import deque
+
+import pandas as pd
+
+import main
+import MarketRadar
+from kline_table import KlineTable, encode_tables, decode_tables
+
+SHARD_FILENAME = "MarketRadar_Report.shard{index}of{total}.json"
+
+def parse_shard(text):
+    """'i/N' -> (i, N)，i 从 0 开始"""
+    try:
+        index, total = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N: {text}")
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"分片编号超出范围: {text}")
+    return index, total
+
+# ==============================================================================
+# 部分结果编码
+# ==============================================================================
+
+def encode_result(value):
+    """数据源原始结果 -> 可 JSON 序列化的值 (task_queue 亦使用)"""
+    if isinstance(value, Exception):
+        return {"__error__": str(value)}
+    if isinstance(value, list) and value and all(isinstance(v, pd.DataFrame) for v in value):
+        frames = []
+        for df in value:
+            df = df.copy()
+            for col in df.columns:
+                if pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            frames.append(df.to_dict(orient='records'))
+        return {"__frames__": frames}
+    return encode_tables(value)
+
+def decode_result(value):
+    """encode_result 的逆操作"""
+    if isinstance(value, dict) and "__error__" in value:
+        return RuntimeError(value["__error__"])
+    if isinstance(value, dict) and "__frames__" in value:
+        frames = []
+        for records in value["__frames__"]:
+            df = pd.DataFrame(records)
+            if 'date' in df.columns:
+                df['date'] = pd.to_datetime(df['date'])
+            frames.append(df)
+        return frames
+    return decode_tables(value)
+
+# ==============================================================================
+# 分片运行
+# ==============================================================================
+
+def run_shard(index, total, output=None):
+    """运行一个分片并写出部分结果文件，返回文件路径"""
+    start_time = time.time()
+    output = output or SHARD_FILENAME.format(index=index, total=total)
+    print(f"🧩 MarketRadar 分片运行: {index}/{total}")
+
+    keys = list(main.SOURCE_STEPS) if index == 0 else ["klines"]
+    state = {}
+    for key in keys:
+        state[key] = main.fetch_source(key, shard=(index, total)) if key == "klines" else main.fetch_source(key)
+
+    payload = {"shard": index, "total": total, "state": {key: encode_result(value) for key, value in state.items()}}
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, cls=main.NpEncoder)
+    print(f"\n💾 分片结果已写入: {output} (耗时 {time.time() - start_time:.2f} 秒)")
+    return output
+
+# ==============================================================================
+# 合并
+# ==============================================================================
+
+def _shard_ranks(index, total):
+    """
+    分片内各标的的全局顺序 (按 KLINE_GROUPS 与目标配置顺序): {名称: deque([顺序, ...])}
+    同名标的可出现在多个分组 (如 中芯国际)，分组按顺序抓取，因此同名的第 k 条结果对应第 k 个分组
+    """
+    ranks = {}
+    position = 0
+    for _, targets, _ in MarketRadar.KLINE_GROUPS:
+        for name, config in targets.items():
+            if MarketRadar.shard_of(name, config, total) == index:
+                ranks.setdefault(name, deque()).append(position)
+            position += 1
+    return ranks
+
+def _ranked(rows, ranks, name_of):
+    """为一个分片的结果行标注全局顺序 (未知标的排在最后)"""
+    ranks = {name: deque(positions) for name, positions in ranks.items()}
+    ranked = []
+    for row in rows:
+        positions = ranks.get(name_of(row))
+        ranked.append((positions.popleft() if positions else float('inf'), row))
+    return ranked
+
+def merge_kline_results(shard_results, total=None):
+    """
+    合并各分片的 get_all_kline_data 结果
+    shard_results: [(分片号, 结果或异常)]，返回与单次运行同结构的 (data_collection, status_logs)
+    MA 行与状态日志按目标配置顺序输出
+    """
+    total = total or len(shard_results)
+    meta = None
+    tables = {group_name: [] for group_name, _, _ in MarketRadar.KLINE_GROUPS}
+    ma_rows = {"general": [], "commodities": []}
+    log_rows = []
+
+    for index, result in shard_results:
+        if isinstance(result, Exception) or result is None:
+            log_rows.append((float('inf'), {'name': f'kline_shard_{index}', 'status': False, 'error': str(result)}))
+            continue
+        collection, logs = result
+        meta = meta or collection.get("meta")
+        ranks = _shard_ranks(index, total)
+        for group_name, klines in collection.get("data", {}).items():
+            tables.setdefault(group_name, []).append(KlineTable.coerce(klines))
+        for key in ma_rows:
+            ma_rows[key].extend(_ranked(collection.get("ma_data", {}).get(key, []), ranks, lambda row: row.get("名称")))
+        log_rows.extend(_ranked(logs, ranks, lambda log: log['name']))
+
+    # 与 fetch_group_data 一致: 日期降序、名称升序
+    data = {group_name: KlineTable.concat(parts).sort_latest_first() for group_name, parts in tables.items()}
+    by_rank = lambda item: item[0]
+    ma_data = {key: [row for _, row in sorted(rows, key=by_rank)] for key, rows in ma_rows.items()}
+    status_logs = [log for _, log in sorted(log_rows, key=by_rank)]
+
+    return {"meta": meta or {}, "data": data, "ma_data": ma_data}, status_logs
+
+def merge_shards(paths, send_email=True):
+    """合并 N 个部分结果文件，写出完整报告与状态日志"""
+    payloads = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            payloads.append(json.load(f))
+
+    totals = {p["total"] for p in payloads}
+    if len(totals) != 1:
+        raise ValueError(f"分片总数不一致: {sorted(totals)}")
+    total = totals.pop()
+    indices = sorted(p["shard"] for p in payloads)
+    if indices != list(range(total)):
+        raise ValueError(f"分片不完整或重复: 期望 0..{total - 1}, 实际 {indices}")
+
+    payloads.sort(key=lambda p: p["shard"])
+    state = {key: decode_result(value) for key, value in payloads[0]["state"].items()}
+    state["klines"] = merge_kline_results([(p["shard"], decode_result(p["state"].get("klines"))) for p in payloads], total)
+    print(f"🧩 已合并 {total} 个分片")
+    main.save_state(state)
+
+    final_data, cleaned_logs, signal_summary = main.assemble_report(state)
+    return main.publish_report(final_data, cleaned_logs, signal_summary, send_email=send_email)
@@ -0,0 +1,160 @@
+# kline_table.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Columnar Kline Container
+# -----------------------------------------------------------------------------
+# 列式 K 线容器: 每列一个 NumPy 数组 (name 列即标的索引)，从抓取到写出报告全程保持列式，
+# 只在输出边界 (main.save_compact_json 逐行写出、--refresh-latest 修补已有报告、
+# 守护进程对外提供查询) 才物化为行记录，不再为每根K线分配一个 dict。
+#   - 单个标的: summarize_kline 的报告切片 -> KlineTable.from_frame
+#   - 任务组: KlineTable.concat 合并后 sort_latest_first (日期降序、名称升序)
+#   - 列类型提升与原 pd.DataFrame(记录列表) 一致 (int + float -> float，缺失列补 NaN)，
+#     物化出的行与原 to_dict(orient='records') 逐值相同
+#   - 原始结果 / 分片结果 / 队列结果中编码为 {"__table__": {"columns", "dtypes", "values"}}
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+class KlineTable:
+    """列式K线表: {列名: 等长一维数组}，列顺序即输出字段顺序"""
+    __slots__ = ("columns",)
+
+    def __init__(self, columns=None):
+        self.columns = dict(columns or {})
+
+    @classmethod
+    def from_frame(cls, df):
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            # datetime 列与 to_dict 一致输出 Timestamp
+            columns[col] = series.astype(object).to_numpy() if series.dtype.kind == 'M' else series.to_numpy()
+        return cls(columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """行记录 -> 表 (旧版原始结果文件中的K线列表)"""
+        import pandas as pd
+        return cls.from_frame(pd.DataFrame(records)) if records else cls()
+
+    @classmethod
+    def coerce(cls, value):
+        return value if isinstance(value, cls) else cls.from_records(value or [])
+
+    @classmethod
+    def concat(cls, tables):
+        """按出现顺序合并列; 缺失列补 NaN，列类型按 NumPy 规则提升"""
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls()
+        names = []
+        for table in tables:
+            names.extend(col for col in table.columns if col not in names)
+        columns = {}
+        for col in names:
+            parts = [t.columns[col] if col in t.columns else np.full(len(t), np.nan) for t in tables]
+            columns[col] = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return cls(columns)
+
+    def __deepcopy__(self, memo):
+        # 表不可变 (所有操作返回新表)，main.assemble_report 深拷贝原始结果时无需复制数组
+        return self
+
+    def __len__(self):
+        for values in self.columns.values():
+            return len(values)
+        return 0
+
+    def symbols(self):
+        """表内标的 (按首次出现顺序)"""
+        if 'name' not in self.columns:
+            return []
+        return list(dict.fromkeys(self.columns['name'].tolist()))
+
+    def take(self, index):
+        return KlineTable({col: values[index] for col, values in self.columns.items()})
+
+    def drop_symbols(self, names):
+        """去掉指定标的的全部K线"""
+        if not len(self) or 'name' not in self.columns:
+            return self
+        names = set(names)
+        keep = np.fromiter((name not in names for name in self.columns['name'].tolist()), dtype=bool, count=len(self))
+        return self if keep.all() else self.take(keep)
+
+    def sort_latest_first(self):
+        """日期降序、名称升序 (同日期同名称保持原顺序)"""
+        if len(self) < 2:
+            return self
+        _, date_rank = np.unique(self.columns['date'], return_inverse=True)
+        _, name_rank = np.unique(self.columns['name'], return_inverse=True)
+        return self.take(np.lexsort((name_rank, -date_rank)))
+
+    def map_values(self, func):
+        """逐值变换 (main.clean_and_round)，结果列为 object 数组"""
+        columns = {}
+        for col, values in self.columns.items():
+            mapped = np.empty(len(values), dtype=object)
+            mapped[:] = [func(v) for v in values.tolist()]
+            columns[col] = mapped
+        return KlineTable(columns)
+
+    def records(self):
+        """逐行物化为 dict (Python 原生类型)，仅在输出边界调用"""
+        keys = list(self.columns)
+        for row in zip(*(values.tolist() for values in self.columns.values())):
+            yield dict(zip(keys, row))
+
+    def to_list(self):
+        return list(self.records())
+
+    # ---------------- JSON 编码 ----------------
+    def to_json(self):
+        return {"__table__": {
+            "columns": list(self.columns),
+            "dtypes": [values.dtype.str if values.dtype != object else "object" for values in self.columns.values()],
+            "values": [values.tolist() for values in self.columns.values()],
+        }}
+
+    @classmethod
+    def from_json(cls, payload):
+        columns = {}
+        for col, dtype, values in zip(payload["columns"], payload["dtypes"], payload["values"]):
+            if dtype == "object":
+                array = np.empty(len(values), dtype=object)
+                array[:] = values
+            else:
+                array = np.array(values, dtype=dtype)
+            columns[col] = array
+        return cls(columns)
+
+# ==============================================================================
+# 嵌套结构中的表 (原始结果/分片/队列编码、输出边界物化)
+# ==============================================================================
+
+def _walk(value, convert):
+    """对嵌套 dict/list/tuple 中的值应用 convert，没有变化的容器原样返回 (不复制行记录)"""
+    converted = convert(value)
+    if converted is not value:
+        return converted
+    if isinstance(value, dict):
+        changed = {}
+        for key, item in value.items():
+            new_item = _walk(item, convert)
+            if new_item is not item:
+                changed[key] = new_item
+        return {**value, **changed} if changed else value
+    if isinstance(value, (list, tuple)):
+        items = [_walk(item, convert) for item in value]
+        if any(new is not old for new, old in zip(items, value)):
+            return type(value)(items)
+    return value
+
+def encode_tables(value):
+    return _walk(value, lambda v: v.to_json() if isinstance(v, KlineTable) else v)
+
+def decode_tables(value):
+    return _walk(value, lambda v: KlineTable.from_json(v["__table__"]) if isinstance(v, dict) and "__table__" in v else v)
+
+def materialize(value):
+    """把嵌套结构中的表物化为行记录列表"""
+    return _walk(value, lambda v: v.to_list() if isinstance(v, KlineTable) else v)
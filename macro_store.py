@@ -0,0 +1,181 @@
+# macro_store.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Release-Calendar-Aware Macro Store
+# -----------------------------------------------------------------------------
+# 本地宏观数据仓库: 按序列保存时点版本 (每次数据变化追加一个版本) 与发布观测记录，
+# 结合发布日历判断某序列是否需要重新抓取:
+#   1. 配置日历 RELEASE_SCHEDULE: 每月 day 日起视为新数据可能发布
+#   2. 推断日历: 根据历史上观测到新数据的日期间隔 (中位数) 推算下一次发布
+#      (仅限间隔不短于 MIN_INFERRED_GAP_DAYS 的低频序列，日频/周频序列不推断)
+#   3. 兜底: 缓存超过 MAX_AGE_DAYS 天未检查则强制刷新；无日历也无法推断的序列每次都抓取
+# 进入发布窗口后每次运行都会重抓，直到观测到新一期数据为止。
+#
+# 环境变量: MACRO_STORE_PATH 仓库文件路径, MACRO_CACHE=0 关闭缓存 (全部重抓)
+# -----------------------------------------------------------------------------
+
+import calendar
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from statistics import median
+from zoneinfo import ZoneInfo
+
+TZ_CN = ZoneInfo("Asia/Shanghai")
+
+MACRO_STORE_PATH = os.environ.get("MACRO_STORE_PATH", "macro_store.json")
+ENABLE_MACRO_CACHE = os.environ.get("MACRO_CACHE", "1") != "0"
+
+MAX_AGE_DAYS = 35       # 缓存最长检查间隔 (天)
+MAX_VERSIONS = 24       # 每个序列保留的时点版本数
+EARLY_DAYS = 2          # 推断日历时提前进入发布窗口的天数
+MIN_RELEASES = 3        # 推断日历所需的最少发布观测次数
+MIN_INFERRED_GAP_DAYS = 20  # 推断日历所需的最短发布间隔中位数 (天)，更短的序列每次都抓取
+
+# 配置日历: {目标名: {"day": 每月从该日起进入发布窗口}}，以北京时间计
+# 美联储/日本央行议息会议不按月，交给推断日历；日频序列 (CNN/CBOE/BDI 等) 不配置，每次都抓取
+RELEASE_SCHEDULE = {
+    "中国_CPI": {"day": 9},
+    "中国_PPI": {"day": 9},
+    "中国_PMI": {"day": 30},
+    "中国_货币供应量": {"day": 10},
+    "中国_LPR": {"day": 20},
+    "美国_ISM制造业PMI": {"day": 1},
+    "美国_ISM非制造业指数": {"day": 3},
+    "美国_非农就业": {"day": 1},
+    "美国_核心零售销售月率": {"day": 13},
+    "USA_ISM_New_Orders": {"day": 1},
+}
+
+DATE_KEYS = ["日期", "_std_date", "date"]
+
+def latest_stamp(records):
+    """序列最新一期的日期 (用于识别是否发布了新数据)，无法识别时返回 None"""
+    stamps = []
+    for record in records or []:
+        for key in DATE_KEYS:
+            if record.get(key):
+                stamps.append(str(record[key]))
+                break
+    return max(stamps) if stamps else None
+
+def _digest(records):
+    payload = json.dumps(records, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+def _parse(ts):
+    return datetime.fromisoformat(ts) if ts else None
+
+def _monthly_release(now, day):
+    """now 之前 (含) 最近一次按月配置的发布窗口起点"""
+    def at(year, month):
+        d = min(day, calendar.monthrange(year, month)[1])
+        return now.replace(year=year, month=month, day=d, hour=0, minute=0, second=0, microsecond=0)
+
+    current = at(now.year, now.month)
+    if now >= current:
+        return current
+    year, month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+    return at(year, month)
+
+class MacroStore:
+    """
+    宏观数据仓库 (JSON 文件)
+    series: {目标名: {"versions": [{"fetched_at", "latest", "digest", "data"}],
+                      "releases": [{"observed_at", "latest"}], "checked_at"}}
+    """
+    def __init__(self, path=MACRO_STORE_PATH, schedule=None):
+        self.path = path
+        self.schedule = RELEASE_SCHEDULE if schedule is None else schedule
+        self.series = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.series = json.load(f).get("series", {})
+        except Exception as e:
+            print(f"⚠️ [MacroStore] 仓库读取失败 ({self.path}): {e}")
+            self.series = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"series": self.series}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
+
+    # ---------------- 读取 ----------------
+    def latest(self, name):
+        versions = self.series.get(name, {}).get("versions", [])
+        return versions[-1]["data"] if versions else None
+
+    def as_of(self, name, when):
+        """时点查询: 返回 when 时刻已知的版本数据 (无则 None)"""
+        data = None
+        for version in self.series.get(name, {}).get("versions", []):
+            if _parse(version["fetched_at"]) <= when:
+                data = version["data"]
+        return data
+
+    # ---------------- 写入 ----------------
+    def update(self, name, data, now=None):
+        """记录一次成功抓取，数据有变化时追加版本，最新一期日期变化时记为一次发布；返回是否有新版本"""
+        now = now or datetime.now(TZ_CN)
+        stamp = latest_stamp(data)
+        digest = _digest(data)
+
+        with self._lock:
+            entry = self.series.setdefault(name, {"versions": [], "releases": [], "checked_at": None})
+            entry["checked_at"] = now.isoformat()
+            versions = entry["versions"]
+            if versions and versions[-1]["digest"] == digest:
+                return False
+
+            if not versions or versions[-1]["latest"] != stamp:
+                entry["releases"].append({"observed_at": now.isoformat(), "latest": stamp})
+                entry["releases"] = entry["releases"][-MAX_VERSIONS:]
+            versions.append({"fetched_at": now.isoformat(), "latest": stamp, "digest": digest, "data": data})
+            entry["versions"] = versions[-MAX_VERSIONS:]
+            return True
+
+    # ---------------- 发布日历 ----------------
+    def expected_release(self, name, now=None):
+        """now 之前最近一次预期发布时间 (配置优先，其次推断)；无法确定时返回 None"""
+        now = now or datetime.now(TZ_CN)
+        config = self.schedule.get(name)
+        if config and config.get("day"):
+            return _monthly_release(now, config["day"])
+
+        releases = [_parse(r["observed_at"]) for r in self.series.get(name, {}).get("releases", [])]
+        if len(releases) < MIN_RELEASES:
+            return None
+        gap = timedelta(seconds=median((b - a).total_seconds() for a, b in zip(releases, releases[1:])))
+        # 日频序列的间隔约 1 天，减去 EARLY_DAYS 后预期发布会早于最近一次观测，导致一直判为"已是最新"
+        if gap < timedelta(days=MIN_INFERRED_GAP_DAYS):
+            return None
+        return releases[-1] + gap - timedelta(days=EARLY_DAYS)
+
+    def is_due(self, name, now=None):
+        """返回 (是否需要抓取, 原因)"""
+        now = now or datetime.now(TZ_CN)
+        entry = self.series.get(name)
+        if not entry or not entry.get("versions"):
+            return True, "无缓存"
+
+        checked_at = _parse(entry.get("checked_at"))
+        if checked_at is None or now - checked_at > timedelta(days=MAX_AGE_DAYS):
+            return True, "缓存过期"
+
+        expected = self.expected_release(name, now)
+        if expected is None:
+            return True, "无发布日历"
+
+        last_release = _parse(entry["releases"][-1]["observed_at"]) if entry.get("releases") else None
+        if now >= expected and (last_release is None or last_release < expected):
+            return True, f"发布窗口 ({expected.strftime('%Y-%m-%d')})"
+        return False, f"已是最新 (最近发布观测: {last_release.strftime('%Y-%m-%d') if last_release else '-'})"
@@ -1,3 +1,5 @@
+import argparse
+import copy
 import json
 import os
 import sys
@@ -14,15 +16,17 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
-import fetch_data
 import MarketRadar
 import utils
-import scrape_economy_selenium
-# 引入 fetch_data_core 以直接调用新功能
-import fetch_data_core
+import intraday_core
+from kline_table import KlineTable
+# 数据源模块 (fetch_data / fetch_data_core / scrape_economy_selenium) 在对应抓取步骤中才导入，
+# 不运行 Selenium 步骤时不会导入 selenium
 
 OUTPUT_FILENAME = "MarketRadar_Report.json"
 LOG_FILENAME = "market_data_status.txt"
+# 各数据源原始结果 (供 --only/--skip 选择性运行合并，见 selective_run.py)
+STATE_FILENAME = "MarketRadar_State.json"
 TZ_CN = ZoneInfo("Asia/Shanghai")
 
 # 定义报告的时间范围（用于截取最终展示的数据）
@@ -40,6 +44,8 @@ class NpEncoder(json.JSONEncoder):
             return float(obj)
         elif isinstance(obj, np.ndarray):
             return obj.tolist()
+        elif isinstance(obj, KlineTable):
+            return obj.to_list()
         return super(NpEncoder, self).default(obj)
 
 def print_banner():
@@ -57,6 +63,8 @@ def clean_and_round(data):
         return {k: clean_and_round(v) for k, v in data.items()}
     elif isinstance(data, list):
         return [clean_and_round(x) for x in data]
+    elif isinstance(data, KlineTable):
+        return data.map_values(clean_and_round)
     elif isinstance(data, float):
         if math.isnan(data) or math.isinf(data):
             return None
@@ -115,9 +123,11 @@ def save_compact_json(data, filename):
                     for j, sub_key in enumerate(sub_keys):
                         sub_val = val[sub_key]
                         f.write(f'        "{sub_key}": ')
-                        if isinstance(sub_val, list):
+                        if isinstance(sub_val, (list, KlineTable)):
                             f.write('[\n')
-                            for k, item in enumerate(sub_val):
+                            # K线表在此逐行物化 (输出边界)
+                            rows = sub_val.records() if isinstance(sub_val, KlineTable) else sub_val
+                            for k, item in enumerate(rows):
                                 # 使用 NpEncoder 解决 int64 序列化错误
                                 item_str = json.dumps(item, ensure_ascii=False, cls=NpEncoder)
                                 comma = "," if k < len(sub_val) - 1 else ""
@@ -217,36 +227,112 @@ def parse_chinese_date(date_str):
     except:
         return pd.to_datetime(date_str, errors='coerce')
 
-def main():
-    start_time = time.time()
-    print_banner()
-    print("🚀 MarketRadar 启动主程序 (Integrated Version)...")
-    
-    all_status_logs = []
-
-    print("\n[Step 1/4] 获取汇率与国债数据 (fetch_data)...")
+# ==============================================================================
+# 数据源 (每个数据源独立抓取，结果原样保存在 state 中，供 assemble_report 组装)
+# ==============================================================================
+
+def _fetch_fx():
+    import fetch_data
+    return fetch_data.get_market_fx_and_bonds()
+
+def _fetch_macro(targets=None):
+    import scrape_economy_selenium
+    return scrape_economy_selenium.get_macro_data(targets=targets)
+
+def _fetch_klines(shard=None, select=None):
+    return MarketRadar.get_all_kline_data(shard=shard, select=select)
+
+def _fetch_vni():
+    import fetch_data
+    return fetch_data.fetch_vietnam_index_klines()
+
+def _fetch_banks():
+    import fetch_data_core
+    return fetch_data_core.fetch_us_banks_daily()
+
+# state 键 -> (步骤标题, 抓取函数)，按原主流程顺序执行
+SOURCE_STEPS = {
+    "fx": ("[Step 1/4] 获取汇率与国债数据 (fetch_data)...", _fetch_fx),
+    "macro": ("[Step 2/4] 抓取宏观经济指标 (Selenium)...", _fetch_macro),
+    "klines": ("[Step 3/4] 获取 K线数据 & 计算均线 & 技术指标...", _fetch_klines),
+    "vni": ("[Step 4/4] 获取越南胡志明指数 (Investing.com)...", _fetch_vni),
+    "intraday": ("[Step 4.6] 获取分时K线 (科创50 & 恒生科技 等, 见 intraday_core.INTRADAY_TARGETS)...", intraday_core.fetch_intraday_all),
+    "banks": ("[Step 4.7] 获取六大银行日线数据...", _fetch_banks),
+}
+
+def fetch_source(key, **kwargs):
+    """抓取单个数据源，返回其原始结果；抓取函数抛出的异常作为结果返回，由 assemble_report 统一处理"""
+    MarketRadar.init_runtime()
+    title, fetch_fn = SOURCE_STEPS[key]
+    print(f"\n{title}")
     try:
-        base_macro, logs_fx = fetch_data.get_market_fx_and_bonds()
-        all_status_logs.extend(logs_fx)
+        return fetch_fn(**kwargs)
     except Exception as e:
-        print(f"❌ fetch_data 失败: {e}")
-        base_macro = {"market_fx": {}, "china": {}, "usa": {}, "japan": {}}
-        all_status_logs.append({'name': 'fetch_data_module', 'status': False, 'error': str(e)})
+        return e
+
+def collect_state(keys=None):
+    """依次抓取全部 (或指定) 数据源"""
+    return {key: fetch_source(key) for key in (keys or SOURCE_STEPS)}
 
-    print("\n[Step 2/4] 抓取宏观经济指标 (Selenium)...")
+def save_state(state, path=STATE_FILENAME):
+    """保存各数据源原始结果 (编码方式与分片结果文件相同)"""
+    from kline_shards import encode_result
     try:
-        selenium_macro, logs_selenium = scrape_economy_selenium.get_macro_data()
-        all_status_logs.extend(logs_selenium)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({key: encode_result(value) for key, value in state.items()}, f, ensure_ascii=False, cls=NpEncoder)
+        return True
     except Exception as e:
-        print(f"❌ Selenium 抓取失败 (可能是环境问题): {e}")
+        print(f"⚠️ 原始结果保存失败 ({path}): {e}")
+        return False
+
+def load_state(path=STATE_FILENAME):
+    """读取 save_state 保存的原始结果，不存在时返回 None"""
+    from kline_shards import decode_result
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return {key: decode_result(value) for key, value in json.load(f).items()}
+
+# ==============================================================================
+# 报告组装
+# ==============================================================================
+
+def assemble_report(state):
+    """
+    由各数据源的原始结果组装最终报告 (不修改 state，可对同一 state 重复调用)
+    返回 (final_data, cleaned_logs, signal_summary)
+    """
+    state = {k: v if isinstance(v, Exception) else copy.deepcopy(v) for k, v in state.items()}
+    all_status_logs = []
+
+    # [Step 1] 汇率与国债
+    fx_result = state.get("fx")
+    if isinstance(fx_result, Exception) or fx_result is None:
+        print(f"❌ fetch_data 失败: {fx_result}")
+        base_macro = {"market_fx": {}, "china": {}, "usa": {}, "japan": {}}
+        all_status_logs.append({'name': 'fetch_data_module', 'status': False, 'error': str(fx_result)})
+    else:
+        base_macro, logs_fx = fx_result
+        all_status_logs.extend(logs_fx)
+
+    # [Step 2] 宏观经济指标 (Selenium)
+    macro_result = state.get("macro")
+    if isinstance(macro_result, Exception) or macro_result is None:
+        print(f"❌ Selenium 抓取失败 (可能是环境问题): {macro_result}")
         selenium_macro = {}
-        all_status_logs.append({'name': 'selenium_module', 'status': False, 'error': str(e)})
+        all_status_logs.append({'name': 'selenium_module', 'status': False, 'error': str(macro_result)})
+    else:
+        selenium_macro, logs_selenium = macro_result
+        all_status_logs.extend(logs_selenium)
 
     combined_macro = deep_merge(base_macro, selenium_macro)
 
-    print("\n[Step 3/4] 获取 K线数据 & 计算均线 & 技术指标...")
+    # [Step 3] K线数据 & 均线 & 技术指标
+    kline_state = state.get("klines")
     try:
-        kline_result, logs_klines = MarketRadar.get_all_kline_data()
+        if isinstance(kline_state, Exception) or kline_state is None:
+            raise kline_state or ValueError("K线数据未抓取")
+        kline_result, logs_klines = kline_state
         all_status_logs.extend(logs_klines)
         
         kline_data_dict = {"meta": kline_result.get("meta"), "data": kline_result.get("data")}
@@ -296,17 +382,19 @@ def main():
                  df_slice = df_hshci[df_hshci['date'] >= cutoff_date].copy()
                  df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d')
                  
-                 sliced_records = df_slice.to_dict(orient='records')
-                 combined_macro['hk'][hshci_key] = sliced_records
-                 print(f"✂️ {hshci_key} 数据已切片 (保留最近 {len(sliced_records)} 条)")
+                 sliced_klines = KlineTable.from_frame(df_slice)
+                 combined_macro['hk'][hshci_key] = sliced_klines
+                 print(f"✂️ {hshci_key} 数据已切片 (保留最近 {len(sliced_klines)} 条)")
 
         except Exception as e_ma:
              print(f"⚠️ {hshci_key} 均线计算或切片失败: {e_ma}")
 
-    # [Step 4/4] 获取越南胡志明指数 (Investing.com)...
-    print("\n[Step 4/4] 获取越南胡志明指数 (Investing.com)...")
+    # [Step 4] 越南胡志明指数
+    vni_result = state.get("vni")
     try:
-        vni_data, vni_err = fetch_data.fetch_vietnam_index_klines()
+        if isinstance(vni_result, Exception) or vni_result is None:
+            raise vni_result or ValueError("越南指数未抓取")
+        vni_data, vni_err = vni_result
         if vni_data:
             if "data" not in kline_data_dict or kline_data_dict["data"] is None:
                 kline_data_dict["data"] = {}
@@ -372,58 +460,42 @@ def main():
                 # Update kline_data_dict
                 if "data" not in kline_data_dict:
                      kline_data_dict["data"] = {}
-                kline_data_dict["data"][name] = df_ashare.to_dict(orient='records')
+                kline_data_dict["data"][name] = KlineTable.from_frame(df_ashare)
                 
                 print(f"   Processed {name}: {len(records)} records")
         except Exception as e:
             print(f"⚠️ A股指数处理失败: {e}")
 
-    # [Step 4.6] 获取 60分钟K线 (科创50 & 恒生科技)
-    print("\n[Step 4.6] 获取 60分钟K线 (科创50 & 恒生科技)...")
+    # [Step 4.6] 分时K线 (科创50 & 恒生科技 等)
     kcb50_dict = {}
-    
-    # 1. 科创50 60m
-    try:
-        kcb50_60m, err = fetch_data_core.fetch_kcb50_60m()
-        if kcb50_60m:
-            kcb50_dict["科创50_60分钟K线"] = kcb50_60m
-            all_status_logs.append({'name': '科创50_60m', 'status': True, 'error': None})
+    intraday_result = state.get("intraday")
+    if isinstance(intraday_result, Exception) or intraday_result is None:
+        print(f"⚠️ 分时K线异常: {intraday_result}")
+        intraday_series = {name: [] for name in intraday_core.INTRADAY_TARGETS}
+    else:
+        intraday_series, logs_intraday = intraday_result
+        all_status_logs.extend(logs_intraday)
+
+    # [修复] 即使失败也初始化为空列表，防止前端缺失Key
+    for name, records in intraday_series.items():
+        section = intraday_core.INTRADAY_TARGETS.get(name, {}).get("section", "hk")
+        if section == "科创50":
+            kcb50_dict[name] = records
         else:
-            # [修复] 即使失败也初始化为空列表，防止前端缺失Key
-            kcb50_dict["科创50_60分钟K线"] = []
-            all_status_logs.append({'name': '科创50_60m', 'status': False, 'error': err})
-    except Exception as e:
-        print(f"⚠️ 科创50_60m 异常: {e}")
-        kcb50_dict["科创50_60分钟K线"] = []
+            combined_macro.setdefault(section, {})[name] = records
         
-    # 2. 迁移原 China 下的科创50字段
+    # 迁移原 China 下的科创50字段
     china_data = combined_macro.get("china", {})
     keys_to_move = ["科创50实时快照", "科创50融资融券", "科创50估值"]
     for k in keys_to_move:
         if k in china_data:
             kcb50_dict[k] = china_data.pop(k) # Move data
-            
-    # 3. 恒生科技 60m
-    try:
-        hstech_60m, err = fetch_data_core.fetch_hstech_60m()
-        if "hk" not in combined_macro: combined_macro["hk"] = {}
-        
-        if hstech_60m:
-            combined_macro["hk"]["恒生科技指数_60m"] = hstech_60m
-            all_status_logs.append({'name': '恒生科技_60m', 'status': True, 'error': None})
-        else:
-            # [修复] 即使失败也初始化为空列表
-            combined_macro["hk"]["恒生科技指数_60m"] = []
-            all_status_logs.append({'name': '恒生科技_60m', 'status': False, 'error': err})
-    except Exception as e:
-        print(f"⚠️ 恒生科技_60m 异常: {e}")
-        if "hk" not in combined_macro: combined_macro["hk"] = {}
-        combined_macro["hk"]["恒生科技指数_60m"] = []
 
-    # [Step 4.7] 获取六大银行 K线与均线
-    print("\n[Step 4.7] 获取六大银行日线数据...")
+    # [Step 4.7] 六大银行 K线与均线
     try:
-        bank_dfs = fetch_data_core.fetch_us_banks_daily()
+        bank_dfs = state.get("banks")
+        if isinstance(bank_dfs, Exception) or bank_dfs is None:
+            raise bank_dfs or ValueError("银行数据未抓取")
         for df in bank_dfs:
             name = df['name'].iloc[0]
             # 计算均线
@@ -437,7 +509,7 @@ def main():
             df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d')
             
             if "data" not in kline_data_dict: kline_data_dict["data"] = {}
-            kline_data_dict["data"][name] = df_slice.to_dict(orient='records')
+            kline_data_dict["data"][name] = KlineTable.from_frame(df_slice)
             
             all_status_logs.append({'name': f"Bank_{name}", 'status': True, 'error': None})
             
@@ -459,27 +531,150 @@ def main():
             if log['name'] not in success_names:
                 cleaned_logs.append(log)
     
-    write_status_log(cleaned_logs, LOG_FILENAME)
-    
     # 生成技术信号摘要
     signal_summary = generate_signals_summary(ma_data_dict)
+    return final_data, cleaned_logs, signal_summary
+
+def publish_report(final_data, cleaned_logs, signal_summary, send_email=True):
+    """写出状态日志与报告，并按需发送邮件"""
+    import report_delta
+
+    write_status_log(cleaned_logs, LOG_FILENAME)
     print(signal_summary)
 
+    # 增量基准为最后一次发出的报告: 不发邮件的写出不改变基准
+    previous = report_delta.previous_report() if report_delta.ENABLE_REPORT_DELTA else None
     if save_compact_json(final_data, OUTPUT_FILENAME):
+        delta = None
+        if previous:
+            failed = [log['name'] for log in cleaned_logs if not log['status']]
+            delta, err = report_delta.write_delta(previous, OUTPUT_FILENAME, failed=failed)
+            if err:
+                print(f"⚠️ 增量报告生成失败: {err}")
+        if not send_email:
+            return True
         try:
-            email_subject = f"MarketRadar全量日报_{datetime.now(TZ_CN).strftime('%Y-%m-%d')}"
-            base_body = f"生成时间: {datetime.now(TZ_CN).strftime('%Y-%m-%d %H:%M:%S')}\n包含: 宏观, 汇率, K线(Stock/VNI/科创50/A股/银行), 信号扫描(MyTT)\n\n"
+            report_kind = "增量" if delta else "全量"
+            email_subject = f"MarketRadar{report_kind}日报_{datetime.now(TZ_CN).strftime('%Y-%m-%d')}"
+            contents = "宏观, 汇率, K线(Stock/VNI/科创50/A股/银行), 信号扫描(MyTT)"
+            contents = f"{contents} 中相对基准报告新增/变化/删除的记录" if delta else contents
+            base_body = f"生成时间: {datetime.now(TZ_CN).strftime('%Y-%m-%d %H:%M:%S')}\n包含: {contents}\n\n"
+            if delta:
+                # 附件只有增量: 说明基准报告与还原方式
+                base = delta.get("base", {})
+                base_body += (
+                    f"附件为相对上一份邮件报告的增量 ({report_delta.DELTA_FILENAME})，不是完整报告。\n"
+                    f"基准报告: 生成时间 {base.get('generated_at')}, sha256 {base.get('sha256')}\n"
+                    f"还原完整报告: python report_delta.py apply <上一份报告> {report_delta.DELTA_FILENAME} -o {OUTPUT_FILENAME}\n\n"
+                )
             
             email_body = generate_email_body_summary(cleaned_logs, signal_summary)
             email_body = base_body + email_body
             
-            attachments = [OUTPUT_FILENAME, LOG_FILENAME]
+            # 有上一份报告时只附增量 (可由上一份报告 + report_delta.py apply 还原完整报告)
+            attachments = [report_delta.DELTA_FILENAME if delta else OUTPUT_FILENAME, LOG_FILENAME]
             
-            MarketRadar.send_email(email_subject, email_body, attachments)
+            if MarketRadar.send_email(email_subject, email_body, attachments) and report_delta.ENABLE_REPORT_DELTA:
+                report_delta.mark_sent(OUTPUT_FILENAME)
         except Exception as e:
             print(f"⚠️ 邮件发送跳过或失败: {e}")
+        return True
+    return False
+
+def patch_latest_klines(report, klines_by_group, mas_by_group):
+    """
+    把快速刷新的结果写回已有报告: 替换对应标的的K线记录与均线/指标行，其余部分保持不变
+    mas_by_group: {组名: {名称: 均线+指标}}，同名标的按所属任务组定位均线行 (MarketRadar.ma_row_slots)
+    """
+    market_klines = report.setdefault("market_klines", {})
+    # 按修补前的报告定位均线行
+    slots = MarketRadar.ma_row_slots(market_klines)
+
+    for group_name, klines in klines_by_group.items():
+        if not klines:
+            continue
+        records = [r for r in market_klines.get(group_name, []) if r.get("name") not in klines]
+        # 已有报告为行记录，新K线表在此物化
+        for name_klines in klines.values():
+            records.extend(name_klines.records())
+        # 与全量运行一致: 日期降序、名称升序
+        records.sort(key=lambda r: r.get("name", ""))
+        records.sort(key=lambda r: r.get("date", ""), reverse=True)
+        market_klines[group_name] = records
+
+    tech = report.setdefault("技术分析", {})
+    sections = {group_name: MarketRadar.MA_SECTION_NAMES[ma_key] for group_name, _, ma_key in MarketRadar.KLINE_GROUPS}
+    for group_name, mas in mas_by_group.items():
+        for name, ma_info in mas.items():
+            section, ordinal = slots.get((group_name, name), (sections.get(group_name, "指数+个股日均线"), None))
+            rows = tech.setdefault(section, [])
+            matches = [i for i, row in enumerate(rows) if row.get("名称") == name]
+            if ordinal is not None and ordinal < len(matches):
+                rows[matches[ordinal]] = ma_info
+            else:
+                rows.append(ma_info)
+
+    report.setdefault("meta", {})["generated_at"] = datetime.now(TZ_CN).strftime("%Y-%m-%d %H:%M:%S")
+    return report
+
+def refresh_latest(report_path=OUTPUT_FILENAME):
+    """盘中快速刷新: 只更新已有报告中的 K线/均线/技术指标 (不运行 Selenium，不发邮件)"""
+    start_time = time.time()
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except Exception as e:
+        print(f"❌ 无法读取已有报告 {report_path} (需先完整运行一次): {e}")
+        return False
+
+    klines_by_group, mas_by_group, logs = MarketRadar.refresh_latest_klines()
+    report = clean_and_round(patch_latest_klines(report, klines_by_group, mas_by_group))
+
+    failed = [log for log in logs if not log['status']]
+    for log in failed:
+        print(f"⚠️ {log['name']}: {log['error']}")
+    ok = save_compact_json(report, report_path)
+    print(f"\n⚡ 快速刷新完成: {len(logs) - len(failed)}/{len(logs)} 个标的, 耗时 {time.time() - start_time:.2f} 秒")
+    return ok
+
+def main():
+    start_time = time.time()
+    print_banner()
+    print("🚀 MarketRadar 启动主程序 (Integrated Version)...")
+    
+    state = collect_state()
+    save_state(state)
+    final_data, cleaned_logs, signal_summary = assemble_report(state)
+    publish_report(final_data, cleaned_logs, signal_summary)
 
     print(f"\n✨ 任务完成，耗时: {time.time() - start_time:.2f} 秒")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="MarketRadar 主程序")
+    parser.add_argument("--refresh-latest", action="store_true",
+                        help="盘中快速刷新: 基于已保存的日线只抓取最新K线，更新已有报告中的K线/均线/技术指标")
+    parser.add_argument("--shard", metavar="i/N", help="分片运行: 只抓取第 i 个 (从 0 开始) 分片的K线，写出部分结果文件")
+    parser.add_argument("--merge-shards", nargs="+", metavar="FILE", help="合并 N 个分片结果文件为完整报告")
+    parser.add_argument("--only", action="append", metavar="SELECTOR",
+                        help="选择性运行 (可重复): fx / macro[:目标] / klines[:任务组或标的] / vni / intraday[:序列] / banks，结果合并进已有报告")
+    parser.add_argument("--skip", action="append", metavar="SOURCE", help="跳过的数据源 (可重复)，如 selenium；其余数据源运行后合并进已有报告")
+    parser.add_argument("--no-email", action="store_true", help="合并分片/选择性运行时不发送邮件")
+    args = parser.parse_args()
+
+    if args.refresh_latest:
+        refresh_latest()
+    elif args.shard:
+        import kline_shards
+        kline_shards.run_shard(*kline_shards.parse_shard(args.shard))
+    elif args.merge_shards:
+        import kline_shards
+        kline_shards.merge_shards(args.merge_shards, send_email=not args.no_email)
+    elif args.only or args.skip:
+        import selective_run
+        try:
+            selection = selective_run.parse_selectors(args.only, args.skip)
+        except ValueError as e:
+            parser.error(str(e))
+        selective_run.run_selected(selection, send_email=not args.no_email)
+    else:
+        main()
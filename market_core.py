@@ -1,7 +1,5 @@
 import os
 import pandas as pd
-import akshare as ak
-import yfinance as yf
 import requests
 import random
 import time
@@ -10,6 +8,11 @@ import numpy as np # MyTT 需要 numpy
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 
 import utils
+import adaptive_concurrency
+import kline_table
+import history_store
+import job_history
+import spot_snapshot
 
 # === 尝试导入 MyTT (假设用户已放置文件) ===
 try:
@@ -23,17 +26,14 @@ except ImportError:
         MyTT = None
         print("⚠️ Warning: MyTT.py not found. Technical indicators will be skipped.")
 
-# === 邮件相关库 ===
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-
 ENV_KEYS = {
     "FMP": os.environ.get("FMP_API_Key"),
 }
 
+# 技术指标只计算信号判断需要的最新 2 个值 (MyTT *_TAIL)，INDICATOR_TAIL=0 时回退为全序列计算
+INDICATOR_TAIL = os.environ.get("INDICATOR_TAIL", "1") != "0"
+INDICATOR_TAIL_BARS = 2
+
 # ========================================================
 # 技术指标计算辅助函数
 # ========================================================
@@ -41,6 +41,7 @@ def calculate_tech_indicators(df):
     """
     使用 MyTT 计算 MACD, KDJ, RSI
     df: 必须包含 'close', 'high', 'low', 'open' 列 (小写)
+    尾部求值模式只读取最后几百根K线 (见 MyTT 尾部求值说明)，与全序列结果在输出精度内一致
     """
     if MyTT is None or df.empty:
         return {}
@@ -52,17 +53,23 @@ def calculate_tech_indicators(df):
         LOW = df['low'].values
         OPEN = df['open'].values
         
-        # 1. MACD (12, 26, 9)
-        # MyTT.MACD 返回: DIF, DEA, MACD
-        dif, dea, macd_bar = MyTT.MACD(CLOSE)
-        
-        # 2. KDJ (9, 3, 3)
-        # MyTT.KDJ 返回: K, D, J
-        k, d, j = MyTT.KDJ(CLOSE, HIGH, LOW)
-        
-        # 3. RSI (6)
-        # MyTT.RSI 返回: RSI
-        rsi6 = MyTT.RSI(CLOSE, 6)
+        if INDICATOR_TAIL:
+            T = INDICATOR_TAIL_BARS
+            dif, dea, macd_bar = MyTT.MACD_TAIL(CLOSE, T=T)
+            k, d, j = MyTT.KDJ_TAIL(CLOSE, HIGH, LOW, T=T)
+            rsi6 = MyTT.RSI_TAIL(CLOSE, 6, T=T)
+        else:
+            # 1. MACD (12, 26, 9)
+            # MyTT.MACD 返回: DIF, DEA, MACD
+            dif, dea, macd_bar = MyTT.MACD(CLOSE)
+            
+            # 2. KDJ (9, 3, 3)
+            # MyTT.KDJ 返回: K, D, J
+            k, d, j = MyTT.KDJ(CLOSE, HIGH, LOW)
+            
+            # 3. RSI (6)
+            # MyTT.RSI 返回: RSI
+            rsi6 = MyTT.RSI(CLOSE, 6)
         
         # 取最新值 (最后一个)
         latest_idx = -1
@@ -199,6 +206,7 @@ class MarketFetcher:
 
     def fetch_akshare(self, symbol, asset_type):
         if not symbol: return pd.DataFrame()
+        import akshare as ak
         max_retries = 5
         
         for i in range(max_retries):
@@ -252,6 +260,7 @@ class MarketFetcher:
 
     def fetch_yfinance(self, symbol):
         if not symbol: return pd.DataFrame()
+        import yfinance as yf
         max_retries = 5
         
         for i in range(max_retries):
@@ -303,6 +312,21 @@ class MarketFetcher:
             print(" ❌")
         return pd.DataFrame()
 
+    def get_latest_bars(self, name, config):
+        """
+        快速刷新: 只抓取 fetch_start_date 之后的少量K线 (不做随机等待)
+        支持按日期区间请求的 AkShare 类型直接请求短区间，其余走 yfinance 短区间；
+        没有 yf 代码的标的 (如 上海金) 只能请求 AkShare 完整序列，再截取 fetch_start_date 之后的K线
+        """
+        df = pd.DataFrame()
+        if config.get("ak") and (config.get("type") in RANGE_AK_TYPES or not config.get("yf")):
+            df = self.normalize_df(self.fetch_akshare(config.get("ak"), config.get("type")), name)
+            if not df.empty and config.get("type") not in RANGE_AK_TYPES:
+                df = df[df['date'] >= pd.Timestamp(self.fetch_start_date)].reset_index(drop=True)
+        if df.empty:
+            df = self.normalize_df(self.fetch_yfinance(config.get("yf")), name)
+        return df
+
     def get_kline_data(self, name, config):
         print(f"正在获取 K线 [{name}] ...")
         time.sleep(random.uniform(1.0, 3.0))
@@ -322,58 +346,130 @@ class MarketFetcher:
             
         return df
 
+# AkShare 中按 start_date/end_date 请求的类型 (其余类型接口只能返回全量历史)
+RANGE_AK_TYPES = ("stock_zh_a", "etf_zh")
+
+_FETCH_LIMITER = None
+_KLINE_HISTORY = None
+_HISTORY_STORE = None
+
+def _get_fetch_limiter():
+    global _FETCH_LIMITER
+    if _FETCH_LIMITER is None:
+        _FETCH_LIMITER = adaptive_concurrency.fetch_limiter()
+    return _FETCH_LIMITER
+
+def _get_kline_history():
+    global _KLINE_HISTORY
+    if _KLINE_HISTORY is None:
+        _KLINE_HISTORY = job_history.JobHistory("kline")
+    return _KLINE_HISTORY
+
+def _get_history_store():
+    global _HISTORY_STORE
+    if _HISTORY_STORE is None:
+        _HISTORY_STORE = history_store.KlineHistoryStore()
+    return _HISTORY_STORE
+
+def summarize_kline(df, name, report_start_date, end_date):
+    """
+    由完整日线计算均线与技术指标，并切片出报告区间
+    返回 (K线表 KlineTable, 均线+指标信息)
+    """
+    # 确保日期升序
+    df = df.sort_values(by='date', ascending=True)
+
+    # 计算均线
+    ma_info_list = utils.calculate_ma(df) 
+    ma_info = ma_info_list[0] if ma_info_list else None
+    
+    # 计算技术指标 (MyTT) - 取最新的一个点
+    tech_indicators = calculate_tech_indicators(df)
+    
+    # 如果有均线信息，把技术指标合并进去
+    if ma_info:
+        ma_info.update(tech_indicators)
+
+    # 切片为用户配置的短周期 (用于展示 K线图)
+    df_slice = df[(df['date'] >= pd.to_datetime(report_start_date)) & (df['date'] <= pd.to_datetime(end_date))].copy()
+    
+    # 格式化日期 (保持列式，写出报告时才转换为行记录)
+    if not df_slice.empty:
+        df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d')
+        klines = kline_table.KlineTable.from_frame(df_slice)
+    else:
+        klines = kline_table.KlineTable()
+    
+    # 将技术指标也附加到 K线记录的最后一条（可选，或者前端只展示最新）
+    # 这里我们主要依赖 ma_info (它其实是 latest_info) 来传递指标
+    return klines, ma_info
+
+def _static_kline_estimate(config):
+    """无历史时的耗时估计 (秒): AkShare 优先最快，仅 yfinance 次之，两者都没有时要依次回退"""
+    if config.get("ak"):
+        return 4.0
+    if config.get("yf"):
+        return 6.0
+    return 8.0
+
+def fetch_target(fetcher, name, config, report_start_date, end_date):
+    """
+    单个标的: 抓取长周期日线、保存历史、计算均线/技术指标并切片
+    返回 (K线表, 均线信息, 状态日志)，失败时前两项为 None
+    """
+    try:
+        # 1. 获取长周期数据 (用于计算均线和指标)
+        df = fetcher.get_kline_data(name, config)
+        if df.empty:
+            return None, None, {'name': name, 'status': False, 'error': "Data source returned empty after retries"}
+
+        # 2. 保存完整日线，供盘中快速刷新使用
+        if history_store.ENABLE_KLINE_HISTORY:
+            try:
+                _get_history_store().save(name, config, df)
+            except Exception as e:
+                print(f"⚠️ [History] {name} 保存失败: {e}")
+
+        # 3. 均线 / 技术指标 / 报告切片
+        klines, ma_info = summarize_kline(df, name, report_start_date, end_date)
+        return klines, ma_info, {'name': name, 'status': True, 'error': None}
+
+    except Exception as e:
+        print(f"❌ 任务 {name} 异常: {e}")
+        return None, None, {'name': name, 'status': False, 'error': str(e)}
+
 def fetch_group_data(fetcher, targets, group_name, report_start_date, end_date):
     """
-    通用函数：返回 (K线数据列表, 均线数据列表, 状态日志列表)
+    通用函数：返回 (K线表 KlineTable, 均线数据列表, 状态日志列表)
     """
     print(f"\n🚀 开始处理任务组: {group_name} (并发模式)")
     
-    kline_list = []
+    kline_tables = []
     ma_list = []
     status_logs = []
     
     def fetch_task(name, config):
-        try:
-            # 1. 获取长周期数据 (用于计算均线和指标)
-            df = fetcher.get_kline_data(name, config)
-            if df.empty:
-                return None, None, {'name': name, 'status': False, 'error': "Data source returned empty after retries"}
-            
-            # 确保日期升序
-            df = df.sort_values(by='date', ascending=True)
-
-            # 2. 计算均线
-            ma_info_list = utils.calculate_ma(df) 
-            ma_info = ma_info_list[0] if ma_info_list else None
-            
-            # 3. 计算技术指标 (MyTT) - 取最新的一个点
-            tech_indicators = calculate_tech_indicators(df)
-            
-            # 如果有均线信息，把技术指标合并进去
-            if ma_info:
-                ma_info.update(tech_indicators)
-
-            # 4. 切片为用户配置的短周期 (用于展示 K线图)
-            df_slice = df[(df['date'] >= pd.to_datetime(report_start_date)) & (df['date'] <= pd.to_datetime(end_date))].copy()
-            
-            # 格式化日期
-            if not df_slice.empty:
-                df_slice['date'] = df_slice['date'].dt.strftime('%Y-%m-%d')
-                kline_records = df_slice.to_dict(orient='records')
-            else:
-                kline_records = []
-            
-            # 将技术指标也附加到 K线记录的最后一条（可选，或者前端只展示最新）
-            # 这里我们主要依赖 ma_info (它其实是 latest_info) 来传递指标
-            
-            return kline_records, ma_info, {'name': name, 'status': True, 'error': None}
-
-        except Exception as e:
-            print(f"❌ 任务 {name} 异常: {e}")
-            return None, None, {'name': name, 'status': False, 'error': str(e)}
-
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_name = {executor.submit(fetch_task, name, config): name for name, config in targets.items()}
+        return fetch_target(fetcher, name, config, report_start_date, end_date)
+
+    # AIMD 自适应并发: 控制器跨任务组复用，后续组沿用已学习到的并发数
+    limiter = _get_fetch_limiter()
+    history = _get_kline_history()
+
+    def limited_task(name, config):
+        with limiter.slot():
+            t0 = time.perf_counter()
+            result = fetch_task(name, config)
+        elapsed = time.perf_counter() - t0
+        status = result[2]
+        limiter.record(elapsed, ok=status['status'], throttled=adaptive_concurrency.is_throttle_error(status['error']))
+        history.record(name, elapsed, ok=status['status'])
+        return result
+
+    # 最长任务优先，不稳定任务穿插
+    schedule = history.order(list(targets), {name: _static_kline_estimate(config) for name, config in targets.items()})
+
+    with ThreadPoolExecutor(max_workers=limiter.max_workers) as executor:
+        future_to_name = {executor.submit(limited_task, name, targets[name]): name for name in schedule}
         
         for future in as_completed(future_to_name):
             name = future_to_name[future]
@@ -384,7 +480,7 @@ def fetch_group_data(fetcher, targets, group_name, report_start_date, end_date):
                 status_logs.append(status)
                 
                 if klines:
-                    kline_list.extend(klines)
+                    kline_tables.append(klines)
                 else:
                     print(f"⚠️ 警告: 无法获取 {name} 的K线数据 (范围为空?)")
                 
@@ -398,29 +494,106 @@ def fetch_group_data(fetcher, targets, group_name, report_start_date, end_date):
                 print(f"❌ 处理 {name} 结果时出错: {e}")
                 status_logs.append({'name': name, 'status': False, 'error': f"Processing error: {str(e)}"})
 
-    if kline_list:
-        temp_df = pd.DataFrame(kline_list)
-        temp_df.sort_values(by=['date', 'name'], ascending=[False, True], inplace=True)
-        final_kline_data = temp_df.to_dict(orient='records')
-    else:
-        final_kline_data = []
+    try:
+        history.save()
+    except Exception as e:
+        print(f"⚠️ [JobHistory] 历史写入失败: {e}")
+
+    # 列式合并: 日期降序、名称升序
+    final_kline_data = kline_table.KlineTable.concat(kline_tables).sort_latest_first()
 
     return final_kline_data, ma_list, status_logs
 
+def _snapshot_bar(history, name, config, end_date):
+    """
+    从共享的全市场行情表读取当日K线 (A股/ETF/港股)
+    仅当历史截止到上一个工作日 (没有缺口) 时使用，否则返回 None，由调用方逐个标的请求短区间
+    """
+    market = spot_snapshot.ASSET_MARKETS.get(config.get("type"))
+    if not market or not config.get("ak"):
+        return None
+    today = pd.Timestamp(end_date)
+    last = history.iloc[-1]
+    if today.dayofweek >= 5 or last['date'] < today - pd.offsets.BDay(1):
+        return None
+    try:
+        bar = spot_snapshot.get_snapshot().partial_bar(market, config["ak"], name)
+    except Exception as e:
+        print(f"⚠️ [Spot] {name} 行情表读取失败，改为单独请求: {str(e)[:60]}")
+        return None
+    if bar is None or bar["date"] != today:
+        return None
+    # 节假日行情表仍显示上一交易日数据，与历史最后一根相同则视为未开盘
+    if last['date'] < today:
+        try:
+            if float(bar["close"]) == float(last['close']) and float(bar["volume"]) == float(last['volume']):
+                return None
+        except (TypeError, ValueError):
+            pass
+    return MarketFetcher(end_date, end_date).normalize_df(pd.DataFrame([bar]), name)
+
+def refresh_latest_group(targets, report_start_date, end_date, lookback_days=7, workers=8):
+    """
+    盘中快速刷新: 读取已保存的完整日线，只抓取最近 lookback_days 天的K线合并后重算
+    返回 ({名称: K线表}, {名称: 均线+指标}, 状态日志)；无历史的标的记为失败 (需先全量运行一次)
+    """
+    store = _get_history_store()
+    # yfinance 的 end 为开区间，取到明天才能包含今日K线
+    fetch_end = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def refresh_task(name, config):
+        try:
+            history = store.load(name, config)
+            if history is None:
+                return name, None, None, {'name': name, 'status': False, 'error': "No stored history (run a full fetch first)"}
+            fresh = _snapshot_bar(history, name, config, end_date)
+            if fresh is None:
+                since = (history['date'].iloc[-1] - pd.Timedelta(days=lookback_days)).strftime('%Y-%m-%d')
+                fresh = MarketFetcher(since, fetch_end).get_latest_bars(name, config)
+            if fresh.empty:
+                return name, None, None, {'name': name, 'status': False, 'error': "Latest quote unavailable"}
+
+            df = history_store.merge_latest(history, fresh)
+            store.save(name, config, df)
+            klines, ma_info = summarize_kline(df, name, report_start_date, end_date)
+            return name, klines, ma_info, {'name': name, 'status': True, 'error': None}
+        except Exception as e:
+            print(f"❌ 快速刷新 {name} 异常: {e}")
+            return name, None, None, {'name': name, 'status': False, 'error': str(e)}
+
+    klines, mas, status_logs = {}, {}, []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(refresh_task, name, config) for name, config in targets.items()]
+        for future in as_completed(futures):
+            name, name_klines, ma_info, status = future.result()
+            status_logs.append(status)
+            if status['status']:
+                klines[name] = name_klines
+                if ma_info:
+                    mas[name] = ma_info
+    return klines, mas, status_logs
+
 def send_email(subject, body, attachment_files, sender_email, sender_password, receiver_email, smtp_server, smtp_port, enable_email):
     """
-    发送带有多个附件的邮件 (QQ邮箱使用 SMTP_SSL:465)
+    发送带有多个附件的邮件 (QQ邮箱使用 SMTP_SSL:465)，返回是否发送成功
     """
     if not enable_email:
         print("\n🔕 邮件功能已关闭，跳过发送。")
-        return
+        return False
     
     if not sender_email or not sender_password:
         print("\n❌ 错误：未检测到 SENDER_EMAIL 或 SENDER_PASSWORD 环境变量，无法发送邮件！")
-        return
+        return False
 
     print("\n📧 正在准备发送邮件...")
-    
+
+    # 邮件相关库只在发送时导入
+    import smtplib
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     msg = MIMEMultipart()
     msg['From'] = sender_email
     msg['To'] = receiver_email
@@ -459,5 +632,7 @@ def send_email(subject, body, attachment_files, sender_email, sender_password, r
         server.sendmail(sender_email, receiver_email, msg.as_string())
         server.quit()
         print("✅ 邮件发送成功！")
+        return True
     except Exception as e:
-        print(f"❌ 邮件发送失败: {e}")
\ No newline at end of file
+        print(f"❌ 邮件发送失败: {e}")
+        return False
\ No newline at end of file
@@ -0,0 +1,336 @@
+# query_api.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Local Query API
+# -----------------------------------------------------------------------------
+# 本机 HTTP/JSON 查询接口，按需返回报告中的单个切片，避免下游为读一行均线而解析整份报告。
+# 数据来源:
+#   - FileReportSource:   已写出的 MarketRadar_Report.json (文件变化时自动重新加载)
+#   - DaemonReportSource: radar_daemon 进程内最近一次组装的报告 (radar_daemon --api-port)
+#
+# 路由:
+#   /                          可用名称与数据版本
+#   /klines/{name}?from=&to=   K线 (market_klines / 科创50 / hk 中的序列，或任务组内的单个标的)，按日期闭区间过滤
+#   /ma/{name}                 均线与技术指标行 (技术分析)
+#   同名标的出现在多个任务组时 (如 中芯国际) 用 ?group=任务组 指定，未指定时返回 409 与候选任务组
+#   /signals                   有效技术信号列表
+#   /macro/{country}/{metric}  宏观序列 (china / usa / japan / hk / market_fx)
+#
+# 响应带 ETag (If-None-Match 命中返回 304)，客户端接受 gzip 时压缩。
+#
+# 用法: python query_api.py --report MarketRadar_Report.json --port 8766
+# -----------------------------------------------------------------------------
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_PORT = 8766
+DEFAULT_REPORT_PATH = "MarketRadar_Report.json"
+GZIP_MIN_BYTES = 1024     # 小于该大小的响应不压缩
+CACHE_ENTRIES = 512       # 每个数据版本缓存的响应数
+
+KLINE_SECTIONS = ["market_klines", "科创50", "hk"]
+MA_SECTIONS = ["指数+个股日均线", "大宗商品"]
+MACRO_SECTIONS = ["china", "usa", "japan", "hk", "market_fx", "科创50"]
+DATE_KEYS = ["date", "日期"]
+
+def _json_default(obj):
+    # numpy 标量/数组 (守护进程内存中的报告可能仍含 numpy 类型)
+    if hasattr(obj, "item"):
+        return obj.item()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+# ==============================================================================
+# 数据来源
+# ==============================================================================
+
+class FileReportSource:
+    """报告文件 (按 mtime + size 识别版本，变化时重新加载)"""
+    def __init__(self, path=DEFAULT_REPORT_PATH):
+        self.path = path
+        self._report = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """返回 (report, version)，文件不存在时返回 (None, None)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None, None
+        version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        with self._lock:
+            if version != self._version:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._report = json.load(f)
+                self._version = version
+            return self._report, self._version
+
+class DaemonReportSource:
+    """radar_daemon.RadarDaemon 最近一次组装的报告"""
+    def __init__(self, daemon):
+        self.daemon = daemon
+
+    def snapshot(self):
+        return self.daemon.report, self.daemon.report_version
+
+# ==============================================================================
+# 查询
+# ==============================================================================
+
+def _record_date(record):
+    for key in DATE_KEYS:
+        if record.get(key) is not None:
+            return str(record[key])
+    return None
+
+def _filter_dates(records, date_from=None, date_to=None):
+    """按日期闭区间过滤 (比较日期前缀，兼容 '2025-01-02 10:30' 形式的分钟K线)"""
+    if not date_from and not date_to:
+        return records
+    result = []
+    for record in records:
+        date = _record_date(record)
+        if date is None:
+            continue
+        if date_from and date[:len(date_from)] < date_from:
+            continue
+        if date_to and date[:len(date_to)] > date_to:
+            continue
+        result.append(record)
+    return result
+
+def kline_names(report):
+    """序列名 + 任务组内的标的名"""
+    names = []
+    for section in KLINE_SECTIONS:
+        for name, value in (report.get(section) or {}).items():
+            if isinstance(value, list) and value and isinstance(value[0], dict) and _record_date(value[0]):
+                names.append(name)
+    for records in (report.get("market_klines") or {}).values():
+        if isinstance(records, list):
+            names.extend(r.get("name") for r in records if r.get("name") is not None)
+    return list(dict.fromkeys(names))
+
+def symbol_groups(report, name):
+    """包含该标的的任务组 (按 market_klines 中记录的 name 查找，报告顺序)"""
+    return [group_name for group_name, records in (report.get("market_klines") or {}).items()
+            if isinstance(records, list) and any(r.get("name") == name for r in records)]
+
+def _select_group(report, name, group):
+    """标的所属任务组，返回 (任务组或 None, 错误响应或 None)"""
+    groups = symbol_groups(report, name)
+    if group is not None:
+        if group not in groups:
+            return None, (404, {"error": f"任务组 {group} 中没有: {name}"})
+        return group, None
+    if len(groups) > 1:
+        return None, (409, {"error": f"{name} 出现在多个任务组，请用 ?group= 指定", "groups": groups})
+    return (groups[0] if groups else None), None
+
+def find_klines(report, name, group=None):
+    """未指定任务组时先按序列名查找; 指定任务组时返回该组内该标的的记录"""
+    if group is not None:
+        return [r for r in report["market_klines"][group] if r.get("name") == name]
+    for section in KLINE_SECTIONS:
+        value = (report.get(section) or {}).get(name)
+        if isinstance(value, list):
+            return value
+    return None
+
+def ma_rows(report):
+    tech = report.get("技术分析") or {}
+    return [row for section in MA_SECTIONS for row in tech.get(section, [])]
+
+def find_ma(report, name, group=None):
+    """指定任务组时按 MarketRadar.ma_row_slots 定位同名标的中属于该组的一行"""
+    slot = None
+    if group is not None:
+        # 只在指定任务组时导入 (MarketRadar 依赖 pandas，不计入接口启动耗时)
+        import MarketRadar
+        slot = MarketRadar.ma_row_slots(report.get("market_klines")).get((group, name))
+    if slot:
+        section, ordinal = slot
+        rows = [row for row in (report.get("技术分析") or {}).get(section, []) if row.get("名称", row.get("name")) == name]
+        return rows[ordinal] if ordinal < len(rows) else None
+    for row in ma_rows(report):
+        if row.get("名称", row.get("name")) == name:
+            return row
+    return None
+
+def active_signals(report):
+    result = []
+    for row in ma_rows(report):
+        signals = [s for s in row.get("Signals", []) if s != "无特殊技术形态"]
+        if signals:
+            result.append({"名称": row.get("名称", row.get("name")), "日期": row.get("日期"), "Signals": signals})
+    return result
+
+def resolve(report, path, query):
+    """路由分发，返回 (状态码, payload)"""
+    parts = [unquote(p) for p in path.strip("/").split("/") if p]
+    if not parts:
+        return 200, {
+            "meta": report.get("meta", {}),
+            "klines": kline_names(report),
+            "ma": [row.get("名称", row.get("name")) for row in ma_rows(report)],
+            "macro": {c: list((report.get(c) or {}).keys()) for c in MACRO_SECTIONS if report.get(c)},
+        }
+
+    route = parts[0]
+    group = (query.get("group") or [None])[0]
+    if route == "klines" and len(parts) == 2:
+        records = find_klines(report, parts[1]) if group is None else None
+        if records is None:
+            group, error = _select_group(report, parts[1], group)
+            if error:
+                return error
+            if group is None:
+                return 404, {"error": f"未找到K线: {parts[1]}"}
+            records = find_klines(report, parts[1], group)
+        date_from = (query.get("from") or [None])[0]
+        date_to = (query.get("to") or [None])[0]
+        payload = {"name": parts[1], "data": _filter_dates(records, date_from, date_to)}
+        if group is not None:
+            payload["group"] = group
+        return 200, payload
+    if route == "ma" and len(parts) == 2:
+        _, error = _select_group(report, parts[1], group)
+        if error:
+            return error
+        row = find_ma(report, parts[1], group)
+        if row is None:
+            return 404, {"error": f"未找到均线: {parts[1]}"}
+        return 200, row
+    if route == "signals" and len(parts) == 1:
+        return 200, {"generated_at": report.get("meta", {}).get("generated_at"), "signals": active_signals(report)}
+    if route == "macro" and len(parts) == 3:
+        country, metric = parts[1], parts[2]
+        if country not in MACRO_SECTIONS or metric not in (report.get(country) or {}):
+            return 404, {"error": f"未找到宏观序列: {country}/{metric}"}
+        return 200, {"country": country, "metric": metric, "data": report[country][metric]}
+    return 404, {"error": f"未知路由: {path}"}
+
+# ==============================================================================
+# HTTP 服务
+# ==============================================================================
+
+class QueryServer:
+    """
+    查询服务
+    source: 提供 snapshot() -> (report, version) 的数据来源
+    同一数据版本下，相同请求的序列化结果与 gzip 结果会被缓存
+    """
+    def __init__(self, source, host="127.0.0.1", port=DEFAULT_PORT):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+        self._cache = {}
+        self._cache_version = None
+        self._lock = threading.Lock()
+
+    def render(self, path, query_string):
+        """返回 (状态码, body bytes, etag, gzip body 或 None)"""
+        report, version = self.source.snapshot()
+        if report is None:
+            body = json.dumps({"error": "报告尚未生成"}, ensure_ascii=False).encode("utf-8")
+            return 503, body, None, None
+
+        key = (path, query_string)
+        with self._lock:
+            if version != self._cache_version:
+                self._cache = {}
+                self._cache_version = version
+            cached = self._cache.get(key)
+        if cached:
+            return cached
+
+        status, payload = resolve(report, path, parse_qs(query_string))
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        etag = f'"{hashlib.md5(body).hexdigest()}"' if status == 200 else None
+        gz = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        entry = (status, body, etag, gz)
+        with self._lock:
+            if version == self._cache_version and len(self._cache) < CACHE_ENTRIES:
+                self._cache[key] = entry
+        return entry
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                try:
+                    status, body, etag, gz = server.render(parsed.path, parsed.query)
+                except Exception as e:
+                    status, body, etag, gz = 500, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"), None, None
+
+                if etag and etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                use_gzip = gz is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+                data = gz if use_gzip else body
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Vary", "Accept-Encoding")
+                if etag:
+                    self.send_header("ETag", etag)
+                if use_gzip:
+                    self.send_header("Content-Encoding", "gzip")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """后台线程启动"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"🔎 [QueryAPI] 已启动: http://{self.host}:{self.port} (/klines, /ma, /signals, /macro)")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketRadar 本地查询接口")
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH, help="报告文件路径")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    query_server = QueryServer(FileReportSource(args.report), args.host, args.port).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        query_server.stop()
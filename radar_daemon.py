@@ -0,0 +1,292 @@
+# radar_daemon.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Resident Daemon Mode
+# -----------------------------------------------------------------------------
+# 常驻进程模式: 进程长期存活，HTTP 会话 (fetch_data_core.SESSION 等)、浏览器标签页池、
+# 宏观爬虫实例 (含宏观数据仓库/任务历史) 保持热状态，各数据源按各自周期独立刷新，
+# 最新结果保存在内存中。报告由 main.assemble_report 基于内存状态组装，输出与单次运行
+# 完全相同的 MarketRadar_Report.json / market_data_status.txt。
+#
+#   - 刷新失败 (异常或无数据) 时保留上一次成功的结果
+#   - 报告按定时器 (--report-interval) 写出，也可按需触发:
+#       kill -USR1 <pid>  或  curl http://127.0.0.1:<control-port>/report
+#   - 所有数据源至少成功抓取 (或尝试) 一次之前不写报告
+#   - 默认不发邮件，--email 时每次写报告后发送
+#   - --api-port 时同时启动 query_api 查询接口，直接读取内存中的最新报告
+#
+# 用法:
+#   python radar_daemon.py --report-interval 900 --control-port 8765
+#   python radar_daemon.py --schedule schedule.json   # {"klines": 600, "macro": 7200}
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import browser_pool
+import kline_table
+import main
+import MarketRadar
+import query_api
+import selenium_core
+import selenium_network
+
+# 各数据源刷新周期 (秒)
+DEFAULT_SCHEDULE = {
+    "fx": 15 * 60,
+    "macro": 60 * 60,
+    "klines": 15 * 60,
+    "vni": 60 * 60,
+    "intraday": 5 * 60,
+    "banks": 60 * 60,
+}
+
+DEFAULT_REPORT_INTERVAL = 15 * 60
+REFRESH_WORKERS = 3
+TICK = 1.0
+
+def _is_failure(result):
+    """抓取结果是否视为失败: 异常、None、或 (数据, 错误) 元组中数据为空、或空列表"""
+    if result is None or isinstance(result, Exception):
+        return True
+    if isinstance(result, tuple):
+        return not result[0]
+    if isinstance(result, list):
+        return not result
+    return False
+
+def _error_text(result):
+    if isinstance(result, Exception):
+        return str(result)
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], str):
+        return result[1]
+    return "无数据"
+
+class RadarDaemon:
+    """
+    常驻调度器
+    schedule:        {数据源: 刷新周期秒}，键为 main.SOURCE_STEPS 的键
+    report_interval: 定时写报告的周期 (秒)，0 为只按需写出
+    send_email:      写报告后是否发送邮件
+    use_tab_pool:    宏观爬虫使用常驻标签页池 (浏览器进程跨刷新复用)
+    """
+    def __init__(self, schedule=None, report_interval=DEFAULT_REPORT_INTERVAL, send_email=False, use_tab_pool=True):
+        self.schedule = dict(DEFAULT_SCHEDULE)
+        self.schedule.update(schedule or {})
+        unknown = set(self.schedule) - set(main.SOURCE_STEPS)
+        if unknown:
+            raise ValueError(f"未知数据源: {sorted(unknown)}")
+        self.report_interval = report_interval
+        self.send_email = send_email
+
+        self.state = {}
+        self.updated_at = {}
+        self.last_error = {}
+        self.next_due = {key: 0.0 for key in self.schedule}
+        self.running = set()
+        self.reports_written = 0
+        self.last_report_at = None
+        self.report = None          # 最近一次组装的报告 (供 query_api 读取)
+        self.report_version = None
+
+        self._lock = threading.Lock()
+        self._report_lock = threading.Lock()
+        self._report_requested = threading.Event()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS)
+        self._control = None
+        self._api = None
+
+        # 宏观爬虫实例常驻: 仓库与任务历史只加载一次
+        self.scraper = selenium_core.MacroDataScraper()
+        self.pool = None
+        if use_tab_pool:
+            self.pool = browser_pool.TabPool(self.scraper.chrome_options, capture_network=selenium_network.ENABLE_XHR_CAPTURE)
+            self.scraper.shared_pool = self.pool
+
+    # ---------------- 数据源刷新 ----------------
+    def _fetch(self, key):
+        if key == "macro":
+            print(f"\n{main.SOURCE_STEPS[key][0]}")
+            try:
+                return self.scraper.get_data_dict()
+            except Exception as e:
+                return e
+        if key == "klines":
+            MarketRadar.refresh_dates()
+        return main.fetch_source(key)
+
+    def refresh(self, key):
+        """刷新单个数据源；失败时保留上一次成功的结果"""
+        t0 = time.time()
+        result = self._fetch(key)
+        elapsed = time.time() - t0
+        with self._lock:
+            self.running.discard(key)
+            self.next_due[key] = time.time() + self.schedule[key]
+            if _is_failure(result):
+                self.last_error[key] = _error_text(result)
+                if key in self.state and not _is_failure(self.state[key]):
+                    print(f"⚠️ [Daemon] {key} 刷新失败，保留上次结果: {self.last_error[key]}")
+                    return
+            else:
+                self.last_error[key] = None
+            self.state[key] = result
+            self.updated_at[key] = datetime.now(main.TZ_CN).isoformat(timespec='seconds')
+        print(f"🔄 [Daemon] {key} 已刷新 ({elapsed:.1f}s)")
+
+    def _submit_due(self):
+        now = time.time()
+        with self._lock:
+            due = [key for key in self.schedule if key not in self.running and now >= self.next_due[key]]
+            self.running.update(due)
+        for key in due:
+            self._executor.submit(self.refresh, key)
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(key in self.state for key in self.schedule)
+
+    # ---------------- 报告 ----------------
+    def request_report(self):
+        self._report_requested.set()
+
+    def write_report(self):
+        """基于当前内存状态组装并写出报告"""
+        with self._lock:
+            snapshot = dict(self.state)
+        with self._report_lock:
+            final_data, cleaned_logs, signal_summary = main.assemble_report(snapshot)
+            ok = main.publish_report(final_data, cleaned_logs, signal_summary, send_email=self.send_email)
+            if ok:
+                # 查询接口按行记录读取，K线表在此物化
+                self.report = kline_table.materialize(final_data)
+                self.reports_written += 1
+                self.report_version = str(self.reports_written)
+                self.last_report_at = datetime.now(main.TZ_CN).isoformat(timespec='seconds')
+                print(f"📝 [Daemon] 报告已写出 (第 {self.reports_written} 次)")
+            return ok
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            sources = {
+                key: {
+                    "interval": self.schedule[key],
+                    "updated_at": self.updated_at.get(key),
+                    "last_error": self.last_error.get(key),
+                    "refreshing": key in self.running,
+                    "next_in": max(0, round(self.next_due[key] - now)),
+                }
+                for key in self.schedule
+            }
+        return {"ready": self.ready, "reports_written": self.reports_written,
+                "last_report_at": self.last_report_at, "sources": sources}
+
+    # ---------------- 控制端口 ----------------
+    def start_control(self, port, host="127.0.0.1"):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/status":
+                    self._send(200, daemon.status())
+                elif path == "/report":
+                    daemon.request_report()
+                    self._send(202, {"queued": True, "ready": daemon.ready})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            do_POST = do_GET
+
+            def _send(self, code, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._control = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._control.serve_forever, daemon=True).start()
+        print(f"🎛️ [Daemon] 控制端口: http://{host}:{self._control.server_address[1]} (/status, /report)")
+        return self._control.server_address[1]
+
+    def start_api(self, port, host="127.0.0.1"):
+        self._api = query_api.QueryServer(query_api.DaemonReportSource(self), host, port).start()
+        return self._api.port
+
+    # ---------------- 主循环 ----------------
+    def run(self):
+        print(f"🛰️ [Daemon] 常驻模式启动: {', '.join(f'{k}={v}s' for k, v in self.schedule.items())}")
+        next_report = time.time() + self.report_interval if self.report_interval else None
+        try:
+            while not self._stop.is_set():
+                self._submit_due()
+                timer_due = next_report is not None and time.time() >= next_report
+                if (timer_due or self._report_requested.is_set()) and self.ready:
+                    self._report_requested.clear()
+                    try:
+                        self.write_report()
+                    except Exception as e:
+                        print(f"❌ [Daemon] 报告写出失败: {e}")
+                    if next_report is not None:
+                        next_report = time.time() + self.report_interval
+                self._stop.wait(TICK)
+        finally:
+            self.close()
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def close(self):
+        if self._control:
+            self._control.shutdown()
+            self._control.server_close()
+            self._control = None
+        if self._api:
+            self._api.stop()
+            self._api = None
+        self._executor.shutdown(wait=True)
+        if self.pool:
+            self.pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketRadar 常驻模式")
+    parser.add_argument("--schedule", help="刷新周期配置文件 (JSON: {数据源: 秒})")
+    parser.add_argument("--report-interval", type=int, default=DEFAULT_REPORT_INTERVAL, help="定时写报告周期 (秒, 0 为只按需写出)")
+    parser.add_argument("--control-port", type=int, default=0, help="本机控制端口 (0 为不启用)")
+    parser.add_argument("--api-port", type=int, default=0, help="查询接口端口 (0 为不启用)")
+    parser.add_argument("--email", action="store_true", help="每次写报告后发送邮件")
+    parser.add_argument("--no-tab-pool", action="store_true", help="宏观爬虫不使用常驻标签页池")
+    args = parser.parse_args()
+
+    schedule = None
+    if args.schedule:
+        with open(args.schedule, "r", encoding="utf-8") as f:
+            schedule = json.load(f)
+
+    main.print_banner()
+    radar_daemon = RadarDaemon(schedule, args.report_interval, args.email, use_tab_pool=not args.no_tab_pool)
+    if args.control_port:
+        radar_daemon.start_control(args.control_port)
+    if args.api_port:
+        radar_daemon.start_api(args.api_port)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *a: radar_daemon.request_report())
+    signal.signal(signal.SIGTERM, radar_daemon.stop)
+    try:
+        radar_daemon.run()
+    except KeyboardInterrupt:
+        radar_daemon.stop()
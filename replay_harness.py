@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+MarketRadar/replay_harness.py
+离线录制/回放工具 (Record / Replay)：
+1. record 模式: 真实运行 main.main，拦截全部上游响应 (AkShare/yfinance DataFrame、HTTP 响应体、
+   Selenium 页面源码与元素文本) 写入夹具包 (fixture bundle)
+2. replay 模式: 不访问网络，从夹具包按调用顺序回放，可选模拟延迟，用于稳定地对比性能优化
+
+拦截点 (调用时按属性查找，因此无需修改业务代码):
+    - akshare 模块下的全部公开函数
+    - yfinance.download / yfinance.Ticker.history
+    - requests.Session.request (requests.get 等同样经过这里)
+    - selenium.webdriver.Chrome (录制时包一层代理, 回放时替换为 ReplayDriver)
+
+用法:
+    python replay_harness.py record fixtures/20250101
+    python replay_harness.py replay fixtures/20250101 --latency-scale 1.0
+    python replay_harness.py replay fixtures/20250101 --latency 0.05 --workdir /tmp/radar_out
+"""
+
+import argparse
+import functools
+import inspect
+import json
+import os
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+INDEX_FILENAME = "index.json"
+OBJECTS_DIR = "objects"
+
+# 参数中的日期会随运行日变化，统一归一化后再做 key，保证隔天也能回放
+_DATE_PATTERN = re.compile(r"\d{4}-?\d{2}-?\d{2}")
+
+class ReplayMissError(Exception):
+    """回放时夹具包中没有对应的录制记录"""
+
+def normalize_key(kind, label, args=(), kwargs=None):
+    """生成与运行日期无关的调用 key"""
+    parts = [repr(a) for a in args]
+    parts += [f"{k}={v!r}" for k, v in sorted((kwargs or {}).items())]
+    return _DATE_PATTERN.sub("<DATE>", f"{kind}|{label}|{'|'.join(parts)}")
+
+class FixtureBundle:
+    """
+    夹具包: 目录下 index.json 记录 key -> 响应列表, objects/ 下逐条 pickle 存储
+    同一 key 的多次调用按顺序回放 (超出录制次数时重复最后一条)
+    """
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.cursors = {}
+        self.counter = 0
+        self.index = {"meta": {}, "calls": {}}
+
+        if mode == "record":
+            os.makedirs(os.path.join(path, OBJECTS_DIR), exist_ok=True)
+            self.index["meta"] = {
+                "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "python": sys.version.split()[0],
+            }
+        else:
+            with open(os.path.join(path, INDEX_FILENAME), "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def record(self, key, label, value=None, error=None, elapsed=0.0, overwrite=False):
+        with self.lock:
+            self.counter += 1
+            filename = f"{self.counter:06d}.pkl"
+            with open(os.path.join(self.path, OBJECTS_DIR, filename), "wb") as f:
+                pickle.dump({"value": value, "error": error}, f)
+            entry = {"label": label, "file": filename, "elapsed": round(elapsed, 4), "error": error is not None}
+            if overwrite:
+                self.index["calls"][key] = [entry]
+            else:
+                self.index["calls"].setdefault(key, []).append(entry)
+
+    def replay(self, key):
+        """返回 (value, error, elapsed)；未录制时抛出 ReplayMissError"""
+        with self.lock:
+            entries = self.index["calls"].get(key)
+            if not entries:
+                raise ReplayMissError(f"夹具包中无录制记录: {key[:200]}")
+            pos = self.cursors.get(key, 0)
+            self.cursors[key] = pos + 1
+            entry = entries[min(pos, len(entries) - 1)]
+        with open(os.path.join(self.path, OBJECTS_DIR, entry["file"]), "rb") as f:
+            payload = pickle.load(f)
+        return payload["value"], payload["error"], entry["elapsed"]
+
+    def has(self, key):
+        return bool(self.index["calls"].get(key))
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with self.lock:
+            self.index["meta"]["total_calls"] = sum(len(v) for v in self.index["calls"].values())
+            with open(os.path.join(self.path, INDEX_FILENAME), "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=1)
+
+class Harness:
+    """
+    安装/卸载全部拦截点
+    latency:       回放时每次调用固定附加的延迟 (秒)
+    latency_scale: 回放时按录制耗时的比例模拟延迟 (0 表示不模拟)
+    """
+    def __init__(self, mode, bundle_path, latency=0.0, latency_scale=0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.mode = mode
+        self.bundle = FixtureBundle(bundle_path, mode)
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._local = threading.local()
+        self._restore = []
+
+    # ---------------- 通用拦截逻辑 ----------------
+    def _simulate_latency(self, elapsed):
+        delay = self.latency + elapsed * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+    def call(self, kind, label, func, args=(), kwargs=None, key_args=None, key_kwargs=None,
+             encode=None, decode=None):
+        """
+        录制或回放一次上游调用
+        key_args/key_kwargs: 参与 key 的参数 (默认取全部实参)
+        encode/decode:       响应对象与可 pickle 结构之间的转换 (如 requests.Response)
+        """
+        kwargs = kwargs or {}
+        key = normalize_key(kind, label,
+                            args if key_args is None else key_args,
+                            kwargs if key_kwargs is None else key_kwargs)
+
+        if self.mode == "replay":
+            value, error, elapsed = self.bundle.replay(key)
+            self._simulate_latency(elapsed)
+            if error is not None:
+                raise error
+            return decode(value) if decode else value
+
+        # record: 只录制最外层调用 (akshare 内部发出的 requests 请求不重复录制)
+        depth = getattr(self._local, "depth", 0)
+        if depth > 0:
+            return func(*args, **kwargs)
+
+        self._local.depth = depth + 1
+        t0 = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.bundle.record(key, label, error=_picklable_error(e), elapsed=time.perf_counter() - t0)
+            raise
+        finally:
+            self._local.depth = depth
+        self.bundle.record(key, label, value=encode(result) if encode else result,
+                           elapsed=time.perf_counter() - t0)
+        return result
+
+    def _patch(self, owner, attr, replacement):
+        self._restore.append((owner, attr, getattr(owner, attr)))
+        setattr(owner, attr, replacement)
+
+    # ---------------- 各数据源拦截 ----------------
+    def _install_akshare(self):
+        try:
+            import akshare as ak
+        except ImportError:
+            print("⚠️ [Harness] 未安装 akshare，跳过拦截")
+            return
+        count = 0
+        for name, obj in list(vars(ak).items()):
+            if name.startswith("_") or not inspect.isfunction(obj):
+                continue
+            self._patch(ak, name, self._wrap_function("akshare", name, obj))
+            count += 1
+        print(f"🎞️ [Harness] 已拦截 akshare 函数 {count} 个")
+
+    def _wrap_function(self, kind, label, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(kind, label, func, args, kwargs)
+        return wrapper
+
+    def _install_yfinance(self):
+        try:
+            import yfinance as yf
+        except ImportError:
+            print("⚠️ [Harness] 未安装 yfinance，跳过拦截")
+            return
+        self._patch(yf, "download", self._wrap_function("yfinance", "download", yf.download))
+
+        original_history = yf.Ticker.history
+        harness = self
+
+        @functools.wraps(original_history)
+        def history(ticker_self, *args, **kwargs):
+            return harness.call("yfinance", "Ticker.history", original_history, (ticker_self,) + args, kwargs,
+                                key_args=(ticker_self.ticker,) + args)
+        self._patch(yf.Ticker, "history", history)
+
+    def _install_requests(self):
+        import requests
+        original_request = requests.Session.request
+        harness = self
+
+        @functools.wraps(original_request)
+        def request(session_self, method, url, *args, **kwargs):
+            # key 只取请求本身 (方法/URL/参数/请求体)，忽略 headers/timeout 等
+            key_kwargs = {k: kwargs.get(k) for k in ("params", "data", "json") if kwargs.get(k) is not None}
+            return harness.call("http", f"{method.upper()} {url}", original_request,
+                                (session_self, method, url) + args, kwargs,
+                                key_args=(), key_kwargs=key_kwargs,
+                                encode=_encode_response, decode=_decode_response)
+        self._patch(requests.Session, "request", request)
+
+    def _install_selenium(self):
+        try:
+            from selenium import webdriver
+        except ImportError:
+            print("⚠️ [Harness] 未安装 selenium，跳过拦截")
+            return
+        original_chrome = webdriver.Chrome
+        harness = self
+
+        def chrome_factory(*args, **kwargs):
+            if harness.mode == "replay":
+                return ReplayDriver(harness)
+            return RecordingDriver(original_chrome(*args, **kwargs), harness)
+        self._patch(webdriver, "Chrome", chrome_factory)
+
+    def install(self):
+        self._install_akshare()
+        self._install_yfinance()
+        self._install_requests()
+        self._install_selenium()
+        print(f"🎞️ [Harness] 模式: {self.mode} | 夹具包: {self.bundle.path}")
+        return self
+
+    def uninstall(self):
+        for owner, attr, original in reversed(self._restore):
+            setattr(owner, attr, original)
+        self._restore = []
+        self.bundle.save()
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+
+# ==============================================================================
+# Selenium 录制代理 / 回放驱动
+# ==============================================================================
+
+class _RecordedElement:
+    """录制时的元素代理: 读取 .text / get_attribute 时记录最终值"""
+    def __init__(self, element, driver, locator):
+        self._element = element
+        self._driver = driver
+        self._locator = locator
+
+    @property
+    def text(self):
+        value = self._element.text
+        self._driver._remember("element_text", self._locator, value)
+        return value
+
+    def get_attribute(self, name):
+        value = self._element.get_attribute(name)
+        self._driver._remember(f"element_attr:{name}", self._locator, value)
+        return value
+
+    def __getattr__(self, attr):
+        return getattr(self._element, attr)
+
+class RecordingDriver:
+    """
+    包装真实 Chrome driver，记录每个 URL 下的页面最终状态
+    (同一 URL 同一读取方式只保留最后一次，回放时等待条件立即满足)
+    """
+    def __init__(self, driver, harness):
+        self._driver = driver
+        self._harness = harness
+        self._url = None
+        self._perf_log = []
+
+    def _remember(self, accessor, locator, value):
+        key = normalize_key("selenium", accessor, (self._url,) + tuple(locator))
+        self._harness.bundle.record(key, accessor, value=value, overwrite=True)
+
+    def get(self, url):
+        self._url = url
+        self._perf_log = []
+        t0 = time.perf_counter()
+        try:
+            return self._driver.get(url)
+        finally:
+            key = normalize_key("selenium", "get", (url,))
+            self._harness.bundle.record(key, "get", value=None, elapsed=time.perf_counter() - t0, overwrite=True)
+
+    @property
+    def page_source(self):
+        value = self._driver.page_source
+        self._remember("page_source", (), value)
+        return value
+
+    @property
+    def title(self):
+        value = self._driver.title
+        self._remember("title", (), value)
+        return value
+
+    def find_element(self, by, value=None):
+        element = self._driver.find_element(by, value)
+        self._remember("find_element", (by, value), True)
+        return _RecordedElement(element, self, (by, value))
+
+    def find_elements(self, by, value=None):
+        elements = self._driver.find_elements(by, value)
+        self._remember("find_elements", (by, value), len(elements))
+        return [_RecordedElement(e, self, (by, value, i)) for i, e in enumerate(elements)]
+
+    def get_log(self, log_type):
+        # 只保留 selenium_network 用到的响应事件，回放时一次性返回
+        entries = self._driver.get_log(log_type)
+        if log_type == "performance":
+            self._perf_log.extend(e for e in entries if _is_response_event(e))
+            self._remember("get_log", (log_type,), list(self._perf_log))
+        return entries
+
+    def execute_cdp_cmd(self, cmd, params=None):
+        result = self._driver.execute_cdp_cmd(cmd, params or {})
+        if cmd == "Network.getResponseBody":
+            self._remember("response_body", (params.get("requestId"),), result)
+        return result
+
+    def __getattr__(self, attr):
+        return getattr(self._driver, attr)
+
+def _is_response_event(entry):
+    message = entry.get("message", "")
+    return '"Network.responseReceived"' in message or '"Network.loadingFinished"' in message
+
+class _ReplayElement:
+    def __init__(self, driver, locator):
+        self._driver = driver
+        self._locator = locator
+
+    @property
+    def text(self):
+        return self._driver._lookup("element_text", self._locator, default="")
+
+    def get_attribute(self, name):
+        return self._driver._lookup(f"element_attr:{name}", self._locator, default=None)
+
+    def is_displayed(self):
+        return True
+
+class ReplayDriver:
+    """
+    回放用的 Chrome 替身: 只实现爬虫实际用到的接口
+    页面源码/元素文本均取自录制时该 URL 的最终状态
+    """
+    def __init__(self, harness):
+        self._harness = harness
+        self._url = None
+        self.current_url = None
+        self._log_served = False
+
+    def _lookup(self, accessor, locator, default=None):
+        key = normalize_key("selenium", accessor, (self._url,) + tuple(locator))
+        if not self._harness.bundle.has(key):
+            return default
+        value, _, _ = self._harness.bundle.replay(key)
+        return value
+
+    def get(self, url):
+        self._url = url
+        self.current_url = url
+        self._log_served = False
+        key = normalize_key("selenium", "get", (url,))
+        if not self._harness.bundle.has(key):
+            raise ReplayMissError(f"夹具包中无页面: {url}")
+        _, _, elapsed = self._harness.bundle.replay(key)
+        self._harness._simulate_latency(elapsed)
+
+    @property
+    def page_source(self):
+        return self._lookup("page_source", (), default="<html><body></body></html>")
+
+    @property
+    def title(self):
+        return self._lookup("title", (), default="")
+
+    def find_element(self, by, value=None):
+        if not self._lookup("find_element", (by, value), default=False):
+            from selenium.common.exceptions import NoSuchElementException
+            raise NoSuchElementException(f"[Replay] {by}={value} not recorded for {self._url}")
+        return _ReplayElement(self, (by, value))
+
+    def find_elements(self, by, value=None):
+        count = self._lookup("find_elements", (by, value), default=0)
+        return [_ReplayElement(self, (by, value, i)) for i in range(count)]
+
+    def execute_script(self, script, *args):
+        return None
+
+    def execute_cdp_cmd(self, cmd, params=None):
+        if cmd == "Network.getResponseBody":
+            return self._lookup("response_body", ((params or {}).get("requestId"),), default={})
+        return {}
+
+    def get_log(self, log_type):
+        if log_type != "performance" or self._log_served:
+            return []
+        self._log_served = True
+        return self._lookup("get_log", (log_type,), default=[])
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def set_window_size(self, width, height):
+        pass
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+# ==============================================================================
+# requests.Response 序列化
+# ==============================================================================
+
+def _encode_response(resp):
+    return {
+        "status_code": resp.status_code,
+        "headers": dict(resp.headers),
+        "content": resp.content,
+        "url": resp.url,
+        "encoding": resp.encoding,
+        "reason": resp.reason,
+    }
+
+def _decode_response(data):
+    import requests
+    resp = requests.Response()
+    resp.status_code = data["status_code"]
+    resp.headers.update(data["headers"])
+    resp._content = data["content"]
+    resp.url = data["url"]
+    resp.encoding = data["encoding"]
+    resp.reason = data["reason"]
+    return resp
+
+def _picklable_error(e):
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+# ==============================================================================
+# 命令行入口
+# ==============================================================================
+
+def run_pipeline(mode, bundle_path, latency=0.0, latency_scale=0.0, workdir=None):
+    """在录制/回放环境下执行一次完整的 main.main，返回耗时 (秒)"""
+    bundle_path = os.path.abspath(bundle_path)
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+        os.chdir(workdir)
+
+    # 固定随机种子，使请求间的随机等待可复现
+    random.seed(0)
+
+    with Harness(mode, bundle_path, latency=latency, latency_scale=latency_scale):
+        import MarketRadar
+        import macro_store
+        import main as radar_main
+        MarketRadar.ENABLE_EMAIL = False  # 录制/回放均不发送邮件
+        macro_store.ENABLE_MACRO_CACHE = False  # 宏观数据全部走抓取路径，保证录制与回放一致
+
+        t0 = time.perf_counter()
+        radar_main.main()
+        elapsed = time.perf_counter() - t0
+
+    print(f"🎞️ [Harness] {mode} 完成, 主流程耗时 {elapsed:.2f} 秒")
+    return elapsed
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="MarketRadar 离线录制/回放工具")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("bundle", help="夹具包目录")
+    parser.add_argument("--latency", type=float, default=0.0, help="回放时每次调用附加的固定延迟 (秒)")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="回放时按录制耗时比例模拟延迟")
+    parser.add_argument("--workdir", help="报告输出目录 (默认当前目录)")
+    args = parser.parse_args()
+
+    run_pipeline(args.mode, args.bundle, args.latency, args.latency_scale, args.workdir)
@@ -0,0 +1,228 @@
+# report_delta.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Delta Reports Against the Previous Run
+# -----------------------------------------------------------------------------
+# 增量报告: 邮件发送成功后把本次报告复制为基准 (MarketRadar_Report.prev.json)，即收件人手中的最后一份报告，
+# 之后每次写出新报告时生成基准与新报告的差异 MarketRadar_Report.delta.json:
+#   - 每个序列 (报告第二层的列表，如 market_klines/港股创新药、技术分析/指数+个股日均线、china/CPI)
+#     按记录做序列比对，只保存插入/删除/替换的记录 (新K线、变化的均线/指标行、新发布的宏观数据)
+#   - 新增/删除的序列与分区整体记录，键顺序变化时记录新顺序
+#   - summary 汇总新增/删除/变化的序列与本次失败的数据源
+#   - base/target 记录前后两份文件的 sha256，apply 时校验基准文件，
+#     应用后用 main.save_compact_json 写出的文件与新报告逐字节一致
+# 邮件附件改为 增量 + 状态日志 (还没有发送过报告时仍附完整报告)。
+# 不发邮件的写出 (--refresh-latest、守护进程未开 --email、发送失败) 不更新基准，
+# 下一封邮件的增量仍相对于收件人已有的报告。
+#
+# 环境变量: REPORT_DELTA=0 关闭增量报告
+#
+# 用法:
+#   python report_delta.py diff MarketRadar_Report.prev.json MarketRadar_Report.json -o delta.json
+#   python report_delta.py apply yesterday.json MarketRadar_Report.delta.json -o today.json
+# -----------------------------------------------------------------------------
+
+import argparse
+import copy
+import difflib
+import hashlib
+import json
+import os
+import shutil
+
+ENABLE_REPORT_DELTA = os.environ.get("REPORT_DELTA", "1") != "0"
+PREVIOUS_FILENAME = "MarketRadar_Report.prev.json"
+DELTA_FILENAME = "MarketRadar_Report.delta.json"
+DELTA_FORMAT = "marketradar-delta/1"
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _dump(value):
+    # 不排序键: 记录内的键顺序也要还原
+    return json.dumps(value, ensure_ascii=False)
+
+# ==============================================================================
+# 差异
+# ==============================================================================
+
+def diff_list(old, new):
+    """
+    记录级序列比对，返回 ([[起, 止, 新记录列表], ...], 统计)
+    索引相对于旧列表，应用时从后往前替换 old[起:止] = 新记录列表
+    """
+    matcher = difflib.SequenceMatcher(None, [_dump(x) for x in old], [_dump(x) for x in new], autojunk=False)
+    edits = []
+    stats = {"inserted": 0, "deleted": 0, "replaced": 0}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        edits.append([i1, i2, new[j1:j2]])
+        if tag == "insert":
+            stats["inserted"] += j2 - j1
+        elif tag == "delete":
+            stats["deleted"] += i2 - i1
+        else:
+            common = min(i2 - i1, j2 - j1)
+            stats["replaced"] += common
+            stats["inserted"] += (j2 - j1) - common
+            stats["deleted"] += (i2 - i1) - common
+    return edits, stats
+
+def _diff_value(old, new):
+    """单个值的变化: None 表示相同; 列表给出记录级编辑，其余整体替换"""
+    if _dump(old) == _dump(new):
+        return None, None
+    if isinstance(old, list) and isinstance(new, list):
+        edits, stats = diff_list(old, new)
+        return {"edits": edits}, stats
+    return {"set": new}, None
+
+def diff_reports(old, new, failed=None):
+    """
+    生成 old -> new 的增量 (两层: 分区 -> 序列)
+    failed: 本次失败的数据源名称 (写入 summary)
+    """
+    ops = []
+    summary = {"added_series": [], "removed_series": [], "changed_series": {}, "failed": sorted(failed or [])}
+
+    for key in old:
+        if key not in new:
+            ops.append({"path": [key], "remove": True})
+            summary["removed_series"].append(key)
+
+    for key, value in new.items():
+        if key not in old:
+            ops.append({"path": [key], "set": value})
+            summary["added_series"].append(key)
+            continue
+        old_value = old[key]
+        if not (isinstance(old_value, dict) and isinstance(value, dict)):
+            change, stats = _diff_value(old_value, value)
+            if change:
+                ops.append(dict(change, path=[key]))
+                if stats:
+                    summary["changed_series"][key] = stats
+            continue
+
+        for sub_key in old_value:
+            if sub_key not in value:
+                ops.append({"path": [key, sub_key], "remove": True})
+                summary["removed_series"].append(f"{key}/{sub_key}")
+        for sub_key, sub_value in value.items():
+            if sub_key not in old_value:
+                ops.append({"path": [key, sub_key], "set": sub_value})
+                summary["added_series"].append(f"{key}/{sub_key}")
+                continue
+            change, stats = _diff_value(old_value[sub_key], sub_value)
+            if change:
+                ops.append(dict(change, path=[key, sub_key]))
+                if stats:
+                    summary["changed_series"][f"{key}/{sub_key}"] = stats
+        if list(value) != list(old_value):
+            ops.append({"path": [key], "order": list(value)})
+
+    delta = {"format": DELTA_FORMAT, "summary": summary, "ops": ops}
+    if list(new) != list(old):
+        delta["order"] = list(new)
+    return delta
+
+# ==============================================================================
+# 应用
+# ==============================================================================
+
+def _reorder(mapping, order):
+    return {key: mapping[key] for key in order}
+
+def apply_delta(old, delta):
+    """把增量应用到旧报告 (不修改 old)，返回新报告"""
+    if delta.get("format") != DELTA_FORMAT:
+        raise ValueError(f"不支持的增量格式: {delta.get('format')}")
+    report = copy.deepcopy(old)
+    for op in delta["ops"]:
+        *parents, last = op["path"]
+        container = report
+        for key in parents:
+            container = container[key]
+        if op.get("remove"):
+            del container[last]
+        elif "set" in op:
+            container[last] = copy.deepcopy(op["set"])
+        elif "edits" in op:
+            items = container[last]
+            for start, end, new_items in reversed(op["edits"]):
+                items[start:end] = copy.deepcopy(new_items)
+        elif "order" in op:
+            container[last] = _reorder(container[last], op["order"])
+    if "order" in delta:
+        report = _reorder(report, delta["order"])
+    return report
+
+# ==============================================================================
+# 文件
+# ==============================================================================
+
+def previous_report(previous_path=PREVIOUS_FILENAME):
+    """最后一次邮件发出的报告 (增量基准)，还没有发送过时返回 None"""
+    return previous_path if os.path.exists(previous_path) else None
+
+def mark_sent(report_path, previous_path=PREVIOUS_FILENAME):
+    """邮件发送成功后把本次报告记为下一次增量的基准"""
+    tmp_path = previous_path + ".tmp"
+    shutil.copyfile(report_path, tmp_path)
+    os.replace(tmp_path, previous_path)
+
+def write_delta(previous_path, report_path, delta_path=DELTA_FILENAME, failed=None):
+    """生成并写出增量，返回 (增量, 错误信息)"""
+    try:
+        with open(previous_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(report_path, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        delta = diff_reports(old, new, failed)
+        delta["base"] = {"sha256": file_sha256(previous_path), "generated_at": old.get("meta", {}).get("generated_at")}
+        delta["target"] = {"sha256": file_sha256(report_path), "generated_at": new.get("meta", {}).get("generated_at")}
+        with open(delta_path, "w", encoding="utf-8") as f:
+            json.dump(delta, f, ensure_ascii=False, separators=(",", ":"))
+    except Exception as e:
+        return None, str(e)
+    full_size, delta_size = os.path.getsize(report_path), os.path.getsize(delta_path)
+    print(f"🧾 增量报告已写入: {delta_path} ({delta_size / 1024:.1f} KB, 完整报告 {full_size / 1024:.1f} KB)")
+    return delta, None
+
+def apply_file(base_path, delta_path, output_path):
+    """把增量应用到基准文件并写出，校验前后 sha256，返回是否与新报告逐字节一致"""
+    import main
+
+    with open(delta_path, "r", encoding="utf-8") as f:
+        delta = json.load(f)
+    base_sha = delta.get("base", {}).get("sha256")
+    if base_sha and file_sha256(base_path) != base_sha:
+        raise ValueError(f"基准文件与增量不匹配: {base_path} (期望 sha256 {base_sha[:12]}...)")
+    with open(base_path, "r", encoding="utf-8") as f:
+        report = apply_delta(json.load(f), delta)
+    if not main.save_compact_json(report, output_path):
+        raise IOError(f"写出失败: {output_path}")
+    target_sha = delta.get("target", {}).get("sha256")
+    return target_sha is None or file_sha256(output_path) == target_sha
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketRadar 增量报告")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    diff_parser = subparsers.add_parser("diff", help="生成两份报告的增量")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument("-o", "--output", default=DELTA_FILENAME)
+    apply_parser = subparsers.add_parser("apply", help="把增量应用到旧报告")
+    apply_parser.add_argument("base")
+    apply_parser.add_argument("delta")
+    apply_parser.add_argument("-o", "--output", default="MarketRadar_Report.rebuilt.json")
+    args = parser.parse_args()
+
+    if args.command == "diff":
+        _, err = write_delta(args.old, args.new, args.output)
+        if err:
+            raise SystemExit(f"❌ 增量生成失败: {err}")
+    else:
+        exact = apply_file(args.base, args.delta, args.output)
+        print(f"{'✅' if exact else '⚠️'} 已写出 {args.output}" + ("" if exact else " (与增量记录的新报告 sha256 不一致)"))
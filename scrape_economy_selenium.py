@@ -4,19 +4,44 @@
 # 核心逻辑已移至 selenium_core.py
 # -----------------------------------------------------------------------------
 
+import argparse
 import selenium_core
 import json
 
-def get_macro_data():
+def get_macro_data(targets=None):
+    """
+    targets: 只抓取指定的宏观目标 (MacroDataScraper.targets 的键)，忽略宏观数据仓库强制重抓；
+    None 时抓取全部目标
+    """
     scraper = selenium_core.MacroDataScraper()
-    return scraper.get_data_dict()
+    if targets is None:
+        return scraper.get_data_dict()
+    unknown = [name for name in targets if name not in scraper.targets]
+    if unknown:
+        raise ValueError(f"未知宏观目标: {', '.join(unknown)} (可选: {', '.join(scraper.targets)})")
+    scraper.targets = {name: url for name, url in scraper.targets.items() if name in targets}
+    return scraper.get_data_dict(force=True)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="宏观数据抓取 (Selenium)")
+    parser.add_argument("--measure-blocking", nargs="*", metavar="TARGET",
+                        help="测量模式: 对比资源拦截前后各页面的传输字节与加载耗时 (不指定目标则测量全部)")
+    parser.add_argument("--measure-output", default="blocking_report.json", help="测量结果输出文件")
+    parser.add_argument("--force-refresh", action="store_true", help="忽略宏观数据仓库，全部重新抓取")
+    args = parser.parse_args()
+
     scraper = selenium_core.MacroDataScraper()
-    data, _ = scraper.get_data_dict()
-    try:
-        with open("OnlineReport.json", 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        print(f"💾 独立运行数据已写入: OnlineReport.json")
-    except Exception as e:
-        print(f"❌ 写入文件失败: {e}")
\ No newline at end of file
+
+    if args.measure_blocking is not None:
+        report = scraper.measure_blocking(args.measure_blocking or None)
+        with open(args.measure_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"💾 测量结果已写入: {args.measure_output}")
+    else:
+        data, _ = scraper.get_data_dict(force=args.force_refresh)
+        try:
+            with open("OnlineReport.json", 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            print(f"💾 独立运行数据已写入: OnlineReport.json")
+        except Exception as e:
+            print(f"❌ 写入文件失败: {e}")
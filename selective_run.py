@@ -0,0 +1,194 @@
+# selective_run.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Selective Runs that Patch the Existing Report
+# -----------------------------------------------------------------------------
+# 选择性运行: 只执行选中的节点，把结果合并进上一次运行保存的各数据源原始结果
+# (main.STATE_FILENAME)，再由 main.assemble_report 重新组装 MarketRadar_Report.json 与
+# market_data_status.txt —— 未选中的部分输入不变，输出保持原样。
+#
+# 选择器 (--only 可重复):
+#   fx / macro (别名 selenium) / klines / vni / intraday / banks   整个数据源
+#   klines:港股创新药            K线任务组 (或标的名，如 klines:腾讯控股)
+#   macro:中国_CPI               宏观目标 (MacroDataScraper.targets 的键，强制重抓)
+#   intraday:恒生科技指数_60m    分时序列 (intraday_core.INTRADAY_TARGETS 的键)
+#   多个名称可用逗号分隔: --only klines:港股创新药,科创50ETF
+# --skip 只接受整个数据源，如 --skip selenium (其余数据源全部运行)
+#
+# 合并规则: 整个数据源重新运行时整体替换 (抓取抛出异常时保留原结果)；
+# 子节点有新结果的替换原结果，抓取失败的保留原数据，状态日志更新为本次结果。
+#
+# 用法:
+#   python main.py --only klines:港股创新药
+#   python main.py --only macro:中国_CPI --only fx --no-email
+#   python main.py --skip selenium
+# -----------------------------------------------------------------------------
+
+import main
+import MarketRadar
+from intraday_core import INTRADAY_TARGETS
+from kline_table import KlineTable
+
+SOURCE_ALIASES = {"selenium": "macro"}
+# 支持子节点选择的数据源
+SUB_SELECTABLE = ("klines", "macro", "intraday")
+
+def _source_key(name):
+    key = SOURCE_ALIASES.get(name, name)
+    if key not in main.SOURCE_STEPS:
+        raise ValueError(f"未知数据源: {name} (可选: {', '.join(list(main.SOURCE_STEPS) + list(SOURCE_ALIASES))})")
+    return key
+
+def parse_selectors(only=None, skip=None):
+    """
+    解析 --only / --skip，返回 {数据源: None (整个数据源) 或 子节点名称集合}
+    """
+    selection = {}
+    for selector in only or []:
+        source, _, names = selector.partition(":")
+        key = _source_key(source.strip())
+        if not names:
+            selection[key] = None
+            continue
+        if key not in SUB_SELECTABLE:
+            raise ValueError(f"数据源 {key} 不支持子节点选择: {selector}")
+        if key in selection and selection[key] is None:
+            continue
+        selection.setdefault(key, set()).update(n.strip() for n in names.split(",") if n.strip())
+
+    skipped = set()
+    for selector in skip or []:
+        if ":" in selector:
+            raise ValueError(f"--skip 只接受整个数据源: {selector}")
+        skipped.add(_source_key(selector.strip()))
+
+    if not only:
+        selection = {key: None for key in main.SOURCE_STEPS}
+    for key in skipped:
+        selection.pop(key, None)
+    if not selection:
+        raise ValueError("选择结果为空，没有需要运行的节点")
+
+    _validate_names(selection)
+    return selection
+
+def _validate_names(selection):
+    kline_names = {group_name for group_name, _, _ in MarketRadar.KLINE_GROUPS}
+    kline_names.update(name for _, targets, _ in MarketRadar.KLINE_GROUPS for name in targets)
+    known = {"klines": kline_names, "intraday": set(INTRADAY_TARGETS)}
+    for key, names in selection.items():
+        if names is None or key not in known:
+            continue  # 宏观目标名在运行时由 scrape_economy_selenium 校验 (避免为校验导入 selenium)
+        unknown = names - known[key]
+        if unknown:
+            raise ValueError(f"未知{key}节点: {', '.join(sorted(unknown))}")
+
+def kline_select(names):
+    """
+    选中的任务组/标的 -> get_all_kline_data 的 select 集合
+    选中任务组时其全部标的视为选中；同名标的出现在多个任务组时 (如 中芯国际) 各组一并刷新，
+    保证按名称替换均线行与状态日志时不会混入旧结果
+    """
+    select = set(names)
+    for group_name, targets, _ in MarketRadar.KLINE_GROUPS:
+        if group_name in names:
+            select.update(targets)
+    return select
+
+# ==============================================================================
+# 合并
+# ==============================================================================
+
+def _replace_rows(old_rows, new_rows, key):
+    """新结果中出现的名称替换原有行 (保持原位置)，新名称追加在末尾"""
+    new_by_name = {}
+    for row in new_rows:
+        new_by_name.setdefault(row.get(key), []).append(row)
+    merged, placed = [], set()
+    for row in old_rows:
+        name = row.get(key)
+        if name not in new_by_name:
+            merged.append(row)
+        elif name not in placed:
+            merged.extend(new_by_name[name])
+            placed.add(name)
+    for name, rows in new_by_name.items():
+        if name not in placed:
+            merged.extend(rows)
+    return merged
+
+def merge_klines(old, new):
+    """K线子节点结果合并进原有 (data_collection, status_logs)"""
+    old_collection, old_logs = old
+    new_collection, new_logs = new
+    data = dict(old_collection.get("data", {}))
+    for group_name, klines in new_collection.get("data", {}).items():
+        klines = KlineTable.coerce(klines)
+        old_klines = KlineTable.coerce(data.get(group_name)).drop_symbols(klines.symbols())
+        # 与 fetch_group_data 一致: 日期降序、名称升序
+        data[group_name] = KlineTable.concat([old_klines, klines]).sort_latest_first()
+
+    ma_data = {}
+    for ma_key in ("general", "commodities"):
+        ma_data[ma_key] = _replace_rows(old_collection.get("ma_data", {}).get(ma_key, []),
+                                        new_collection.get("ma_data", {}).get(ma_key, []), "名称")
+    collection = dict(old_collection, data=data, ma_data=ma_data, meta=new_collection.get("meta", old_collection.get("meta")))
+    return collection, _replace_rows(old_logs, new_logs, "name")
+
+def merge_macro(old, new):
+    """宏观子节点: 新抓取到的指标覆盖原指标，失败的保留原数据"""
+    old_data, old_logs = old
+    new_data, new_logs = new
+    return main.deep_merge(old_data, new_data), _replace_rows(old_logs, new_logs, "name")
+
+def merge_intraday(old, new):
+    """分时子节点: 有新记录的序列替换原序列，失败 (空列表) 的保留原数据"""
+    old_series, old_logs = old
+    new_series, new_logs = new
+    series = dict(old_series)
+    series.update({name: records for name, records in new_series.items() if records})
+    return series, _replace_rows(old_logs, new_logs, "name")
+
+MERGERS = {"klines": merge_klines, "macro": merge_macro, "intraday": merge_intraday}
+
+def _failed(result):
+    return result is None or isinstance(result, Exception)
+
+# ==============================================================================
+# 运行
+# ==============================================================================
+
+def run_selected(selection, send_email=False):
+    """按选择结果运行并合并进上一次的原始结果，写出报告与状态日志"""
+    state = main.load_state()
+    if state is None:
+        print(f"❌ 未找到 {main.STATE_FILENAME}，需先完整运行一次 (python main.py)")
+        return False
+
+    for key, names in selection.items():
+        if names is None:
+            result = main.fetch_source(key)
+            if _failed(result) and not _failed(state.get(key)):
+                print(f"⚠️ {key} 运行失败，保留原结果: {result}")
+                continue
+            state[key] = result
+            continue
+
+        if key == "klines":
+            result = main.fetch_source(key, select=kline_select(names))
+        elif key == "macro":
+            result = main.fetch_source(key, targets=sorted(names))
+        else:
+            result = main.fetch_source(key, targets={name: INTRADAY_TARGETS[name] for name in sorted(names)})
+
+        if _failed(result):
+            print(f"⚠️ {key}:{','.join(sorted(names))} 运行失败，保留原结果: {result}")
+            continue
+        if _failed(state.get(key)):
+            print(f"⚠️ 原结果中 {key} 不可用，使用本次部分结果")
+            state[key] = result
+        else:
+            state[key] = MERGERS[key](state[key], result)
+
+    main.save_state(state)
+    final_data, cleaned_logs, signal_summary = main.assemble_report(state)
+    return main.publish_report(final_data, cleaned_logs, signal_summary, send_email=send_email)
@@ -3,13 +3,53 @@
 # DeepSeek Finance Project - Selenium Scraper Core Logic
 # -----------------------------------------------------------------------------
 
+import json
+import os
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium.webdriver.chrome.options import Options
+import adaptive_concurrency
+import browser_pool
+import job_history
+import macro_store
 import selenium_scrapers_investing
 import selenium_scrapers_misc
+import selenium_network
+import selenium_utils
+
+# URL 覆盖配置文件 (JSON: {target_name: url})，用于指向本地夹具服务器或镜像站
+URL_OVERRIDES_ENV = "MACRO_URL_OVERRIDES"
+
+def load_url_overrides(path=None):
+    """读取 URL 覆盖配置，未配置或读取失败时返回空字典"""
+    path = path or os.environ.get(URL_OVERRIDES_ENV)
+    if not path:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        print(f"🔀 [Scraper] 已加载 URL 覆盖配置: {path} ({len(overrides)} 项)")
+        return overrides
+    except Exception as e:
+        print(f"⚠️ [Scraper] URL 覆盖配置读取失败 ({path}): {e}")
+        return {}
+
+# 无历史记录时的静态耗时估计 (秒)，用于最长任务优先排序；未列出的 Eastmoney 页面按 15 秒估计
+STATIC_DURATION_HINTS = {
+    "USA_ISM_New_Orders": 60,
+    "USA_Initial_Jobless": 45,
+    "恒生医疗保健指数": 40,
+    "BDI_波罗的海指数": 40,
+    "CBOE_SKEW": 40,
+    "Fed_Rate_Monitor": 40,
+    "CBOE_PutCallRatio": 40,
+    "Insider_BuySell_Ratio_USA": 35,
+    "CNN_FearGreed": 30,
+    "CCFI_运价指数": 25,
+}
 
 class MacroDataScraper:
-    def __init__(self):
+    def __init__(self, url_overrides=None, use_cache=None, tab_pool=None):
         # 目标数据源配置
         self.targets = {
             "中国_CPI": "https://data.eastmoney.com/cjsj/cpi.html",
@@ -35,6 +75,12 @@ class MacroDataScraper:
             "USA_ISM_New_Orders": "https://www.investing.com/economic-calendar/ism-manufacturing-new-orders-index-1483"
         }
 
+        # [新增] URL 覆盖: 参数优先，其次环境变量 MACRO_URL_OVERRIDES 指向的 JSON 文件
+        overrides = url_overrides if url_overrides is not None else load_url_overrides()
+        for name, url in overrides.items():
+            if name in self.targets:
+                self.targets[name] = url
+
         self.key_mapping = {
             "中国_CPI": ("china", "CPI"),
             "中国_PMI": ("china", "PMI_制造业"),
@@ -61,6 +107,18 @@ class MacroDataScraper:
         
         self.results = {}
         self.status_logs = []
+
+        # [新增] 宏观数据仓库: 未到发布窗口的序列直接使用缓存 (URL 覆盖时为基准/测试场景，不使用缓存)
+        if use_cache is None:
+            use_cache = macro_store.ENABLE_MACRO_CACHE and not overrides
+        self.store = macro_store.MacroStore() if use_cache else None
+
+        # [新增] 多标签页模式: 少量浏览器进程 x 每进程多个标签页，提高并发而不成倍增加内存
+        self.use_tab_pool = browser_pool.ENABLE_TAB_POOL if tab_pool is None else tab_pool
+        self.shared_pool = None
+
+        # [新增] 任务耗时历史: 最长任务优先，不稳定任务穿插调度
+        self.history = job_history.JobHistory("macro")
         
         self.chrome_options = Options()
         self.chrome_options.add_argument("--headless")
@@ -115,26 +173,112 @@ class MacroDataScraper:
         days_to_keep = 30 if "南向资金" in name else 180
         return selenium_scrapers_misc.fetch_generic_source(name, url, self.chrome_options, days_to_keep)
 
-    def run_concurrent(self):
-        print("🚀 [Scraper] 正在并发抓取宏观数据 (Workers=2)...")
+    def run_concurrent(self, force=False):
+        """
+        并发抓取宏观数据
+        启用仓库时只抓取到了发布窗口/缓存过期的序列，其余直接取仓库最新版本；force=True 时全部重抓
+        """
         self.status_logs = []
         
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_to_name = {
-                executor.submit(self.fetch_single_source, name, url): name 
-                for name, url in self.targets.items()
-            }
-            for future in as_completed(future_to_name):
-                name, data, error_msg = future.result()
-                if not error_msg:
-                    self.results[name] = data
+        pending = {}
+        for name, url in self.targets.items():
+            if self.store and not force:
+                due, reason = self.store.is_due(name)
+                if not due:
+                    self.results[name] = self.store.latest(name)
                     self.status_logs.append({'name': name, 'status': True, 'error': None})
-                else:
-                    self.results[name] = []
-                    self.status_logs.append({'name': name, 'status': False, 'error': error_msg})
+                    print(f"📦 [{name}] 使用缓存: {reason}")
+                    continue
+            pending[name] = url
+        
+        # 常驻模式下由调用方提供长期存活的标签页池 (shared_pool)，本次运行结束后不关闭
+        pool = self.shared_pool
+        owns_pool = False
+        if pool is None and self.use_tab_pool and pending:
+            pool = browser_pool.TabPool(self.chrome_options, capture_network=selenium_network.ENABLE_XHR_CAPTURE)
+            owns_pool = True
+        if pool:
+            selenium_utils.DRIVER_PROVIDER = pool.acquire
+            print(f"🗂️ [Scraper] 多标签页模式: {pool.size} 个浏览器 x {pool.tabs_per_browser} 个标签页")
+        
+        # [新增] AIMD 自适应并发: 从 2 个 worker 起步，延迟平稳时逐步增加，限流/超时/内存压力时减半
+        limiter = adaptive_concurrency.macro_limiter(initial=pool.capacity if pool else 2, hard_cap=pool.capacity if pool else None)
+        workers = limiter.max_workers
+        
+        def limited_fetch(name, url):
+            with limiter.slot():
+                t0 = time.perf_counter()
+                result = self.fetch_single_source(name, url)
+            elapsed = time.perf_counter() - t0
+            error_msg = result[2]
+            limiter.record(elapsed, ok=not error_msg, throttled=adaptive_concurrency.is_throttle_error(error_msg))
+            self.history.record(name, elapsed, ok=not error_msg)
+            return result
+        
+        schedule = self.history.order(list(pending), STATIC_DURATION_HINTS, default=15)
+        
+        print(f"🚀 [Scraper] 正在并发抓取宏观数据 (Workers={limiter.limit}~{workers}, {len(pending)}/{len(self.targets)} 个目标)...")
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                future_to_name = {
+                    executor.submit(limited_fetch, name, pending[name]): name 
+                    for name in schedule
+                }
+                for future in as_completed(future_to_name):
+                    name, data, error_msg = future.result()
+                    if not error_msg:
+                        self.results[name] = data
+                        self.status_logs.append({'name': name, 'status': True, 'error': None})
+                        if self.store and data:
+                            self.store.update(name, data)
+                    else:
+                        self.results[name] = []
+                        self.status_logs.append({'name': name, 'status': False, 'error': error_msg})
+        finally:
+            if pool:
+                selenium_utils.DRIVER_PROVIDER = None
+                if owns_pool:
+                    pool.close()
+        
+        try:
+            self.history.save()
+        except Exception as e:
+            print(f"⚠️ [JobHistory] 历史写入失败: {e}")
+        
+        if self.store:
+            try:
+                self.store.save()
+            except Exception as e:
+                print(f"⚠️ [MacroStore] 仓库写入失败: {e}")
                     
         return self.results, self.status_logs
 
+    def measure_blocking(self, names=None):
+        """
+        资源拦截测量模式: 对每个目标分别在 不拦截/拦截 两种配置下加载一次页面，
+        返回传输字节数与加载耗时对比 (串行执行，避免并发干扰计时)
+        """
+        names = names or list(self.targets.keys())
+        report = []
+        for name in names:
+            url = self.targets.get(name)
+            if not url:
+                print(f"⚠️ [Measure] 未知目标: {name}")
+                continue
+            baseline = selenium_utils.measure_page_load(name, url, self.chrome_options, block=False)
+            blocked = selenium_utils.measure_page_load(name, url, self.chrome_options, block=True)
+            report.append({"name": name, "url": url, "unblocked": baseline, "blocked": blocked})
+
+            if "error" in baseline or "error" in blocked:
+                print(f"❌ [Measure] {name}: {baseline.get('error') or blocked.get('error')}")
+                continue
+            saved = 1 - blocked["bytes"] / baseline["bytes"] if baseline["bytes"] else 0
+            print(f"📏 [Measure] {name}: {baseline['bytes']/1024:.0f} KB / {baseline['wall_s']:.2f}s"
+                  f" -> {blocked['bytes']/1024:.0f} KB / {blocked['wall_s']:.2f}s"
+                  f" (节省 {saved:.0%}, 拦截 {blocked['blocked_requests']} 个请求)")
+        return report
+
     def organize_data(self):
         nested_data = {
             "china": {},
@@ -155,6 +299,6 @@ class MacroDataScraper:
         
         return nested_data
 
-    def get_data_dict(self):
-        self.run_concurrent()
+    def get_data_dict(self, force=False):
+        self.run_concurrent(force=force)
         return self.organize_data(), self.status_logs
\ No newline at end of file
@@ -0,0 +1,115 @@
+# selenium_network.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - XHR JSON Capture (CDP Network Log)
+# -----------------------------------------------------------------------------
+# 通过 Chrome performance 日志监听网络响应，按 URL 正则匹配页面自身发出的 XHR/Fetch 请求，
+# 用 Network.getResponseBody 直接取回 JSON，无需等待页面渲染、也不用正则解析正文。
+# 目标请求未出现 (改版/被拦截/回放替身无日志) 时由调用方退回 DOM 解析。
+# 需以 selenium_utils.create_driver(..., capture_network=True) 创建 driver；MACRO_XHR_CAPTURE=0 可整体关闭。
+# -----------------------------------------------------------------------------
+
+import base64
+import json
+import os
+import re
+import time
+
+import pandas as pd
+
+ENABLE_XHR_CAPTURE = os.environ.get("MACRO_XHR_CAPTURE", "1") != "0"
+POLL_INTERVAL = 0.2
+
+# 页面数据接口 (URL 正则)
+CNN_FEAR_GREED_API = r"production\.dataviz\.cnn\.io/index/fearandgreed/graphdata"
+CBOE_DAILY_API = r"cdn\.cboe\.com/data/us/options/market_statistics/daily/.*daily_options"
+
+def _read_body(driver, request_id):
+    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+    text = body.get("body", "")
+    if body.get("base64Encoded"):
+        text = base64.b64decode(text).decode("utf-8", errors="replace")
+    return json.loads(text)
+
+def wait_for_json(driver, url_pattern, timeout=20, fallback_condition=None, poll=POLL_INTERVAL):
+    """
+    等待 URL 匹配 url_pattern 的响应加载完成并解析其 JSON 正文
+    fallback_condition: DOM 就绪条件 (如 selenium_waits.text_matches)，先于接口满足时立即放弃等待
+    返回 (payload, url)，未捕获到返回 (None, None)
+    """
+    regex = re.compile(url_pattern)
+    pending = {}  # requestId -> url
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            return None, None
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                if response.get("status") == 200 and regex.search(response.get("url", "")):
+                    pending[params.get("requestId")] = response["url"]
+            elif method == "Network.loadingFinished" and params.get("requestId") in pending:
+                url = pending.pop(params["requestId"])
+                try:
+                    return _read_body(driver, params["requestId"]), url
+                except Exception as e:
+                    print(f"⚠️ [XHR] 读取响应失败 ({url[:80]}): {str(e)[:80]}")
+
+        if fallback_condition and not pending:
+            try:
+                if fallback_condition(driver):
+                    return None, None
+            except Exception:
+                pass
+        time.sleep(poll)
+    return None, None
+
+def decode_cnn_fear_greed(payload, url=None):
+    """CNN graphdata 接口: fear_and_greed.score / previous_close / previous_1_week / previous_1_month"""
+    fg = (payload or {}).get("fear_and_greed") or {}
+    if fg.get("score") is None:
+        return None
+
+    def to_int(v):
+        return int(round(float(v))) if v is not None else 0
+
+    return {
+        "日期": pd.Timestamp.now().strftime('%Y-%m-%d'),
+        "最新值": to_int(fg["score"]),
+        "前值": to_int(fg.get("previous_close")),
+        "一周前": to_int(fg.get("previous_1_week")),
+        "一月前": to_int(fg.get("previous_1_month")),
+        "description": "CNN Fear & Greed Index"
+    }
+
+def decode_cboe_ratios(payload, target_keys, url=None):
+    """CBOE daily_options 接口: ratios = [{name, value}]，日期取自接口 URL (YYYY-MM-DD_daily_options)"""
+    ratios = {}
+    for item in (payload or {}).get("ratios", []):
+        key = re.sub(r"\s+", " ", str(item.get("name", ""))).strip().upper()
+        try:
+            ratios[key] = float(item.get("value"))
+        except (TypeError, ValueError):
+            ratios[key] = None
+
+    if not any(ratios.get(k) is not None for k in target_keys):
+        return None
+
+    current_date = pd.Timestamp.now().strftime('%Y-%m-%d')
+    date_match = re.search(r"(\d{4}-\d{2}-\d{2})_daily_options", url or "")
+    if date_match:
+        current_date = date_match.group(1)
+
+    data_dict = {"日期": current_date}
+    for key in target_keys:
+        data_dict[key] = ratios.get(key)
+    return data_dict
@@ -3,15 +3,12 @@
 # DeepSeek Finance Project - Investing.com Scrapers
 # -----------------------------------------------------------------------------
 
-import time
 import pandas as pd
 import re
-from io import StringIO
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import selenium_utils
+import table_locator
+import selenium_waits
 
 def fetch_investing_source(name, url, chrome_options, days_to_keep=180):
     """
@@ -25,50 +22,18 @@ def fetch_investing_source(name, url, chrome_options, days_to_keep=180):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - Investing专线)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-
-            driver.set_page_load_timeout(60)
-            driver.set_script_timeout(60)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=60, script_timeout=60)
             driver.get(url)
             
-            # [关键] 滚动页面以触发懒加载 (特别是对于 ICE/BDI/SKEW)
+            # [关键] 滚动页面以触发懒加载 (特别是对于 ICE/BDI/SKEW)，随后等待历史数据表格出现数据行
             try:
                 driver.execute_script("window.scrollBy(0, 500);")
-                time.sleep(2)
-                WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
             except:
                 pass
+            selenium_waits.wait_ready(driver, name, selenium_waits.table_has_rows([['日期', '收盘'], ['Date', 'Price']], min_rows=5), timeout=20)
             
-            html = driver.page_source
-            dfs = pd.read_html(StringIO(html))
-            
-            if not dfs:
-                raise ValueError("页面解析为空，未找到表格数据")
-
-            target_df = None
-            
-            # 增强表头匹配逻辑
-            for df in dfs:
-                cols = [str(c).replace(" ", "").replace("\n", "").strip() for c in df.columns]
-                # Check for Chinese Headers
-                if all(k in cols for k in ['日期', '收盘']):
-                    target_df = df
-                    break
-                # Check for English Headers
-                if all(k in cols for k in ['Date', 'Price']):
-                    target_df = df
-                    break
-            
-            if target_df is None:
-                # Fallback: check only date/close partials
-                for df in dfs:
-                    cols = [str(c).strip() for c in df.columns]
-                    if ('日期' in cols and '收盘' in cols) or ('Date' in cols and 'Price' in cols):
-                        target_df = df
-                        break
+            # 只定位并解析历史数据表格 (支持中文/英文表头)
+            target_df = table_locator.read_table_from_driver(driver, [['日期', '收盘'], ['Date', 'Price']])
 
             if target_df is None:
                     raise ValueError(f"未找到符合 Investing 格式的表格")
@@ -133,7 +98,7 @@ def fetch_investing_source(name, url, chrome_options, days_to_keep=180):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(2)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -153,27 +118,12 @@ def fetch_investing_economic_calendar(name, url, chrome_options, days_to_keep=15
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - Calendar)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(45)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=45)
             driver.get(url)
             
-            try:
-                WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
-            except:
-                pass
-            
-            html = driver.page_source
-            dfs = pd.read_html(StringIO(html))
+            selenium_waits.wait_ready(driver, name, selenium_waits.table_has_rows([['Release Date', 'Actual']], min_rows=3), timeout=20)
             
-            target_df = None
-            for df in dfs:
-                cols = [str(c).lower() for c in df.columns]
-                if any("release date" in c for c in cols) and any("actual" in c for c in cols):
-                    target_df = df
-                    break
+            target_df = table_locator.read_table_from_driver(driver, [['Release Date', 'Actual']])
             
             if target_df is None:
                 raise ValueError("未找到财经日历数据表格")
@@ -221,7 +171,7 @@ def fetch_investing_economic_calendar(name, url, chrome_options, days_to_keep=15
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(2)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -241,19 +191,11 @@ def fetch_fed_rate_monitor(name, url, chrome_options):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - FedRate)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(45)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=45)
             driver.get(url)
             
-            try:
-                WebDriverWait(driver, 20).until(
-                    EC.text_to_be_present_in_element((By.TAG_NAME, "body"), "Fed Interest Rate Decision")
-                )
-            except:
-                pass
+            # 等待利率概率表 (区间 + 三列百分比) 渲染完成
+            selenium_waits.wait_ready(driver, name, selenium_waits.text_matches(r"\d+\.\d+\s*-\s*\d+\.\d+\s+[\d\.]+%"), timeout=20)
 
             body_text = driver.find_element(By.TAG_NAME, "body").text
             normalized_text = re.sub(r'\s+', ' ', body_text).strip()
@@ -293,7 +235,7 @@ def fetch_fed_rate_monitor(name, url, chrome_options):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(2)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -3,15 +3,13 @@
 # DeepSeek Finance Project - Miscellaneous Scrapers
 # -----------------------------------------------------------------------------
 
-import time
 import pandas as pd
 import re
-from io import StringIO
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import selenium_utils
+import selenium_network
+import selenium_waits
+import table_locator
 
 def fetch_cnn_fear_greed(name, url, chrome_options):
     """
@@ -24,28 +22,28 @@ def fetch_cnn_fear_greed(name, url, chrome_options):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - CNN)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-
-            driver.set_window_size(1920, 1080)
-            driver.set_page_load_timeout(45)
+            capture = selenium_network.ENABLE_XHR_CAPTURE
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=45, window_size=(1920, 1080), capture_network=capture)
             driver.get(url)
 
             try:
                 # 滚动到底部
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(3) 
             except:
                 pass
             
-            try:
-                WebDriverWait(driver, 15).until(
-                    EC.text_to_be_present_in_element((By.TAG_NAME, "body"), "Timeline")
-                )
-            except:
-                pass 
+            dom_ready = selenium_waits.text_matches(r"Previous close\s+\d+")
+            
+            # 优先直接读取 graphdata 接口 JSON，接口未捕获到时退回 DOM 解析
+            if capture:
+                payload, _ = selenium_network.wait_for_json(driver, selenium_network.CNN_FEAR_GREED_API, timeout=15, fallback_condition=dom_ready)
+                record = selenium_network.decode_cnn_fear_greed(payload)
+                if record:
+                    print(f"✅ [{name}] 抓取成功 (XHR)! 当前值: {record['最新值']}")
+                    return name, [record], None
+            
+            # 等待历史值区块 (Previous close NN) 渲染完成
+            selenium_waits.wait_ready(driver, name, dom_ready, timeout=15)
             
             body_text = driver.find_element(By.TAG_NAME, "body").text
             normalized_text = re.sub(r'\s+', ' ', body_text).strip()
@@ -92,7 +90,7 @@ def fetch_cnn_fear_greed(name, url, chrome_options):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(3)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -135,11 +133,8 @@ def fetch_cboe_data(name, url, chrome_options):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - CBOE)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(45)
+            capture = selenium_network.ENABLE_XHR_CAPTURE
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=45, capture_network=capture)
             driver.get(url)
             
             # [Debug] 打印页面标题，判断是否被拦截
@@ -148,13 +143,19 @@ def fetch_cboe_data(name, url, chrome_options):
             except:
                 pass
 
-            try:
-                # 显式等待核心数据出现
-                WebDriverWait(driver, 20).until(
-                    EC.text_to_be_present_in_element((By.TAG_NAME, "body"), "TOTAL PUT/CALL RATIO")
-                )
-            except:
-                print(f"⚠️ [{name}] 等待关键字 'TOTAL PUT/CALL RATIO' 超时...")
+            dom_ready = selenium_waits.text_matches(r"TOTAL PUT/CALL RATIO[:\s]+\d*\.\d+")
+            
+            # 优先直接读取 daily_options 接口 JSON (ratios 列表)，接口未捕获到时退回正文解析
+            if capture:
+                payload, api_url = selenium_network.wait_for_json(driver, selenium_network.CBOE_DAILY_API, timeout=20, fallback_condition=dom_ready)
+                data_dict = selenium_network.decode_cboe_ratios(payload, target_keys, api_url)
+                if data_dict:
+                    found_count = sum(1 for k in target_keys if data_dict[k] is not None)
+                    print(f"✅ [{name}] 抓取成功 (XHR)! 获得 {found_count} 个指标, 日期: {data_dict['日期']}")
+                    return name, [data_dict], None
+
+            # 显式等待核心数据出现 (关键字后已有数值，而非仅表头)
+            selenium_waits.wait_ready(driver, name, dom_ready, timeout=20)
 
             body_text = driver.find_element(By.TAG_NAME, "body").text
             normalized_text = re.sub(r'\s+', ' ', body_text).strip()
@@ -202,7 +203,7 @@ def fetch_cboe_data(name, url, chrome_options):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(5) # 失败后增加等待时间，应对限流
+                selenium_waits.retry_backoff(attempt, base=1.5) # 退避更长，应对限流
         finally:
             if driver:
                 try:
@@ -222,30 +223,21 @@ def fetch_ccfi_data(name, url, chrome_options):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - CCFI)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(45)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=45)
             driver.get(url)
             
             # 页面交互，确保加载
             try:
                 driver.execute_script("window.scrollTo(0, 300);")
-                time.sleep(2)
-                WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
             except:
-                print(f"⚠️ [{name}] 等待表格超时，尝试继续解析...")
+                pass
+            selenium_waits.wait_ready(driver, name, selenium_waits.table_has_rows([['航线']], min_rows=3), timeout=20)
 
-            html = driver.page_source
-            dfs = pd.read_html(StringIO(html))
-            
-            if not dfs:
-                raise ValueError("未找到表格数据")
-            
+            # 只定位并解析表头 (thead 或首行) 含 '航线' 的表格
             target_df = None
+            df = table_locator.read_table_from_driver(driver, [['航线']])
             
-            for df in dfs:
+            if df is not None:
                 # 1. 检查 Headers
                 header_str = ""
                 if isinstance(df.columns, pd.MultiIndex):
@@ -255,17 +247,14 @@ def fetch_ccfi_data(name, url, chrome_options):
                 
                 if "航线" in header_str:
                     target_df = df
-                    break
-                
                 # 2. 检查第一行数据 (若 header 解析失败)
-                if not df.empty:
+                elif not df.empty:
                     first_row_str = " ".join([str(x) for x in df.iloc[0].values])
                     if "航线" in first_row_str:
                         new_header = df.iloc[0]
                         df = df[1:]
                         df.columns = new_header
                         target_df = df
-                        break
             
             if target_df is None:
                 raise ValueError("未找到包含 '航线' 的表格")
@@ -329,7 +318,7 @@ def fetch_ccfi_data(name, url, chrome_options):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(2)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -349,32 +338,12 @@ def fetch_gurufocus_insider_ratio(name, url, chrome_options):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium - GuruFocus)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(60)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=60)
             driver.get(url)
             
-            try:
-                WebDriverWait(driver, 20).until(
-                    EC.text_to_be_present_in_element((By.TAG_NAME, "body"), "Historical Data")
-                )
-            except:
-                print(f"⚠️ [{name}] 等待页面关键字 'Historical Data' 超时...")
+            selenium_waits.wait_ready(driver, name, selenium_waits.table_has_rows([['Date', 'Value', 'YOY']], min_rows=3), timeout=20)
 
-            html = driver.page_source
-            dfs = pd.read_html(StringIO(html))
-            
-            if not dfs:
-                raise ValueError("页面解析为空，未找到表格数据")
-
-            target_df = None
-            for df in dfs:
-                cols = [str(c).strip() for c in df.columns]
-                if "Date" in cols and "Value" in cols and any("YOY" in c for c in cols):
-                    target_df = df
-                    break
+            target_df = table_locator.read_table_from_driver(driver, [['Date', 'Value', 'YOY']])
             
             if target_df is None:
                 raise ValueError("未找到 'Historical Data' 表格 (需包含 Date/Value/YOY)")
@@ -408,7 +377,7 @@ def fetch_gurufocus_insider_ratio(name, url, chrome_options):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {str(e)[:100]}")
             if attempt < max_retries:
-                time.sleep(3)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
@@ -428,35 +397,21 @@ def fetch_generic_source(name, url, chrome_options, days_to_keep=180):
         print(f"🌍 [{name}] 第 {attempt}/{max_retries} 次尝试 (Selenium)...")
         driver = None
         try:
-            driver = webdriver.Chrome(options=chrome_options)
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
-            })
-            driver.set_page_load_timeout(30)
-            driver.set_script_timeout(30)
+            driver = selenium_utils.create_driver(name, chrome_options, page_load_timeout=30, script_timeout=30)
             driver.get(url)
             
-            try:
-                WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
-            except Exception:
-                pass
+            date_headers = [[k] for k in ['月份', '时间', '日期', '发布日期', '公布日期']]
+            selenium_waits.wait_ready(driver, name, selenium_waits.table_has_rows(date_headers, min_rows=3), timeout=15)
             
-            html = driver.page_source
-            dfs = pd.read_html(StringIO(html))
+            # 只解析含日期类表头的最大表格；没有时退回页面上最大的表格
+            target_df = table_locator.read_table_from_driver(driver, date_headers, largest=True)
             
-            if not dfs:
-                raise ValueError("页面解析为空，未找到表格数据")
-
-            target_df = None
-            for df in dfs:
-                df.columns = [str(c).replace(" ", "").replace("\n", "").strip() for c in df.columns]
-                possible_date_cols = ['月份', '时间', '日期', '发布日期', '公布日期']
-                if any(x in str(col) for x in df.columns for col in possible_date_cols):
-                    if target_df is None or len(df) > len(target_df):
-                        target_df = df
+            if target_df is None:
+                target_df = table_locator.read_table_from_driver(driver, None, largest=True)
             
             if target_df is None:
-                target_df = max(dfs, key=lambda x: len(x))
+                raise ValueError("页面解析为空，未找到表格数据")
+            target_df.columns = [str(c).replace(" ", "").replace("\n", "").strip() for c in target_df.columns]
 
             df = target_df
             
@@ -509,7 +464,7 @@ def fetch_generic_source(name, url, chrome_options, days_to_keep=180):
             last_error = str(e)
             print(f"❌ [{name}] 失败: {last_error[:200]}") 
             if attempt < max_retries:
-                time.sleep(2)
+                selenium_waits.retry_backoff(attempt)
         finally:
             if driver:
                 try:
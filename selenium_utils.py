@@ -3,8 +3,167 @@
 # DeepSeek Finance Project - Selenium Scraper Utilities
 # -----------------------------------------------------------------------------
 
+import copy
+import json
+import os
+import time
 import pandas as pd
 import re
+from selenium import webdriver
+
+# ==============================================================================
+# 浏览器创建 & 资源拦截
+# ==============================================================================
+
+# 资源拦截开关 (默认开启，MACRO_BLOCK_RESOURCES=0 关闭)
+ENABLE_RESOURCE_BLOCKING = os.environ.get("MACRO_BLOCK_RESOURCES", "1") != "0"
+
+# 通过 CDP Network.setBlockedURLs 拦截的 URL 模式 (支持 * 通配)
+# prefs 只禁用了 <img>，CSS 背景图、字体、视频、广告与统计脚本仍会下载
+BLOCKED_URL_PATTERNS = [
+    # 图片 / 字体 / 媒体
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3",
+    # 样式表 (依赖可见性读取 body 文本的目标在 TARGET_ALLOW_RULES 中放行)
+    "*.css",
+    # 广告 / 追踪 / 统计
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*googletagservices.com*",
+    "*amazon-adsystem.com*", "*adnxs.com*", "*pubmatic.com*", "*rubiconproject.com*",
+    "*criteo.*", "*taboola.com*", "*outbrain.com*", "*moatads.com*", "*adsafeprotected.com*",
+    "*facebook.net*", "*scorecardresearch.com*", "*quantserve.com*", "*chartbeat.*",
+    "*hotjar.com*", "*newrelic.com*", "*nr-data.net*", "*segment.io*", "*segment.com*",
+    "*optimizely.com*", "*bounceexchange.com*", "*cookielaw.org*", "*onetrust.com*",
+    "*hm.baidu.com*", "*cnzz.com*",
+]
+
+# 按目标放行的模式 (从拦截列表中移除)，"*" 表示该目标完全不拦截
+# CNN / CBOE / Fed Rate Monitor 从 body 文本解析数据，去掉样式表会让隐藏元素文本混入
+TARGET_ALLOW_RULES = {
+    "CNN_FearGreed": ["*.css"],
+    "CBOE_PutCallRatio": ["*.css"],
+    "Fed_Rate_Monitor": ["*.css"],
+}
+
+def get_blocked_patterns(name):
+    """返回目标 name 实际生效的拦截模式列表"""
+    if not ENABLE_RESOURCE_BLOCKING:
+        return []
+    allow = TARGET_ALLOW_RULES.get(name, [])
+    if "*" in allow:
+        return []
+    return [p for p in BLOCKED_URL_PATTERNS if p not in allow]
+
+def apply_resource_blocking(driver, name):
+    """通过 CDP 为当前页面会话设置 URL 拦截，失败时不影响抓取"""
+    patterns = get_blocked_patterns(name)
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"⚠️ [{name}] 资源拦截设置失败: {str(e)[:80]}")
+
+# driver 提供者: 为 None 时每次新建 Chrome 进程；browser_pool.TabPool 运行期间设置为 pool.acquire
+DRIVER_PROVIDER = None
+
+def create_driver(name, chrome_options, page_load_timeout=45, script_timeout=None, window_size=None, capture_network=False):
+    """
+    创建 Chrome driver 并完成通用初始化:
+    隐藏 navigator.webdriver、资源拦截、超时与窗口大小
+    capture_network: 开启 performance 日志与 Network 域，供 selenium_network 捕获 XHR 响应
+    """
+    if DRIVER_PROVIDER is not None:
+        # 标签页池模式: 由池分配一个标签页 (performance 日志在池启动浏览器时统一开启)
+        driver = DRIVER_PROVIDER(name, page_load_timeout)
+    else:
+        if capture_network:
+            chrome_options = copy.deepcopy(chrome_options)
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        driver = webdriver.Chrome(options=chrome_options)
+
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
+    })
+    if capture_network:
+        driver.execute_cdp_cmd("Network.enable", {})
+    apply_resource_blocking(driver, name)
+
+    if window_size:
+        driver.set_window_size(*window_size)
+    driver.set_page_load_timeout(page_load_timeout)
+    if script_timeout:
+        driver.set_script_timeout(script_timeout)
+    return driver
+
+def measure_page_load(name, url, chrome_options, block=True, timeout=60):
+    """
+    测量单个页面的传输字节数与加载耗时 (基于 Chrome performance 日志)
+    返回: {"name", "blocked", "wall_s", "dom_content_loaded_ms", "load_ms", "requests", "bytes", "blocked_requests"}
+    """
+    options = copy.deepcopy(chrome_options)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    driver = None
+    try:
+        driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(timeout)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+        if block:
+            apply_resource_blocking(driver, name)
+
+        t0 = time.perf_counter()
+        driver.get(url)
+        # eager 策略下 get 在 DOMContentLoaded 即返回，这里继续等到 load 事件结束
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if driver.execute_script("return document.readyState") == "complete":
+                break
+            time.sleep(0.2)
+        wall = time.perf_counter() - t0
+
+        timing = driver.execute_script(
+            "var n = performance.getEntriesByType('navigation')[0];"
+            "return n ? [n.domContentLoadedEventEnd, n.loadEventEnd] : [0, 0];"
+        )
+
+        total_bytes = 0
+        finished = 0
+        blocked = 0
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method = message.get("method")
+            if method == "Network.loadingFinished":
+                total_bytes += message["params"].get("encodedDataLength", 0)
+                finished += 1
+            elif method == "Network.loadingFailed" and message["params"].get("blockedReason"):
+                blocked += 1
+
+        return {
+            "name": name,
+            "blocked": block,
+            "wall_s": round(wall, 3),
+            "dom_content_loaded_ms": round(timing[0] or 0, 1),
+            "load_ms": round(timing[1] or 0, 1),
+            "requests": finished,
+            "bytes": int(total_bytes),
+            "blocked_requests": blocked,
+        }
+    except Exception as e:
+        return {"name": name, "blocked": block, "error": str(e)[:200]}
+    finally:
+        if driver:
+            try:
+                driver.quit()
+            except:
+                pass
+
+# ==============================================================================
+# 数据清洗
+# ==============================================================================
 
 def clean_date(date_str):
     """通用日期清洗"""
@@ -0,0 +1,118 @@
+# selenium_waits.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Selenium Wait Strategies
+# -----------------------------------------------------------------------------
+# 条件驱动等待: 以短间隔轮询"数据就绪"条件，条件满足立即返回，取代固定 sleep 与
+# "任意 table 出现" 这类过宽的等待。每个爬虫给出默认就绪条件，TARGET_READINESS
+# 可按目标名覆盖。
+# -----------------------------------------------------------------------------
+
+import re
+import time
+from lxml import html as lxml_html
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+POLL_INTERVAL = 0.25
+
+# 浏览器端判定: 是否存在表头包含任一关键字组、且数据行 (含 td 的 tr) 数 >= min_rows 的表格
+_TABLE_READY_JS = """
+var sets = arguments[0], minRows = arguments[1];
+var tables = document.getElementsByTagName('table');
+for (var i = 0; i < tables.length; i++) {
+    var t = tables[i];
+    var head = (t.tHead ? t.tHead.innerText : '') + (t.rows.length ? t.rows[0].innerText : '');
+    head = head.replace(/\\s+/g, '');
+    for (var s = 0; s < sets.length; s++) {
+        var ok = sets[s].every(function(k) { return head.indexOf(k.replace(/\\s+/g, '')) >= 0; });
+        if (!ok) continue;
+        var n = 0;
+        for (var r = 0; r < t.rows.length; r++) {
+            if (t.rows[r].getElementsByTagName('td').length > 0) n++;
+        }
+        if (n >= minRows) return true;
+    }
+}
+return false;
+"""
+
+def _table_ready_in_html(page_source, keyword_sets, min_rows):
+    """不支持 JS 的 driver (如回放替身) 使用的等价判定: 直接解析页面源码"""
+    try:
+        doc = lxml_html.document_fromstring(page_source)
+    except Exception:
+        return False
+    for table in doc.iter("table"):
+        rows = table.xpath(".//tr")
+        head = "".join(table.xpath("./thead//text()"))
+        if rows:
+            head += "".join(rows[0].itertext())
+        head = re.sub(r"\s+", "", head)
+        for keywords in keyword_sets:
+            if all(re.sub(r"\s+", "", k) in head for k in keywords):
+                if sum(1 for r in rows if r.xpath("./td")) >= min_rows:
+                    return True
+    return False
+
+def table_has_rows(keyword_sets, min_rows=1):
+    """
+    就绪条件: 目标表格已出现且至少有 min_rows 行数据
+    keyword_sets: 表头关键字组列表，满足任一组 (组内关键字全部出现) 即视为目标表格
+                  如 [['日期', '收盘'], ['Date', 'Price']]
+    """
+    def condition(driver):
+        try:
+            result = driver.execute_script(_TABLE_READY_JS, keyword_sets, min_rows)
+        except WebDriverException:
+            return False
+        if result is None:
+            return _table_ready_in_html(driver.page_source, keyword_sets, min_rows)
+        return bool(result)
+    return condition
+
+def text_matches(pattern, locator=(By.TAG_NAME, "body"), flags=re.IGNORECASE):
+    """就绪条件: 元素文本匹配正则 (如 'TOTAL PUT/CALL RATIO[:\\s]+[\\d.]+')"""
+    regex = re.compile(pattern, flags)
+
+    def condition(driver):
+        try:
+            return bool(regex.search(driver.find_element(*locator).text))
+        except WebDriverException:
+            return False
+    return condition
+
+def any_of(*conditions):
+    """就绪条件: 任一子条件满足"""
+    def condition(driver):
+        return any(c(driver) for c in conditions)
+    return condition
+
+# 按目标名覆盖默认就绪条件, 值为 (condition, timeout)，例如:
+#   "恒生医疗保健指数": (table_has_rows([['日期', '收盘']], min_rows=20), 30)
+TARGET_READINESS = {}
+
+def wait_until(driver, condition, timeout=20, poll=POLL_INTERVAL):
+    """轮询 condition 直到满足或超时，返回是否就绪 (超时不抛异常，由调用方决定是否继续解析)"""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll).until(condition)
+        return True
+    except TimeoutException:
+        return False
+
+def wait_ready(driver, name, default_condition, timeout=20, poll=POLL_INTERVAL):
+    """
+    按目标等待数据就绪: TARGET_READINESS 中有配置时优先使用
+    返回 (是否就绪, 等待耗时秒)
+    """
+    condition, timeout = TARGET_READINESS.get(name, (default_condition, timeout))
+    t0 = time.perf_counter()
+    ready = wait_until(driver, condition, timeout, poll)
+    elapsed = time.perf_counter() - t0
+    if not ready:
+        print(f"⚠️ [{name}] 等待数据就绪超时 ({timeout}s)，尝试继续解析...")
+    return ready, elapsed
+
+def retry_backoff(attempt, base=0.5, cap=4.0):
+    """重试前的短暂退避 (指数增长, 上限 cap 秒)，取代固定 2~5 秒等待"""
+    time.sleep(min(base * (2 ** (attempt - 1)), cap))
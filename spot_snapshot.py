@@ -0,0 +1,127 @@
+# spot_snapshot.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Shared Market-Wide Spot Snapshots
+# -----------------------------------------------------------------------------
+# 全市场实时行情表 (ETF / A股 / 港股) 每个市场只下载一次，短时间缓存并按代码建立索引，
+# 任意数量的消费者可 O(1) 读取单个标的的最新价、量比或当日 (未完成) K线:
+#   - fetch_data_core.fetch_star50_realtime_vol_ratio 读取 588000
+#   - market_core.refresh_latest_group (main.py --refresh-latest) 读取当日K线，
+#     历史没有缺口时不再逐个标的请求
+# 并发访问同一市场时只有一个线程下载，其余线程等待并共享结果。
+#
+# 环境变量: SPOT_TTL 缓存有效期 (秒, 默认 60)
+# -----------------------------------------------------------------------------
+
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+TZ_CN = ZoneInfo("Asia/Shanghai")
+SPOT_TTL = float(os.environ.get("SPOT_TTL", "60"))
+
+def _ak_spot(func_name):
+    """调用时才导入 akshare 并按名称查找接口 (保证 replay_harness 的拦截生效)"""
+    def fetch():
+        import akshare as ak
+        return getattr(ak, func_name)()
+    return fetch
+
+# 市场 -> AkShare 全市场行情接口
+SPOT_SOURCES = {
+    "etf": _ak_spot("fund_etf_spot_em"),
+    "a": _ak_spot("stock_zh_a_spot_em"),
+    "hk": _ak_spot("stock_hk_spot_em"),
+}
+
+# MarketFetcher 资产类型 -> 市场
+ASSET_MARKETS = {
+    "etf_zh": "etf",
+    "stock_zh_a": "a",
+    "stock_hk": "hk",
+}
+
+# 当日K线字段 -> 各接口可能的列名 (ETF 接口为 开盘价/最高价/最低价)
+BAR_COLUMNS = {
+    "open": ["今开", "开盘价"],
+    "close": ["最新价"],
+    "high": ["最高", "最高价"],
+    "low": ["最低", "最低价"],
+    "volume": ["成交量"],
+    "amount": ["成交额"],
+    "volume_ratio": ["量比"],
+}
+
+class SpotSnapshot:
+    """按市场缓存的全市场行情表 (以 代码 为索引)"""
+    def __init__(self, ttl=SPOT_TTL, sources=None):
+        self.ttl = ttl
+        self.sources = SPOT_SOURCES if sources is None else sources
+        self._tables = {}       # market -> (下载时间, DataFrame)
+        self._locks = {market: threading.Lock() for market in self.sources}
+
+    def table(self, market):
+        """返回 market 的行情表 (缓存未过期时直接返回)，下载失败抛出异常"""
+        cached = self._tables.get(market)
+        if cached and time.time() - cached[0] < self.ttl:
+            return cached[1]
+        with self._locks[market]:
+            cached = self._tables.get(market)
+            if cached and time.time() - cached[0] < self.ttl:
+                return cached[1]
+            t0 = time.time()
+            df = self.sources[market]()
+            df = df.assign(代码=df['代码'].astype(str)).drop_duplicates(subset='代码')
+            df.index = df['代码']
+            self._tables[market] = (time.time(), df)
+            print(f"📸 [Spot] {market} 行情表已更新 ({len(df)} 条, {time.time() - t0:.1f}s)")
+            return df
+
+    def quote(self, market, code):
+        """单个标的的整行行情 (dict)，不存在时返回 None"""
+        df = self.table(market)
+        code = str(code)
+        if code not in df.index:
+            return None
+        return df.loc[code].to_dict()
+
+    def quotes(self, market, codes):
+        """批量读取: {代码: 行情 dict}，不存在的代码不返回"""
+        df = self.table(market)
+        return {code: df.loc[code].to_dict() for code in map(str, codes) if code in df.index}
+
+    def partial_bar(self, market, code, name=None):
+        """当日 (可能未收盘) K线，字段与 MarketFetcher.normalize_df 输入一致；无成交时返回 None"""
+        row = self.quote(market, code)
+        if row is None:
+            return None
+        # ETF 接口带 数据日期，其余接口视为当日行情
+        date = pd.to_datetime(row.get("数据日期"), errors='coerce') if row.get("数据日期") else None
+        if date is None or pd.isna(date):
+            date = pd.Timestamp(datetime.now(TZ_CN).date())
+        bar = {"date": date.normalize(), "name": name or row.get("名称")}
+        for field, candidates in BAR_COLUMNS.items():
+            bar[field] = next((row[c] for c in candidates if c in row), None)
+        if any(bar[f] is None or pd.isna(bar[f]) for f in ("close", "volume")) or not bar["volume"]:
+            return None
+        return bar
+
+    def invalidate(self, market=None):
+        if market is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(market, None)
+
+_SNAPSHOT = None
+_SNAPSHOT_LOCK = threading.Lock()
+
+def get_snapshot():
+    """进程内共享的快照实例"""
+    global _SNAPSHOT
+    with _SNAPSHOT_LOCK:
+        if _SNAPSHOT is None:
+            _SNAPSHOT = SpotSnapshot()
+        return _SNAPSHOT
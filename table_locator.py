@@ -0,0 +1,120 @@
+# table_locator.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Targeted Table Extraction
+# -----------------------------------------------------------------------------
+# 按表头关键字定位目标 <table>，只把该元素交给 pd.read_html 解析，
+# 避免把整页所有表格都解析成 DataFrame 再逐个匹配。
+# 使用浏览器时直接在页面内定位并只取回该表格的 outerHTML。
+#
+# keyword_sets: 关键字组列表，满足任一组 (组内关键字全部出现) 即为目标表格
+#               如 [['日期', '收盘'], ['Date', 'Price']]，None 表示任意表格
+# scope:        "header" 只匹配表头 (thead + 首行)，"text" 匹配整张表格文本
+# -----------------------------------------------------------------------------
+
+import re
+from io import StringIO
+
+import pandas as pd
+from lxml import html as lxml_html
+
+_WS = re.compile(r"\s+")
+
+# 浏览器端定位: 返回首个匹配表格的 outerHTML (largest=true 时返回数据行最多的匹配表格)
+_LOCATE_JS = """
+var sets = arguments[0], scope = arguments[1], largest = arguments[2];
+var tables = document.getElementsByTagName('table');
+var best = null, bestRows = -1;
+for (var i = 0; i < tables.length; i++) {
+    var t = tables[i], text;
+    if (scope === 'text') {
+        text = t.innerText || t.textContent || '';
+    } else {
+        text = (t.tHead ? t.tHead.innerText : '') + (t.rows.length ? t.rows[0].innerText : '');
+    }
+    text = text.replace(/\\s+/g, '');
+    var ok = !sets || sets.some(function(ks) {
+        return ks.every(function(k) { return text.indexOf(k.replace(/\\s+/g, '')) >= 0; });
+    });
+    if (!ok) continue;
+    if (!largest) return t.outerHTML;
+    if (t.rows.length > bestRows) { best = t; bestRows = t.rows.length; }
+}
+return best ? best.outerHTML : '';
+"""
+
+def _squash(text):
+    return _WS.sub("", text or "")
+
+def _table_text(table, scope):
+    if scope == "text":
+        return _squash(table.text_content())
+    rows = table.xpath(".//tr")
+    head = "".join(table.xpath("./thead//text()"))
+    if rows:
+        head += rows[0].text_content()
+    return _squash(head)
+
+def _matches(text, keyword_sets):
+    if not keyword_sets:
+        return True
+    return any(all(_squash(k) in text for k in keywords) for keywords in keyword_sets)
+
+def iter_tables(page_html, keyword_sets=None, scope="header"):
+    """按文档顺序逐个产出匹配的 lxml <table> 元素 (惰性，调用方可在首个命中后停止)"""
+    try:
+        doc = lxml_html.document_fromstring(page_html)
+    except Exception:
+        return
+    for table in doc.iter("table"):
+        if _matches(_table_text(table, scope), keyword_sets):
+            yield table
+
+def find_table(page_html, keyword_sets=None, scope="header", largest=False):
+    """返回首个匹配的 <table> 元素；largest=True 时返回行数最多的匹配表格；未找到返回 None"""
+    if not largest:
+        return next(iter_tables(page_html, keyword_sets, scope), None)
+    candidates = list(iter_tables(page_html, keyword_sets, scope))
+    if not candidates:
+        return None
+    return max(candidates, key=lambda t: len(t.xpath(".//tr")))
+
+def table_to_df(table_html):
+    """只解析单个表格的 HTML (lxml 元素或 outerHTML 字符串)，失败返回 None"""
+    if table_html is None or len(table_html) == 0:
+        return None
+    if not isinstance(table_html, str):
+        table_html = lxml_html.tostring(table_html, encoding="unicode")
+    try:
+        dfs = pd.read_html(StringIO(table_html))
+    except ValueError:
+        return None
+    return dfs[0] if dfs else None
+
+def read_table(page_html, keyword_sets=None, scope="header", largest=False):
+    """定位并解析目标表格，返回 DataFrame 或 None"""
+    table = find_table(page_html, keyword_sets, scope, largest)
+    return None if table is None else table_to_df(table)
+
+def read_table_from_driver(driver, keyword_sets=None, scope="header", largest=False):
+    """
+    在浏览器内定位目标表格并只取回其 outerHTML 解析
+    driver 不支持执行 JS 时 (如回放替身) 退回 page_source + lxml 定位
+    """
+    from selenium.common.exceptions import WebDriverException  # 仅浏览器路径需要 selenium
+
+    try:
+        outer_html = driver.execute_script(_LOCATE_JS, keyword_sets, scope, largest)
+    except WebDriverException:
+        outer_html = None
+    if outer_html is None:
+        return read_table(driver.page_source, keyword_sets, scope, largest)
+    return table_to_df(outer_html)
+
+def table_rows(table):
+    """以纯文本单元格列表返回表格各行 (含表头行)，不经过 DataFrame"""
+    rows = []
+    for tr in table.xpath(".//tr"):
+        cells = [_WS.sub(" ", c.text_content()).strip() for c in tr.xpath("./th|./td")]
+        if cells:
+            rows.append(cells)
+    return rows
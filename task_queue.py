@@ -0,0 +1,542 @@
+# task_queue.py
+# -----------------------------------------------------------------------------
+# DeepSeek Finance Project - Leased Work Queue (Coordinator / Workers)
+# -----------------------------------------------------------------------------
+# 任务队列模式: 协调者把每个K线标的 (以及汇率国债、宏观抓取、越南指数、分时、银行等
+# 非K线数据源) 各作为一个任务写入 SQLite 队列文件，任意数量的 worker 进程以租约方式领取任务，
+# 用现有 MarketFetcher / 爬虫代码执行并回写结果，协调者等待全部完成后组装报告。
+# 与静态分片 (kline_shards.py) 不同，慢标的不会拖住某个分片。
+#   - 本机 worker (--db): 直接读写队列文件。SQLite WAL 模式只支持同一主机上的进程，
+#     队列文件不能放在 NFS/SMB 等网络文件系统上供多台机器共用
+#   - 其他机器的 worker (--coordinator): 协调者以 --serve-port 启动 HTTP 队列服务 (QueueServer)，
+#     worker 经其领取/续约/回写 (RemoteQueue)，租约到期时间只由协调者的时钟计算，不受各机器时钟偏差影响
+#     (TASK_QUEUE_TOKEN 不为空时请求需携带相同的 X-Queue-Token)
+#   - 领取任务时设置租约 (LEASE_SECONDS)，执行期间 worker 定时续约
+#   - worker 崩溃/失联时租约过期，任务自动重新可领取；超过 MAX_ATTEMPTS 次记为失败
+#   - 任务执行抛出异常时重新排队，同样受 MAX_ATTEMPTS 限制
+#   - 宏观抓取共用一个浏览器，作为单个任务执行
+#
+# 环境变量: TASK_QUEUE_DB 队列文件 (默认 radar_queue.db), TASK_QUEUE_TOKEN 队列服务口令 (默认不校验)
+#
+# 用法:
+#   python task_queue.py coordinator --local-workers 2      # 入队、本机启动 2 个 worker、等待并出报告
+#   python task_queue.py worker --threads 4                 # 在本机其他终端追加 worker
+#   python task_queue.py coordinator --serve-port 8767      # 对其他机器提供队列服务
+#   python task_queue.py worker --coordinator http://协调者:8767 --threads 4   # 其他机器上的 worker
+#   python task_queue.py coordinator --no-email --timeout 1800
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import kline_shards
+import main
+import market_core
+import MarketRadar
+from kline_table import KlineTable
+
+TASK_QUEUE_DB = os.environ.get("TASK_QUEUE_DB", "radar_queue.db")
+TASK_QUEUE_TOKEN = os.environ.get("TASK_QUEUE_TOKEN", "")
+DEFAULT_SERVE_PORT = 8767
+REMOTE_TIMEOUT = 60
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+DEFAULT_TIMEOUT = 30 * 60
+WORKER_THREADS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id          TEXT PRIMARY KEY,
+    run_id      TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    owner       TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    updated_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, run_id, seq);
+"""
+
+# ==============================================================================
+# 队列 (SQLite)
+# ==============================================================================
+
+class TaskQueue:
+    """
+    基于 SQLite 文件的租约队列，任务状态: pending -> leased -> done / failed
+    每次操作使用独立连接，可在同一主机的多线程、多进程间共享同一文件 (WAL 不支持跨主机)
+    """
+    def __init__(self, path=TASK_QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, run_id, tasks):
+        """tasks: [(任务ID, 类型, payload dict)]，按列表顺序领取"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO tasks (id, run_id, seq, kind, payload, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(f"{run_id}:{task_id}", run_id, seq, kind, json.dumps(payload, ensure_ascii=False), now)
+                 for seq, (task_id, kind, payload) in enumerate(tasks)]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def claim(self, owner):
+        """
+        领取一个任务 (待执行或租约已过期的任务)，返回 (任务ID, 类型, payload) 或 None
+        过期任务的尝试次数已达上限时直接记为失败
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            while True:
+                row = conn.execute(
+                    "SELECT id, kind, payload, state, attempts FROM tasks "
+                    "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                    "ORDER BY run_id, seq LIMIT 1", (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                task_id, kind, payload, state, attempts = row
+                if state == 'leased' and attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE tasks SET state = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                        (f"lease expired after {attempts} attempts", now, task_id)
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE tasks SET state = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ?", (owner, now + self.lease_seconds, now, task_id)
+                )
+                conn.execute("COMMIT")
+                return task_id, kind, json.loads(payload)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def extend(self, task_ids, owner):
+        """续约 owner 持有的任务"""
+        if not task_ids:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                [(now + self.lease_seconds, now, task_id, owner) for task_id in task_ids]
+            )
+        finally:
+            conn.close()
+
+    def complete(self, task_id, owner, result):
+        """回写结果；租约已被其他 worker 接手时返回 False (结果丢弃)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = 'done', result = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (json.dumps(result, ensure_ascii=False, cls=main.NpEncoder), time.time(), task_id, owner)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def fail(self, task_id, owner, error):
+        """执行异常: 未达上限时重新排队，否则记为失败"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_until = NULL, error = ?, updated_at = ? "
+                "WHERE id = ? AND owner = ? AND state = 'leased'",
+                (self.max_attempts, str(error), time.time(), task_id, owner)
+            )
+        finally:
+            conn.close()
+
+    def progress(self, run_id):
+        """{状态: 数量}"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT state, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY state", (run_id,)).fetchall()
+        finally:
+            conn.close()
+        return dict(rows)
+
+    def results(self, run_id):
+        """{任务ID (不含 run_id 前缀): (状态, 结果, 错误)}"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, state, result, error FROM tasks WHERE run_id = ?", (run_id,)).fetchall()
+        finally:
+            conn.close()
+        prefix = f"{run_id}:"
+        return {task_id[len(prefix):]: (state, json.loads(result) if result else None, error)
+                for task_id, state, result, error in rows}
+
+    def purge(self, run_id):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,))
+        finally:
+            conn.close()
+
+# ==============================================================================
+# 队列服务 (其他机器的 worker)
+# ==============================================================================
+
+class QueueServer:
+    """
+    协调者进程内的 HTTP 队列服务，把 claim / extend / complete / fail 转发给本机 TaskQueue
+    租约到期时间由协调者的时钟写入与比较，worker 所在机器的时钟不参与
+    """
+    def __init__(self, queue, host="0.0.0.0", port=DEFAULT_SERVE_PORT, token=TASK_QUEUE_TOKEN):
+        self.queue = queue
+        self.host = host
+        self.port = port
+        self.token = token
+        self.httpd = None
+
+    def dispatch(self, action, request):
+        """返回 (状态码, payload)"""
+        queue = self.queue
+        if action == "info":
+            return 200, {"lease_seconds": queue.lease_seconds}
+        if action == "claim":
+            task = queue.claim(request["owner"])
+            return 200, {"task": list(task) if task else None}
+        if action == "extend":
+            queue.extend(request["task_ids"], request["owner"])
+            return 200, {}
+        if action == "complete":
+            return 200, {"ok": queue.complete(request["task_id"], request["owner"], request["result"])}
+        if action == "fail":
+            queue.fail(request["task_id"], request["owner"], request["error"])
+            return 200, {}
+        return 404, {"error": f"未知操作: {action}"}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if server.token and self.headers.get("X-Queue-Token") != server.token:
+                    status, payload = 403, {"error": "invalid token"}
+                else:
+                    try:
+                        length = int(self.headers.get("Content-Length") or 0)
+                        request = json.loads(self.rfile.read(length) or b"{}")
+                        status, payload = server.dispatch(self.path.strip("/"), request)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """后台线程启动"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        print(f"📡 [Queue] 队列服务已启动: http://{self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+class RemoteQueue:
+    """经协调者队列服务访问队列 (与 TaskQueue 的 worker 侧接口一致)"""
+    def __init__(self, url, token=TASK_QUEUE_TOKEN, timeout=REMOTE_TIMEOUT):
+        self.path = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.lease_seconds = self._call("info")["lease_seconds"]
+
+    def _call(self, action, **request):
+        body = json.dumps(request, ensure_ascii=False, cls=main.NpEncoder).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if self.token:
+            headers["X-Queue-Token"] = self.token
+        req = urllib.request.Request(f"{self.path}/{action}", data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.load(resp)
+
+    def claim(self, owner):
+        task = self._call("claim", owner=owner)["task"]
+        return tuple(task) if task else None
+
+    def extend(self, task_ids, owner):
+        if task_ids:
+            self._call("extend", task_ids=task_ids, owner=owner)
+
+    def complete(self, task_id, owner, result):
+        return self._call("complete", task_id=task_id, owner=owner, result=result)["ok"]
+
+    def fail(self, task_id, owner, error):
+        self._call("fail", task_id=task_id, owner=owner, error=str(error))
+
+# ==============================================================================
+# 任务执行 (worker)
+# ==============================================================================
+
+_FETCHERS = {}
+_FETCHERS_LOCK = threading.Lock()
+
+def _get_fetcher(fetch_start, end):
+    """同一 worker 进程内按日期区间复用 MarketFetcher"""
+    with _FETCHERS_LOCK:
+        if (fetch_start, end) not in _FETCHERS:
+            _FETCHERS[(fetch_start, end)] = market_core.MarketFetcher(fetch_start, end)
+        return _FETCHERS[(fetch_start, end)]
+
+def execute_task(kind, payload):
+    """执行一个任务，返回可 JSON 序列化的结果"""
+    if kind == "kline":
+        config = MarketRadar.KLINE_GROUPS[payload["group_index"]][1][payload["name"]]
+        fetcher = _get_fetcher(payload["fetch_start"], payload["end"])
+        klines, ma, status = market_core.fetch_target(fetcher, payload["name"], config, payload["report_start"], payload["end"])
+        return {"klines": kline_shards.encode_result(klines), "ma": ma, "status": status}
+    if kind == "source":
+        return kline_shards.encode_result(main.fetch_source(payload["key"]))
+    raise ValueError(f"未知任务类型: {kind}")
+
+class Worker:
+    """领取并执行任务，持有任务期间后台线程定时续约"""
+    def __init__(self, queue, threads=WORKER_THREADS, idle_exit=None):
+        self.queue = queue
+        self.threads = threads
+        self.idle_exit = idle_exit
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                held = list(self._held)
+            try:
+                self.queue.extend(held, self.owner)
+            except Exception as e:
+                print(f"⚠️ [Queue] 续约失败: {e}")
+
+    def _loop(self):
+        idle_since = time.time()
+        while not self._stop.is_set():
+            try:
+                task = self.queue.claim(self.owner)
+            except Exception as e:
+                # 队列服务暂时不可达 (协调者重启/网络抖动) 时稍后重试，空闲计时照常
+                print(f"⚠️ [Queue] 领取失败: {e}")
+                task = None
+            if task is None:
+                if self.idle_exit is not None and time.time() - idle_since > self.idle_exit:
+                    return
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            task_id, kind, payload = task
+            label = payload.get("name") or payload.get("key")
+            with self._lock:
+                self._held.add(task_id)
+            try:
+                result = execute_task(kind, payload)
+                if not self.queue.complete(task_id, self.owner, result):
+                    print(f"⚠️ [Queue] {label} 租约已失效，结果丢弃")
+            except Exception as e:
+                print(f"❌ [Queue] {label} 执行异常: {e}")
+                try:
+                    self.queue.fail(task_id, self.owner, e)
+                except Exception as fail_error:
+                    print(f"⚠️ [Queue] {label} 回写失败 (租约过期后重新领取): {fail_error}")
+            finally:
+                with self._lock:
+                    self._held.discard(task_id)
+            idle_since = time.time()
+
+    def run(self):
+        MarketRadar.init_runtime()
+        print(f"👷 Worker {self.owner} 启动 ({self.threads} 线程, 队列: {self.queue.path})")
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        loops = [threading.Thread(target=self._loop, daemon=True) for _ in range(self.threads)]
+        for t in loops:
+            t.start()
+        try:
+            for t in loops:
+                t.join()
+        finally:
+            self._stop.set()
+        print(f"👷 Worker {self.owner} 退出")
+
+    def stop(self, *_):
+        self._stop.set()
+
+# ==============================================================================
+# 协调者
+# ==============================================================================
+
+def build_tasks():
+    """每个K线标的一个任务 + 每个非K线数据源一个任务 (非K线数据源在前，宏观抓取最慢最先领取)"""
+    MarketRadar.init_runtime()
+    MarketRadar.refresh_dates()
+    dates = {"fetch_start": MarketRadar.FETCH_START_DATE, "report_start": MarketRadar.REPORT_START_DATE, "end": MarketRadar.END_DATE}
+    tasks = [(f"source:{key}", "source", {"key": key}) for key in main.SOURCE_STEPS if key != "klines"]
+    for group_index, (group_name, targets, _) in enumerate(MarketRadar.KLINE_GROUPS):
+        for name in targets:
+            tasks.append((f"kline:{group_name}:{name}", "kline", dict(dates, group_index=group_index, name=name)))
+    return tasks
+
+def assemble_klines(results):
+    """按 KLINE_GROUPS 顺序把K线任务结果组装为 get_all_kline_data 的返回结构"""
+    collection = {"meta": MarketRadar.kline_meta(), "data": {}, "ma_data": {"general": [], "commodities": []}}
+    status_logs = []
+    for group_name, targets, ma_key in MarketRadar.KLINE_GROUPS:
+        kline_tables = []
+        for name in targets:
+            state, result, error = results.get(f"kline:{group_name}:{name}", (None, None, "missing"))
+            if state != 'done':
+                status_logs.append({'name': name, 'status': False, 'error': f"Task {state or 'lost'}: {error}"})
+                continue
+            status_logs.append(result["status"])
+            klines = kline_shards.decode_result(result["klines"])
+            if klines:
+                kline_tables.append(klines)
+            else:
+                print(f"⚠️ 警告: 无法获取 {name} 的K线数据 (范围为空?)")
+            if result["ma"]:
+                collection["ma_data"][ma_key].append(result["ma"])
+        # 与 fetch_group_data 一致: 日期降序、名称升序
+        collection["data"][group_name] = KlineTable.concat(kline_tables).sort_latest_first()
+    return collection, status_logs
+
+def collect_queue_state(results):
+    """队列结果 -> main.assemble_report 所需的 state"""
+    state = {}
+    for key in main.SOURCE_STEPS:
+        if key == "klines":
+            state[key] = assemble_klines(results)
+            continue
+        status, result, error = results.get(f"source:{key}", (None, None, "missing"))
+        state[key] = kline_shards.decode_result(result) if status == 'done' else RuntimeError(f"Task {status or 'lost'}: {error}")
+    return state
+
+def _spawn_local_workers(count, db_path):
+    script = os.path.abspath(__file__)
+    return [subprocess.Popen([sys.executable, script, "worker", "--db", db_path, "--idle-exit", "10"])
+            for _ in range(count)]
+
+def run_coordinator(db_path=TASK_QUEUE_DB, send_email=True, local_workers=0, timeout=DEFAULT_TIMEOUT, serve_port=None, serve_host="0.0.0.0"):
+    """serve_port 不为空时启动队列服务，供其他机器上的 worker (--coordinator) 领取任务"""
+    start_time = time.time()
+    queue = TaskQueue(db_path)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+    tasks = build_tasks()
+    queue.enqueue(run_id, tasks)
+    print(f"📮 已入队 {len(tasks)} 个任务 (run {run_id}, 队列: {db_path})")
+
+    server = QueueServer(queue, serve_host, serve_port).start() if serve_port else None
+    workers = _spawn_local_workers(local_workers, db_path) if local_workers else []
+    last = None
+    try:
+        while True:
+            progress = queue.progress(run_id)
+            finished = progress.get('done', 0) + progress.get('failed', 0)
+            if progress != last:
+                print(f"   ⏳ 进度: {finished}/{len(tasks)} (执行中 {progress.get('leased', 0)}, 失败 {progress.get('failed', 0)})")
+                last = progress
+            if finished >= len(tasks):
+                break
+            if time.time() - start_time > timeout:
+                print(f"⚠️ 等待超时 ({timeout} 秒)，未完成任务记为失败")
+                break
+            time.sleep(POLL_INTERVAL)
+        results = queue.results(run_id)
+    finally:
+        for proc in workers:
+            proc.terminate()
+        if server:
+            server.stop()
+
+    queue.purge(run_id)
+    state = collect_queue_state(results)
+    main.save_state(state)
+    final_data, cleaned_logs, signal_summary = main.assemble_report(state)
+    output = main.publish_report(final_data, cleaned_logs, signal_summary, send_email=send_email)
+    print(f"\n⏱️ 队列模式总耗时: {time.time() - start_time:.2f} 秒")
+    return output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MarketRadar 任务队列模式")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="入队全部任务，等待完成后组装报告")
+    coordinator_parser.add_argument("--db", default=TASK_QUEUE_DB, help="队列文件")
+    coordinator_parser.add_argument("--local-workers", type=int, default=0, help="本机启动的 worker 进程数")
+    coordinator_parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="最长等待时间 (秒)")
+    coordinator_parser.add_argument("--no-email", action="store_true", help="不发送邮件")
+    coordinator_parser.add_argument("--serve-port", type=int, default=None, help="启动队列服务的端口 (其他机器的 worker 经此领取任务)")
+    coordinator_parser.add_argument("--serve-host", default="0.0.0.0", help="队列服务监听地址")
+
+    worker_parser = subparsers.add_parser("worker", help="领取并执行任务")
+    worker_source = worker_parser.add_mutually_exclusive_group()
+    worker_source.add_argument("--db", default=TASK_QUEUE_DB, help="队列文件 (仅限与协调者同一主机，SQLite WAL 不支持网络文件系统)")
+    worker_source.add_argument("--coordinator", default=None, help="协调者队列服务地址，如 http://host:8767 (其他机器上的 worker)")
+    worker_parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="并发执行的任务数")
+    worker_parser.add_argument("--idle-exit", type=float, default=None, help="空闲多少秒后退出 (默认常驻)")
+
+    args = parser.parse_args()
+    if args.role == "coordinator":
+        main.print_banner()
+        run_coordinator(args.db, send_email=not args.no_email, local_workers=args.local_workers, timeout=args.timeout,
+                        serve_port=args.serve_port, serve_host=args.serve_host)
+    else:
+        queue = RemoteQueue(args.coordinator) if args.coordinator else TaskQueue(args.db)
+        worker = Worker(queue, threads=args.threads, idle_exit=args.idle_exit)
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
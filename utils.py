@@ -20,11 +20,12 @@ def calculate_ma(df, windows=[5, 10, 20, 60, 120, 250]):
     if df is None or df.empty or 'close' not in df.columns:
         return []
 
-    # 确保按日期升序排列
-    df = df.sort_values('date').copy()
+    # 确保按日期升序排列 (已有序时跳过排序)
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date')
     
-    # 确保 close 列为数值型
-    df['close'] = pd.to_numeric(df['close'], errors='coerce')
+    # 只取最新值: 每个标的只需最后 max(windows) 个收盘价，不计算整条滚动序列 (耗时与历史长度无关)
+    tail_len = max(windows, default=1)
     
     # 计算各周期均线
     result_map = {} 
@@ -43,6 +44,9 @@ def calculate_ma(df, windows=[5, 10, 20, 60, 120, 250]):
         if len(group_df) < 1:
             continue
             
+        # 确保 close 列为数值型 (只转换尾部)
+        closes = pd.to_numeric(group_df['close'].iloc[-tail_len:], errors='coerce').to_numpy()
+        
         # 获取最新的一条数据记录（用于标记日期和收盘价）
         latest_record = group_df.iloc[-1].to_dict()
         
@@ -56,16 +60,14 @@ def calculate_ma(df, windows=[5, 10, 20, 60, 120, 250]):
         ma_data = {
             "名称": name,
             "日期": date_str,
-            "收盘价": round(latest_record.get('close'), 2)
+            "收盘价": round(closes[-1], 2)
         }
 
         # 遍历计算不同周期的 MA
         for w in windows:
             col_name = f"{w}日均线"
-            # 计算滚动平均
-            ma_series = group_df['close'].rolling(window=w).mean()
-            # 获取最新值
-            latest_ma = ma_series.iloc[-1]
+            # 数据不足 w 个或窗口内有缺失值时与 rolling(w).mean() 一致返回 NaN
+            latest_ma = closes[-w:].mean() if len(closes) >= w else np.nan
             
             if pd.notna(latest_ma):
                 ma_data[col_name] = round(latest_ma, 2)